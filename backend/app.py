@@ -1,103 +1,426 @@
 """Flask Web API服务"""
-from flask import Flask, render_template, request, send_file, jsonify
+from flask import Flask, render_template, request, send_file, jsonify, Response, stream_with_context, g
 from werkzeug.utils import secure_filename
+import copy
+import itertools
+import mimetypes
 import os
+import shutil
 import sys
+import tempfile
 import uuid
+import zipfile
 from datetime import datetime
+from urllib.parse import urlencode
 import time
 
 # 添加父目录到路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from backend.converters import (
-    WordToPDFConverter, PPTToPDFConverter, ExcelToPDFConverter,
-    ImageToPDFConverter, HTMLToPDFConverter,
-    PDFToWordConverter, PDFToPPTConverter, PDFToImageConverter,
-    PDFToExcelConverter
-)
+from backend.converters import REGISTRY
+from backend.job_queue import JobQueue
+from backend.result_cache import ResultCache, file_digest
+from backend.chunked_upload import ChunkedUploadManager, UploadError
+from backend.converters.zip_stream import stream_zip, write_zip
+from backend.janitor import Janitor
+from backend.pipeline import Pipeline, PipelineError
+from backend.storage import LocalStorage, create_storage, default_memory_dir
+from backend import metrics
 
 app = Flask(__name__, 
            template_folder='../frontend/templates',
            static_folder='../frontend/static')
 
 # 配置
-app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB最大文件大小
+app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB最大文件大小（单次请求，含每个分块）
+# 分块上传的单个文件大小上限（MB）
+app.config['MAX_UPLOAD_MB'] = int(os.environ.get('MAX_UPLOAD_MB', 2048))
+# 批量转换上传的ZIP：解压后的总大小（MB）、文件数和单个文件的压缩比上限，超出时拒绝（413）
+app.config['ARCHIVE_MAX_MB'] = int(os.environ.get('ARCHIVE_MAX_MB', 500))
+app.config['ARCHIVE_MAX_FILES'] = int(os.environ.get('ARCHIVE_MAX_FILES', 1000))
+app.config['ARCHIVE_MAX_RATIO'] = float(os.environ.get('ARCHIVE_MAX_RATIO', 100))
 
 # 使用绝对路径
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 app.config['UPLOAD_FOLDER'] = os.path.join(BASE_DIR, 'uploads')
 app.config['OUTPUT_FOLDER'] = os.path.join(BASE_DIR, 'outputs')
+app.config['RESULT_CACHE_FOLDER'] = os.environ.get('RESULT_CACHE_DIR', os.path.join(BASE_DIR, 'cache'))
+# 结果缓存的磁盘预算（MB），超出后按LRU淘汰
+app.config['RESULT_CACHE_MAX_MB'] = int(os.environ.get('RESULT_CACHE_MAX_MB', 2048))
+
+# 存储：不超过 SPOOL_MEMORY_MAX_MB 的文件暂存在内存文件系统中；
+# STORAGE_URL 指定输出的存储后端（共享目录或 s3://bucket/prefix），默认为本地输出目录
+app.config['SPOOL_MEMORY_DIR'] = default_memory_dir()
+app.config['SPOOL_MEMORY_MAX_MB'] = float(os.environ.get('SPOOL_MEMORY_MAX_MB', 8))
+app.config['STORAGE_URL'] = os.environ.get('STORAGE_URL', '')
+
+# 上传文件和转换输出的保留时间（小时），以及输出目录的磁盘配额（MB，0 表示不限制）
+app.config['UPLOAD_MAX_AGE_HOURS'] = float(os.environ.get('UPLOAD_MAX_AGE_HOURS', 1))
+app.config['OUTPUT_MAX_AGE_HOURS'] = float(os.environ.get('OUTPUT_MAX_AGE_HOURS', 24))
+app.config['OUTPUT_QUOTA_MB'] = int(os.environ.get('OUTPUT_QUOTA_MB', 10240))
+
+# 异步任务工作进程数（默认等于CPU核心数）
+app.config['JOB_WORKERS'] = int(os.environ.get('CONVERT_WORKERS', 0)) or os.cpu_count() or 1
+# 转换工作进程的资源限制：RSS上限、可选的地址空间上限（0 表示不限制），
+# 执行时间上限 = 基础时间 + 每页时间 × 页数（无法获得页数时使用默认超时）
+app.config['SANDBOX_MEMORY_MB'] = int(os.environ.get('SANDBOX_MEMORY_MB', 2048))
+app.config['SANDBOX_ADDRESS_SPACE_MB'] = int(os.environ.get('SANDBOX_ADDRESS_SPACE_MB', 0))
+app.config['SANDBOX_TIMEOUT_BASE'] = float(os.environ.get('SANDBOX_TIMEOUT_BASE', 60))
+app.config['SANDBOX_TIMEOUT_PER_PAGE'] = float(os.environ.get('SANDBOX_TIMEOUT_PER_PAGE', 10))
+app.config['SANDBOX_TIMEOUT_DEFAULT'] = float(os.environ.get('SANDBOX_TIMEOUT_DEFAULT', 600))
+# 单个转换在工作进程中使用的进程/线程数（pdf2docx、poppler等），0 表示 CPU核心数 ÷ 工作进程数
+app.config['SANDBOX_TASK_THREADS'] = int(os.environ.get('SANDBOX_TASK_THREADS', 0))
+# 按预估耗时调度：超过阈值（秒）的任务进入长任务通道；SCHEDULER_SHORT_WORKERS 个工作进程只处理短任务
+#（默认为总数的1/4）；排队的长任务按 SCHEDULER_AGING_RATE 老化，不会被短任务饿死
+app.config['SCHEDULER_LONG_THRESHOLD'] = float(os.environ.get('SCHEDULER_LONG_THRESHOLD', 30))
+app.config['SCHEDULER_SHORT_WORKERS'] = (int(os.environ['SCHEDULER_SHORT_WORKERS'])
+                                         if os.environ.get('SCHEDULER_SHORT_WORKERS') else None)
+app.config['SCHEDULER_AGING_RATE'] = float(os.environ.get('SCHEDULER_AGING_RATE', 1.0))
+# 异步任务记录目录，多个Web进程共享
+app.config['JOB_STATE_FOLDER'] = os.environ.get('JOB_STATE_DIR', os.path.join(BASE_DIR, 'jobs'))
+
+# 多进程部署（serve.py）时各Web进程的指标写入该目录，/metrics 输出所有进程的汇总
+app.config['METRICS_MULTIPROC_DIR'] = os.environ.get('METRICS_MULTIPROC_DIR', '')
+if app.config['METRICS_MULTIPROC_DIR']:
+    metrics.REGISTRY.enable_multiprocess(app.config['METRICS_MULTIPROC_DIR'])
 
 # 创建必要的文件夹
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
 
-# 转换器映射
-CONVERTERS = {
-    'word2pdf': WordToPDFConverter(),
-    'ppt2pdf': PPTToPDFConverter(),
-    'excel2pdf': ExcelToPDFConverter(),
-    'img2pdf': ImageToPDFConverter(),
-    'html2pdf': HTMLToPDFConverter(),
-    'pdf2word': PDFToWordConverter(),
-    'pdf2ppt': PDFToPPTConverter(),
-    'pdf2img': PDFToImageConverter(),
-    'pdf2excel': PDFToExcelConverter(),
-}
-
-# 允许的文件扩展名
-ALLOWED_EXTENSIONS = {
-    'word2pdf': {'.docx', '.doc'},
-    'ppt2pdf': {'.pptx', '.ppt'},
-    'excel2pdf': {'.xlsx', '.xls'},
-    'img2pdf': {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff'},
-    'html2pdf': {'.html', '.htm'},
-    'pdf2word': {'.pdf'},
-    'pdf2ppt': {'.pdf'},
-    'pdf2img': {'.pdf'},
-    'pdf2excel': {'.pdf'},
-}
+# 转换器映射（转换类型、输入格式和输出格式由各转换器类声明，见 converters/registry.py）
+CONVERTERS = {conversion_type: REGISTRY.create(conversion_type) for conversion_type in REGISTRY.types()}
+
+# 启动时预热的转换类型：逗号分隔的列表、all 或留空（不预热）
+app.config['WARMUP_CONVERTERS'] = REGISTRY.parse_types(os.environ.get('WARMUP_CONVERTERS'))
+
+# 上传文件只在本地暂存；转换输出先写入本地暂存区，完成后提交到存储后端
+_memory_dir = app.config['SPOOL_MEMORY_DIR']
+_memory_max_bytes = int(app.config['SPOOL_MEMORY_MAX_MB'] * 1024 * 1024)
+upload_storage = LocalStorage(app.config['UPLOAD_FOLDER'],
+                              memory_dir=_memory_dir and os.path.join(_memory_dir, 'uploads'),
+                              memory_max_bytes=_memory_max_bytes)
+output_spool = LocalStorage(app.config['OUTPUT_FOLDER'],
+                            memory_dir=_memory_dir and os.path.join(_memory_dir, 'outputs'),
+                            memory_max_bytes=_memory_max_bytes)
+output_storage = create_storage(app.config['STORAGE_URL'], output_spool)
+
+# 转换任务队列：异步任务和同步的进程内转换都在其有资源限制的工作进程中执行
+job_queue = JobQueue(max_workers=app.config['JOB_WORKERS'], warm_up_types=app.config['WARMUP_CONVERTERS'],
+                     state_dir=app.config['JOB_STATE_FOLDER'],
+                     sandbox_options={
+                         'memory_limit_bytes': app.config['SANDBOX_MEMORY_MB'] * 1024 * 1024,
+                         'address_space_bytes': app.config['SANDBOX_ADDRESS_SPACE_MB'] * 1024 * 1024,
+                         'timeout_base': app.config['SANDBOX_TIMEOUT_BASE'],
+                         'timeout_per_page': app.config['SANDBOX_TIMEOUT_PER_PAGE'],
+                         'default_timeout': app.config['SANDBOX_TIMEOUT_DEFAULT'],
+                         'long_threshold': app.config['SCHEDULER_LONG_THRESHOLD'],
+                         'short_workers': app.config['SCHEDULER_SHORT_WORKERS'],
+                         'aging_rate': app.config['SCHEDULER_AGING_RATE'],
+                         'task_threads': app.config['SANDBOX_TASK_THREADS'] or None,
+                     })
+
+# 分块上传（与普通上传共用目录，放弃的上传由定期清理删除）
+upload_manager = ChunkedUploadManager(app.config['UPLOAD_FOLDER'],
+                                      max_size=app.config['MAX_UPLOAD_MB'] * 1024 * 1024)
+
+# 转换结果缓存
+result_cache = ResultCache(app.config['RESULT_CACHE_FOLDER'],
+                           max_bytes=app.config['RESULT_CACHE_MAX_MB'] * 1024 * 1024)
+
+# 后台清理过期的上传文件和转换输出（由 init_worker() 启动）
+janitor = Janitor(max_bytes=app.config['OUTPUT_QUOTA_MB'] * 1024 * 1024)
+for _folder in upload_storage.local_folders():
+    janitor.add_folder(_folder, app.config['UPLOAD_MAX_AGE_HOURS'] * 3600, count_quota=False)
+for _folder in output_storage.local_folders():
+    janitor.add_folder(_folder, app.config['OUTPUT_MAX_AGE_HOURS'] * 3600)
+# 任务记录（可能来自已退出的Web进程）保留时间与任务队列一致
+janitor.add_folder(app.config['JOB_STATE_FOLDER'], job_queue.retention_seconds, count_quota=False)
+
+
+
+def warm_up_converters():
+    """
+    预先导入并初始化所选转换引擎，在开始监听端口之前调用
+
+    主进程（同步转换）和异步任务的工作进程都会预热。
+    不在导入阶段执行，避免spawn方式启动的工作进程重复预热。
+
+    Returns:
+        dict: 各转换类型的预热结果
+    """
+    selected = app.config['WARMUP_CONVERTERS']
+    if not selected:
+        return {}
+    print(f"预热转换引擎: {', '.join(selected)}")
+    start = time.perf_counter()
+    warm_up_results.update(REGISTRY.warm_up(selected))
+    job_queue.start()
+    print(f"预热完成，耗时 {time.perf_counter() - start:.1f}s")
+    return warm_up_results
+
+
+# 预热结果，由 /api/health 返回
+warm_up_results = {}
+
+
+def init_worker():
+    """
+    在开始接收请求之前调用（开发服务器和 serve.py 的每个Web进程）：
+    预热转换引擎并启动后台清理线程
+    """
+    warm_up_converters()
+    janitor.start()
 
 
 def allowed_file(filename, conversion_type):
     """检查文件是否允许"""
-    ext = os.path.splitext(filename)[1].lower()
-    return ext in ALLOWED_EXTENSIONS.get(conversion_type, set())
+    return REGISTRY.accepts(conversion_type, filename)
 
 
-def cleanup_old_files(folder_path, max_age_hours=24):
-    """清理超过指定时间的文件"""
-    try:
-        if not os.path.exists(folder_path):
-            return
-        
-        current_time = time.time()
-        max_age_seconds = max_age_hours * 3600
-        
-        for filename in os.listdir(folder_path):
-            file_path = os.path.join(folder_path, filename)
-            if os.path.isfile(file_path):
-                file_age = current_time - os.path.getmtime(file_path)
-                if file_age > max_age_seconds:
-                    try:
-                        os.remove(file_path)
-                        print(f"已清理旧文件: {filename}")
-                    except Exception as e:
-                        print(f"清理文件失败 {filename}: {e}")
-    except Exception as e:
-        print(f"清理文件夹失败: {e}")
+def cache_result(cache_key, output_ext, result, output_path):
+    """把单文件转换结果加入缓存（多文件输出不缓存）"""
+    if result == output_path and os.path.exists(output_path):
+        try:
+            result_cache.put(cache_key, output_ext, output_path)
+        except OSError as e:
+            print(f"写入结果缓存失败: {e}")
+
+
+def save_upload(file, input_path):
+    """保存上传的文件，并登记本地文件的过期时间（与转换输出一样，不必等到下次扫描目录）"""
+    file.save(input_path)
+    janitor.track(input_path)
+
+
+def publish_output(output_filename):
+    """把暂存区中的转换输出提交到存储后端，并登记本地文件的过期时间"""
+    output_storage.commit(output_filename)
+    local_path = output_storage.local_path(output_filename)
+    if local_path:
+        janitor.track(local_path)
+
+
+def finish_output(cache_key, output_ext, result, output_path):
+    """转换完成：先缓存结果，再提交到存储后端（提交到对象存储后本地文件即被删除）"""
+    cache_result(cache_key, output_ext, result, output_path)
+    publish_output(os.path.basename(output_path))
 
 
 @app.route('/')
 def index():
     """首页"""
-    # 每次访问首页时清理超过24小时的旧文件
-    cleanup_old_files(app.config['UPLOAD_FOLDER'], max_age_hours=1)
-    cleanup_old_files(app.config['OUTPUT_FOLDER'], max_age_hours=24)
     return render_template('index.html')
 
 
+@app.before_request
+def start_request_timer():
+    g.request_started_at = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """记录每个路由的请求耗时"""
+    started_at = g.pop('request_started_at', None)
+    if started_at is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.HTTP_SECONDS.observe(time.perf_counter() - started_at, endpoint=endpoint,
+                                     method=request.method, status=response.status_code)
+    return response
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus格式的指标（多进程部署时为所有Web进程的汇总）"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+def make_upload_filename(filename):
+    """生成带时间戳和随机ID的上传文件名"""
+    unique_id = str(uuid.uuid4())[:8]
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return f"{timestamp}_{unique_id}_{secure_filename(filename)}"
+
+
+def run_converter(converter, input_path, output_path):
+    """同步执行转换：sandboxed 转换器提交到工作进程池并等待，其他转换器直接调用"""
+    if converter.sandboxed:
+        return job_queue.run(converter, input_path, output_path)
+    return converter.convert(input_path, output_path)
+
+
+# 可随单次请求指定的转换参数：页码范围（如 1-5,9,12-）和渲染配置（如 thumbnail）
+REQUEST_OPTIONS = ('pages', 'profile')
+
+
+def request_options(source):
+    """从表单、JSON或查询参数中取出单次请求的转换参数（只保留有值的项）"""
+    return {key: source.get(key) for key in REQUEST_OPTIONS if source.get(key)}
+
+
+def converter_for(conversion_type, options=None):
+    """
+    按单次请求的参数获取转换器：指定了参数时返回共享实例的副本
+    
+    Raises:
+        ValueError: 参数无效，或该转换类型不支持
+    """
+    converter = CONVERTERS[conversion_type]
+    options = options or {}
+    if options.get('profile'):
+        converter = converter.select_profile(options['profile'])
+    if options.get('pages'):
+        converter = converter.select_pages(options['pages'])
+    return converter
+
+
+def start_conversion(conversion_type, input_path, async_mode=False, digest=None, options=None):
+    """
+    对已保存的上传文件执行转换
+    
+    Args:
+        conversion_type: 转换类型
+        input_path: 上传文件路径（转换结束后删除）
+        async_mode: 是否提交到任务队列
+        digest: 输入文件的SHA-256（可选，未提供时现场计算）
+        options: 单次请求的转换参数（可选，见 REQUEST_OPTIONS）
+        
+    Returns:
+        tuple: (响应字典, HTTP状态码)
+    """
+    try:
+        converter = converter_for(conversion_type, options)
+        
+        # 生成输出文件路径
+        output_ext = converter.output_extension
+        input_filename = os.path.basename(input_path)
+        output_filename = f"{os.path.splitext(input_filename)[0]}_converted{output_ext}"
+        output_path = output_storage.writable_path(output_filename, os.path.getsize(input_path))
+        
+        print(f"输出文件将保存到: {output_path}")
+        
+        # 相同内容、相同类型和参数的文件直接复用缓存结果
+        cache_key = ResultCache.make_key(digest or file_digest(input_path), conversion_type,
+                                         converter.get_options())
+        cached_path = result_cache.get(cache_key, output_ext)
+        if cached_path:
+            print(f"命中结果缓存: {cached_path}")
+            output_storage.put_file(output_filename, cached_path)
+            local_path = output_storage.local_path(output_filename)
+            if local_path:
+                janitor.track(local_path)
+            if async_mode:
+                job = job_queue.record_completed(conversion_type, output_path)
+                return {
+                    'success': True,
+                    'message': '任务已完成',
+                    'job_id': job.id,
+                    'status_url': f'/api/jobs/{job.id}',
+                    'cached': True,
+                }, 202
+            return {
+                'success': True,
+                'message': '转换成功',
+                'download_url': f'/api/download/{output_filename}',
+                'filename': output_filename,
+                'cached': True,
+            }, 200
+        
+        # 多文件输出（如PDF转图片）：返回流式下载地址，下载时在工作进程中边渲染边打包，不在磁盘上生成ZIP
+        if not async_mode and converter.supports_streaming:
+            stream_filename = os.path.basename(input_path)
+            download_url = f'/api/stream/{conversion_type}/{stream_filename}'
+            if options:
+                download_url += '?' + urlencode(options)
+            # 上传文件保留到下载时渲染，由定期清理删除
+            input_path = None
+            return {
+                'success': True,
+                'message': '转换成功',
+                'download_url': download_url,
+                'filename': output_filename,
+            }, 200
+        
+        if async_mode:
+            job = job_queue.submit(
+                conversion_type, converter, input_path, output_path,
+                on_success=lambda job: finish_output(cache_key, output_ext, job.result, job.output_path))
+            # 上传文件由任务完成后清理
+            input_path = None
+            return {
+                'success': True,
+                'message': '任务已提交',
+                'job_id': job.id,
+                'status_url': f'/api/jobs/{job.id}',
+            }, 202
+        
+        # 转换文件（进程内解析输入的转换器在有资源限制的工作进程中执行）
+        result = run_converter(converter, input_path, output_path)
+        
+        print(f"转换完成，实际输出: {result}")
+        print(f"文件是否存在: {os.path.exists(output_path)}")
+        finish_output(cache_key, output_ext, result, output_path)
+        
+        # 返回下载链接
+        return {
+            'success': True,
+            'message': '转换成功',
+            'download_url': f'/api/download/{output_filename}',
+            'filename': output_filename
+        }, 200
+    
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return {'error': f'转换失败: {str(e)}'}, 500
+    
+    finally:
+        # 清理上传的文件
+        if input_path and os.path.exists(input_path):
+            try:
+                os.remove(input_path)
+            except:
+                pass
+
+
+def merge_conversion(conversion_type, input_paths):
+    """
+    把多个上传文件合并转换为一个输出
+    
+    Returns:
+        tuple: (响应字典, HTTP状态码)
+    """
+    try:
+        converter = CONVERTERS[conversion_type]
+        output_filename = f"{os.path.splitext(os.path.basename(input_paths[0]))[0]}_merged{converter.output_extension}"
+        output_path = output_storage.writable_path(
+            output_filename, sum(os.path.getsize(path) for path in input_paths))
+        
+        job_queue.run(converter, input_paths, output_path, method='convert_many')
+        publish_output(output_filename)
+        print(f"合并转换完成: {len(input_paths)} 个文件 -> {output_path}")
+        
+        return {
+            'success': True,
+            'message': '转换成功',
+            'download_url': f'/api/download/{output_filename}',
+            'filename': output_filename
+        }, 200
+    
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return {'error': f'转换失败: {str(e)}'}, 500
+    
+    finally:
+        for input_path in input_paths:
+            if os.path.exists(input_path):
+                try:
+                    os.remove(input_path)
+                except:
+                    pass
+
+
 @app.route('/api/convert', methods=['POST'])
 def convert_file():
     """文件转换API"""
@@ -108,6 +431,8 @@ def convert_file():
         
         file = request.files['file']
         conversion_type = request.form.get('type')
+        # mode=async 时提交到任务队列并立即返回任务ID
+        async_mode = request.form.get('mode') == 'async'
         
         if file.filename == '':
             return jsonify({'error': '没有选择文件'}), 400
@@ -118,89 +443,368 @@ def convert_file():
         if not allowed_file(file.filename, conversion_type):
             return jsonify({'error': f'不支持的文件格式'}), 400
         
-        # 保存上传的文件
-        filename = secure_filename(file.filename)
-        unique_id = str(uuid.uuid4())[:8]
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        input_filename = f"{timestamp}_{unique_id}_{filename}"
-        input_path = os.path.join(app.config['UPLOAD_FOLDER'], input_filename)
+        # 页码范围（可选，如 1-5,9,12-）：只解析和渲染所选页面；渲染配置（可选）：如 pdf2img 的 thumbnail
+        options = request_options(request.form)
+        try:
+            converter_for(conversion_type, options)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        print(f"保存上传文件到: {input_path}")
-        file.save(input_path)
+        # 上传了多个文件：合并为一个输出（如多张图片合并为一个PDF）
+        files = request.files.getlist('file')
+        if len(files) > 1:
+            if not CONVERTERS[conversion_type].supports_merge:
+                return jsonify({'error': '该转换类型不支持多文件合并'}), 400
+            if not all(f.filename and allowed_file(f.filename, conversion_type) for f in files):
+                return jsonify({'error': '不支持的文件格式'}), 400
+            input_paths = []
+            for f in files:
+                input_paths.append(upload_storage.writable_path(make_upload_filename(f.filename),
+                                                                request.content_length))
+                save_upload(f, input_paths[-1])
+            body, status = merge_conversion(conversion_type, input_paths)
+            return jsonify(body), status
         
-        # 执行转换
-        try:
-            converter = CONVERTERS[conversion_type]
-            
-            # 生成输出文件路径
-            output_ext_map = {
-                'word2pdf': '.pdf', 'ppt2pdf': '.pdf', 'excel2pdf': '.pdf',
-                'img2pdf': '.pdf', 'html2pdf': '.pdf',
-                'pdf2word': '.docx', 'pdf2ppt': '.pptx',
-                'pdf2img': '.jpg', 'pdf2excel': '.xlsx',
-            }
-            output_ext = output_ext_map[conversion_type]
-            output_filename = f"{os.path.splitext(input_filename)[0]}_converted{output_ext}"
-            output_path = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
-            
-            print(f"输出文件将保存到: {output_path}")
-            
-            # 转换文件
-            result = converter.convert(input_path, output_path)
-            
-            print(f"转换完成，实际输出: {result}")
-            print(f"文件是否存在: {os.path.exists(output_path)}")
-            
-            # 返回下载链接
-            return jsonify({
-                'success': True,
-                'message': '转换成功',
-                'download_url': f'/api/download/{output_filename}',
-                'filename': output_filename
-            })
+        # 保存上传的文件（小文件暂存在内存文件系统中）
+        input_path = upload_storage.writable_path(make_upload_filename(file.filename), request.content_length)
         
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            return jsonify({'error': f'转换失败: {str(e)}'}), 500
+        print(f"保存上传文件到: {input_path}")
+        save_upload(file, input_path)
         
-        finally:
-            # 清理上传的文件
-            if os.path.exists(input_path):
-                try:
-                    os.remove(input_path)
-                except:
-                    pass
+        # 执行转换
+        body, status = start_conversion(conversion_type, input_path, async_mode, options=options)
+        return jsonify(body), status
     
     except Exception as e:
         return jsonify({'error': f'处理请求失败: {str(e)}'}), 500
 
 
-@app.route('/api/download/<filename>')
-def download_file(filename):
-    """下载文件"""
+def extract_archive(archive_path, target_dir, max_bytes, max_files, max_ratio):
+    """
+    解压上传的ZIP（跳过绝对路径和指向目录外的条目），返回解压出的文件路径
+
+    Args:
+        max_bytes: 解压后的总字节数上限
+        max_files: 文件数上限
+        max_ratio: 单个文件的压缩比上限（只检查解压后超过1MB的文件）
+
+    Raises:
+        UploadError: 超出上限（413），在写满磁盘之前停止解压
+    """
+    extracted = []
+    total = 0
+    target_root = os.path.realpath(target_dir)
+    with zipfile.ZipFile(archive_path) as archive:
+        members = [member for member in archive.infolist() if not member.is_dir()]
+        if len(members) > max_files:
+            raise UploadError(f'压缩包中的文件过多，最多 {max_files} 个', 413)
+        for member in members:
+            path = os.path.realpath(os.path.join(target_root, member.filename))
+            if not path.startswith(target_root + os.sep):
+                continue
+            if total + member.file_size > max_bytes:
+                raise UploadError(f'压缩包解压后过大，最大支持 {max_bytes // (1024 * 1024)}MB', 413)
+            if member.file_size > 1024 * 1024 and member.file_size > max_ratio * max(1, member.compress_size):
+                raise UploadError(f'压缩包中的文件压缩比异常: {member.filename}', 413)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 按实际解压的字节数计数（条目头部声明的大小可能是伪造的）
+            with archive.open(member) as src, open(path, 'wb') as dst:
+                for chunk in iter(lambda: src.read(1024 * 1024), b''):
+                    total += len(chunk)
+                    if total > max_bytes:
+                        raise UploadError(f'压缩包解压后过大，最大支持 {max_bytes // (1024 * 1024)}MB', 413)
+                    dst.write(chunk)
+            extracted.append(path)
+    return extracted
+
+
+@app.route('/api/batch', methods=['POST'])
+def convert_batch():
+    """
+    批量转换API：一次提交多个文件（重复 file 字段），或一个包含输入文件及其引用资源
+    （CSS、图片等，保持相对路径）的ZIP（archive 字段），每个输入各自转换，结果打包为一个ZIP
+    """
+    conversion_type = request.form.get('type')
+    if not conversion_type or conversion_type not in CONVERTERS:
+        return jsonify({'error': '无效的转换类型'}), 400
+    converter = CONVERTERS[conversion_type]
+    if not converter.supports_batch:
+        return jsonify({'error': '该转换类型不支持批量转换'}), 400
+    
+    batch_dir = tempfile.mkdtemp(prefix='batch_', dir=app.config['UPLOAD_FOLDER'])
     try:
-        file_path = os.path.join(app.config['OUTPUT_FOLDER'], filename)
+        input_dir = os.path.join(batch_dir, 'in')
+        os.makedirs(input_dir)
+        saved = []
+        for f in request.files.getlist('file'):
+            if f.filename:
+                saved.append(os.path.join(input_dir, secure_filename(f.filename)))
+                f.save(saved[-1])
+        archive = request.files.get('archive')
+        if archive and archive.filename:
+            archive_path = os.path.join(batch_dir, 'upload.zip')
+            archive.save(archive_path)
+            try:
+                saved.extend(extract_archive(archive_path, input_dir,
+                                             max_bytes=app.config['ARCHIVE_MAX_MB'] * 1024 * 1024,
+                                             max_files=app.config['ARCHIVE_MAX_FILES'],
+                                             max_ratio=app.config['ARCHIVE_MAX_RATIO']))
+            except zipfile.BadZipFile:
+                return jsonify({'error': '压缩包无效'}), 400
+            except UploadError as e:
+                return jsonify({'error': str(e)}), e.status
         
-        # 调试信息
-        print(f"尝试下载文件: {filename}")
-        print(f"完整路径: {file_path}")
-        print(f"文件是否存在: {os.path.exists(file_path)}")
+        inputs = sorted(path for path in saved if allowed_file(path, conversion_type))
+        if not inputs:
+            return jsonify({'error': '没有可转换的文件'}), 400
         
-        if not os.path.exists(file_path):
-            # 列出outputs目录下的所有文件
-            if os.path.exists(app.config['OUTPUT_FOLDER']):
-                files = os.listdir(app.config['OUTPUT_FOLDER'])
-                print(f"outputs目录下的文件: {files}")
-            return jsonify({'error': '文件不存在', 'path': file_path}), 404
+        # 解压目录是本次请求独占的，页面可以读取其中的CSS、图片等（不能读取共享的上传目录）
+        if hasattr(converter, 'local_root'):
+            converter = copy.copy(converter)
+            converter.local_root = input_dir
         
-        # 下载文件后，设置回调来删除文件
-        response = send_file(file_path, as_attachment=True, download_name=filename)
+        output_ext = converter.output_extension
+        output_dir = os.path.join(batch_dir, 'out')
+        tasks = [(path, os.path.join(output_dir, os.path.splitext(os.path.relpath(path, input_dir))[0] + output_ext))
+                 for path in inputs]
+        converted, failed = [], []
+        for input_path, result, error in converter.convert_batch(tasks):
+            if error is None:
+                converted.append(result)
+            else:
+                failed.append({'file': os.path.relpath(input_path, input_dir), 'error': error})
+        if not converted:
+            return jsonify({'error': '全部文件转换失败', 'failed': failed}), 500
         
-        # 可选：延迟删除文件（下载完成后）
-        # 这里暂时不删除，让文件保留一段时间以便用户多次下载
+        output_filename = f"batch_{uuid.uuid4().hex[:8]}_converted.zip"
+        output_path = output_storage.writable_path(output_filename, sum(os.path.getsize(p) for p in converted))
         
-        return response
+        def entries():
+            for path in sorted(converted):
+                with open(path, 'rb') as f:
+                    yield os.path.relpath(path, output_dir).replace(os.sep, '/'), f.read()
+        
+        write_zip(entries(), output_path)
+        publish_output(output_filename)
+        print(f"批量转换完成: 成功 {len(converted)} 个，失败 {len(failed)} 个")
+        
+        return jsonify({
+            'success': True,
+            'message': '转换成功',
+            'download_url': f'/api/download/{output_filename}',
+            'filename': output_filename,
+            'converted': len(converted),
+            'failed': failed,
+        }), 200
+    
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': f'批量转换失败: {str(e)}'}), 500
+    
+    finally:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+
+
+@app.route('/api/pipeline', methods=['POST'])
+def convert_pipeline():
+    """
+    流水线转换API：在服务端依次执行多个转换，只返回最终结果
+    
+    表单字段 file 为输入文件，pipeline 为流水线写法（如 word2pdf|pdf2img,pdf2word）。
+    """
+    if 'file' not in request.files or request.files['file'].filename == '':
+        return jsonify({'error': '没有文件上传'}), 400
+    file = request.files['file']
+    
+    try:
+        pipeline = Pipeline.parse(request.form.get('pipeline', ''))
+    except PipelineError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if os.path.splitext(file.filename)[1].lower() not in pipeline.input_extensions:
+        return jsonify({'error': '不支持的文件格式'}), 400
+    
+    input_path = upload_storage.writable_path(make_upload_filename(file.filename), request.content_length)
+    save_upload(file, input_path)
+    try:
+        input_size = os.path.getsize(input_path)
+        stem = os.path.splitext(os.path.basename(input_path))[0]
+        output_names = {conversion_type: f"{stem}_{conversion_type}{pipeline.output_extension(conversion_type)}"
+                        for conversion_type in pipeline.branches}
+        output_paths = {conversion_type: output_storage.writable_path(name, input_size)
+                        for conversion_type, name in output_names.items()}
+        
+        # 中间结果写入本地暂存区，转换结束后删除
+        pipeline.run(input_path, output_paths, output_spool, CONVERTERS, runner=run_converter)
+        
+        outputs = []
+        for conversion_type, name in output_names.items():
+            publish_output(name)
+            outputs.append({'type': conversion_type, 'download_url': f'/api/download/{name}', 'filename': name})
+        return jsonify({'success': True, 'message': '转换成功', 'pipeline': str(pipeline), 'outputs': outputs})
+    
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': f'转换失败: {str(e)}'}), 500
+    
+    finally:
+        if os.path.exists(input_path):
+            try:
+                os.remove(input_path)
+            except OSError:
+                pass
+
+
+@app.route('/api/uploads', methods=['POST'])
+def create_upload():
+    """
+    创建分块上传会话
+    
+    请求体JSON: {"filename": ..., "size": 总字节数, "type": 转换类型（可选）, "mode": "async"（可选）,
+                "pages": 页码范围（可选）, "profile": 渲染配置（可选）}
+    提供 type 时，最后一个分块写入后立即开始转换。
+    """
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename', '')
+    conversion_type = data.get('type')
+    
+    if not filename:
+        return jsonify({'error': '没有提供文件名'}), 400
+    
+    if conversion_type is not None:
+        if conversion_type not in CONVERTERS:
+            return jsonify({'error': '无效的转换类型'}), 400
+        if not allowed_file(filename, conversion_type):
+            return jsonify({'error': '不支持的文件格式'}), 400
+        try:
+            converter_for(conversion_type, request_options(data))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    
+    try:
+        upload = upload_manager.create(filename, int(data.get('size', 0)),
+                                       dict(request_options(data), type=conversion_type, mode=data.get('mode')))
+    except (TypeError, ValueError):
+        return jsonify({'error': '文件大小无效'}), 400
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    # 放弃的上传按分块文件和元数据的修改时间过期（进行中的上传每写入一块都会刷新修改时间）
+    janitor.track(upload.part_path)
+    janitor.track(upload.meta_path)
+    
+    info = upload.to_dict()
+    info['upload_url'] = f'/api/uploads/{upload.id}'
+    return jsonify(info), 201
+
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """查询分块上传的进度（断点续传时从返回的 offset 继续）"""
+    upload = upload_manager.get(upload_id)
+    if upload is None:
+        return jsonify({'error': '上传不存在或已过期'}), 404
+    return jsonify(upload.to_dict())
+
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def put_upload_chunk(upload_id):
+    """
+    写入一个分块
+    
+    请求头 Upload-Offset 指定分块的起始偏移量，请求体为分块的原始字节。
+    """
+    upload = upload_manager.get(upload_id)
+    if upload is None:
+        return jsonify({'error': '上传不存在或已过期'}), 404
+    
+    try:
+        offset = int(request.headers.get('Upload-Offset', request.args.get('offset', 0)))
+        upload_manager.write_chunk(upload, offset, request.stream)
+    except ValueError:
+        return jsonify({'error': '偏移量无效'}), 400
+    except UploadError as e:
+        info = upload.to_dict()
+        info['error'] = str(e)
+        return jsonify(info), e.status
+    
+    # 创建时指定了转换类型：最后一个分块提交后立即开始转换
+    if upload.complete and upload.options.get('type'):
+        return finish_upload(upload, upload.options['type'], upload.options.get('mode') == 'async',
+                             request_options(upload.options))
+    return jsonify(upload.to_dict())
+
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def complete_upload(upload_id):
+    """结束上传并开始转换（参数 type、mode、pages、profile 同 /api/convert）"""
+    upload = upload_manager.get(upload_id)
+    if upload is None:
+        return jsonify({'error': '上传不存在或已过期'}), 404
+    
+    data = request.get_json(silent=True) or request.form
+    conversion_type = data.get('type') or upload.options.get('type')
+    if not conversion_type or conversion_type not in CONVERTERS:
+        return jsonify({'error': '无效的转换类型'}), 400
+    if not allowed_file(upload.filename, conversion_type):
+        return jsonify({'error': '不支持的文件格式'}), 400
+    options = dict(request_options(upload.options), **request_options(data))
+    try:
+        converter_for(conversion_type, options)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return finish_upload(upload, conversion_type, (data.get('mode') or upload.options.get('mode')) == 'async',
+                         options)
+
+
+def finish_upload(upload, conversion_type, async_mode, options=None):
+    """把已完成的分块上传交给转换流程，增量计算的哈希直接用于结果缓存"""
+    # 分块文件与上传目录在同一文件系统中，直接改名
+    input_path = os.path.join(app.config['UPLOAD_FOLDER'], make_upload_filename(upload.filename))
+    try:
+        digest = upload_manager.finish(upload, input_path)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    janitor.track(input_path)
+    
+    body, status = start_conversion(conversion_type, input_path, async_mode, digest=digest, options=options)
+    return jsonify(body), status
+
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """查询异步转换任务的状态"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    
+    info = job.to_dict()
+    if job.state == 'done':
+        output_filename = os.path.basename(job.output_path)
+        info['download_url'] = f'/api/download/{output_filename}'
+        info['filename'] = output_filename
+    return jsonify(info)
+
+
+@app.route('/api/download/<filename>')
+def download_file(filename):
+    """下载文件（支持ETag条件请求和Range断点续传）"""
+    try:
+        filename = secure_filename(filename)
+        stored = output_storage.stat(filename)
+        if stored is None:
+            print(f"下载的文件不存在: {filename}")
+            return jsonify({'error': '文件不存在'}), 404
+        
+        # 本地文件由send_file处理 If-None-Match / If-Modified-Since / Range
+        local_path = output_storage.local_path(filename)
+        if local_path:
+            return send_file(local_path, as_attachment=True, download_name=filename,
+                             conditional=True, etag=stored.etag)
+        
+        return remote_download(filename, stored)
     
     except Exception as e:
         print(f"下载错误: {str(e)}")
@@ -209,24 +813,151 @@ def download_file(filename):
         return jsonify({'error': f'下载失败: {str(e)}'}), 500
 
 
+def remote_download(filename, stored):
+    """从对象存储按需读取，只传输请求的字节范围"""
+    response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+    response.set_etag(stored.etag)
+    response.last_modified = stored.mtime
+    response.accept_ranges = 'bytes'
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    
+    if request.if_none_match.contains(stored.etag):
+        response.status_code = 304
+        return response
+    
+    start, stop = 0, stored.size
+    # If-Range 与当前版本不一致时忽略Range，返回完整文件
+    if request.range is not None and (not request.if_range or request.if_range.etag == stored.etag):
+        byte_range = request.range.range_for_length(stored.size)
+        if byte_range is None:
+            response.status_code = 416
+            response.headers['Content-Range'] = f'bytes */{stored.size}'
+            return response
+        start, stop = byte_range
+        response.status_code = 206
+        response.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{stored.size}'
+    
+    response.response = output_storage.iter_range(filename, start, stop)
+    response.content_length = stop - start
+    return response
+
+
+@app.route('/api/stream/<conversion_type>/<filename>')
+def stream_archive(conversion_type, filename):
+    """边转换边以ZIP流式下载多文件输出（完整传输的压缩包写入结果缓存，再次下载时直接返回）"""
+    if conversion_type not in CONVERTERS or not CONVERTERS[conversion_type].supports_streaming:
+        return jsonify({'error': '该转换类型不支持流式下载'}), 404
+    try:
+        converter = converter_for(conversion_type, request_options(request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    input_path = upload_storage.local_path(secure_filename(filename))
+    if input_path is None:
+        return jsonify({'error': '文件不存在或已过期'}), 404
+    
+    archive_name = f"{os.path.splitext(filename)[0]}_converted.zip"
+    output_ext = converter.output_extension
+    # 缓存键按服务器上的文件内容计算，不使用请求参数中的摘要
+    cache_key = ResultCache.make_key(file_digest(input_path), conversion_type, converter.get_options())
+    cached_path = result_cache.get(cache_key, output_ext)
+    if cached_path:
+        print(f"命中结果缓存: {cached_path}")
+        return send_file(cached_path, mimetype='application/zip', as_attachment=True,
+                         download_name=archive_name, conditional=True)
+    
+    stats = {'pages': 0, 'bytes_out': 0}
+    started_at = time.perf_counter()
+    # sandboxed 转换器在有资源限制的工作进程中渲染（进行中的转换数由任务队列计数）
+    sandboxed = converter.sandboxed
+    
+    def counted_entries():
+        entries = job_queue.stream(converter, input_path) if sandboxed else converter.iter_entries(input_path)
+        try:
+            for name, data in entries:
+                stats['pages'] += 1
+                yield name, data
+        finally:
+            entries.close()
+    
+    def finish(status):
+        if not sandboxed:
+            metrics.IN_FLIGHT.dec(type=conversion_type)
+        metrics.record_conversion(conversion_type, status, time.perf_counter() - started_at,
+                                  os.path.getsize(input_path), stats['bytes_out'], stats['pages'])
+    
+    if not sandboxed:
+        metrics.IN_FLIGHT.inc(type=conversion_type)
+    chunks = stream_zip(counted_entries())
+    # 先取出第一段数据，使渲染开始阶段的错误仍能以JSON返回
+    try:
+        first_chunk = next(chunks, b'')
+    except Exception as e:
+        finish('failure')
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': f'转换失败: {str(e)}'}), 500
+    
+    def generate():
+        status = 'failure'
+        # 边发送边写入缓存目录中的临时文件，传输完整后再加入缓存
+        tee_path = result_cache.temp_path(cache_key, output_ext)
+        tee = None
+        try:
+            try:
+                tee = open(tee_path, 'wb')
+            except OSError as e:
+                print(f"写入结果缓存失败: {e}")
+            for chunk in itertools.chain([first_chunk], chunks):
+                stats['bytes_out'] += len(chunk)
+                if tee:
+                    try:
+                        tee.write(chunk)
+                    except OSError as e:
+                        # 写缓存失败不影响下载
+                        print(f"写入结果缓存失败: {e}")
+                        tee.close()
+                        tee = None
+                yield chunk
+            status = 'success'
+            if tee:
+                tee.close()
+                result_cache.put(cache_key, output_ext, tee_path, move=True)
+        except Exception as e:
+            if status == 'success':
+                # 数据已完整发送，只是没有加入缓存
+                print(f"写入结果缓存失败: {e}")
+            else:
+                # 响应头已发送，只能中断传输
+                print(f"流式转换中断 {filename}: {e}")
+                raise
+        finally:
+            # 客户端断开时也关闭条目生成器，停止工作进程中的渲染
+            chunks.close()
+            if tee:
+                tee.close()
+            # 传输中断或写缓存失败时删除临时文件（加入缓存后已改名）
+            if os.path.exists(tee_path):
+                os.remove(tee_path)
+            finish(status)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{archive_name}"'},
+    )
+
+
+@app.route('/api/health')
+def health():
+    """健康检查：返回各转换引擎的预热结果（预热在开始监听之前完成）和各调度通道排队的任务数"""
+    return jsonify({'status': 'ready', 'warm_up': warm_up_results, 'queue': job_queue.pending()})
+
+
 @app.route('/api/info')
 def get_info():
     """获取支持的转换类型信息"""
-    info = {
-        'to_pdf': {
-            'word2pdf': {'name': 'Word转PDF', 'formats': ['.docx', '.doc']},
-            'ppt2pdf': {'name': 'PPT转PDF', 'formats': ['.pptx', '.ppt']},
-            'excel2pdf': {'name': 'Excel转PDF', 'formats': ['.xlsx', '.xls']},
-            'img2pdf': {'name': '图片转PDF', 'formats': ['.jpg', '.jpeg', '.png', '.bmp', '.gif']},
-            'html2pdf': {'name': 'HTML转PDF', 'formats': ['.html', '.htm']},
-        },
-        'from_pdf': {
-            'pdf2word': {'name': 'PDF转Word', 'formats': ['.pdf']},
-            'pdf2ppt': {'name': 'PDF转PPT', 'formats': ['.pdf']},
-            'pdf2img': {'name': 'PDF转图片', 'formats': ['.pdf']},
-            'pdf2excel': {'name': 'PDF转Excel', 'formats': ['.pdf']},
-        }
-    }
+    info = REGISTRY.describe()
     return jsonify(info)
 
 
@@ -239,5 +970,8 @@ if __name__ == '__main__':
     print(f"输出文件夹: {app.config['OUTPUT_FOLDER']}")
     print(f"上传文件夹存在: {os.path.exists(app.config['UPLOAD_FOLDER'])}")
     print(f"输出文件夹存在: {os.path.exists(app.config['OUTPUT_FOLDER'])}")
+    print("开发服务器仅用于本地调试，生产环境请使用: python serve.py")
     print("=" * 50)
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    init_worker()
+    # 调试器允许执行任意代码，只在显式设置 FLASK_DEBUG=1 时启用
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', host='0.0.0.0', port=5000)
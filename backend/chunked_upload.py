@@ -0,0 +1,246 @@
+"""分块、可断点续传的大文件上传
+
+每个分块直接追加写入磁盘上的 ``<upload_id>.part`` 文件，同时增量计算SHA-256，
+上传完成时即可得到文件哈希用于结果缓存去重。上传元数据保存在
+``<upload_id>.json`` 中，服务重启后仍可按已写入的偏移量继续上传。
+
+多个Web进程（serve.py）共享上传目录，同一上传的分块可能由不同进程处理：
+已提交的偏移量总是取 ``.part`` 文件的大小，读取和写入都在文件锁（fcntl）下进行。
+每个进程只对其他进程追加的部分补算哈希，不会每个请求都重新读取整个文件。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows：只有单进程的开发服务器
+    fcntl = None
+
+
+class UploadError(Exception):
+    """上传请求无效（偏移量不匹配、超出大小等）"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class ChunkedUpload:
+    """一次分块上传的状态"""
+
+    def __init__(self, upload_id: str, filename: str, total_size: int, upload_dir: str,
+                 options: Optional[dict] = None):
+        self.id = upload_id
+        self.filename = filename
+        self.total_size = total_size
+        self.options = options or {}
+        self.part_path = os.path.join(upload_dir, f"{upload_id}.part")
+        self.meta_path = os.path.join(upload_dir, f"{upload_id}.json")
+        # 已提交的字节数（最近一次在文件锁下读取的 .part 文件大小）
+        self.offset = 0
+        # 本进程已计入哈希的字节数，落后于 offset 时补算其他进程写入的部分
+        self.sha = hashlib.sha256()
+        self.hashed = 0
+        self.lock = threading.Lock()
+
+    @property
+    def complete(self) -> bool:
+        return self.offset == self.total_size
+
+    def to_dict(self) -> dict:
+        return {
+            'upload_id': self.id,
+            'filename': self.filename,
+            'size': self.total_size,
+            'offset': self.offset,
+            'complete': self.complete,
+        }
+
+    def save_meta(self):
+        with open(self.meta_path, 'w', encoding='utf-8') as f:
+            json.dump({'filename': self.filename, 'size': self.total_size, 'options': self.options}, f)
+
+
+class ChunkedUploadManager:
+    """管理进行中的分块上传"""
+
+    def __init__(self, upload_dir: str, max_size: int, expire_seconds: int = 3600,
+                 read_size: int = 1024 * 1024):
+        """
+        Args:
+            upload_dir: 分块文件存放目录
+            max_size: 单个文件的最大字节数
+            expire_seconds: 超过该时间没有新分块的上传会话视为放弃
+            read_size: 从请求流读取的块大小
+        """
+        self.upload_dir = upload_dir
+        self.max_size = max_size
+        self.expire_seconds = expire_seconds
+        self.read_size = read_size
+        self._uploads = {}
+        self._lock = threading.Lock()
+        os.makedirs(upload_dir, exist_ok=True)
+
+    def create(self, filename: str, total_size: int, options: Optional[dict] = None) -> ChunkedUpload:
+        """
+        创建上传会话
+
+        Args:
+            filename: 原始文件名
+            total_size: 文件总字节数
+            options: 上传完成后使用的转换参数（可选）
+        """
+        if total_size <= 0:
+            raise UploadError('文件大小无效')
+        if total_size > self.max_size:
+            raise UploadError(f'文件过大，最大支持 {self.max_size // (1024 * 1024)}MB', 413)
+
+        upload = ChunkedUpload(uuid.uuid4().hex, filename, total_size, self.upload_dir, options)
+        open(upload.part_path, 'wb').close()
+        upload.save_meta()
+        with self._lock:
+            self._prune()
+            self._uploads[upload.id] = upload
+        return upload
+
+    def get(self, upload_id: str) -> Optional[ChunkedUpload]:
+        """获取上传会话（进程内没有时从磁盘上的元数据恢复），偏移量重新从磁盘读取"""
+        if not upload_id.isalnum():
+            return None
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+            if upload is None:
+                upload = self._load(upload_id)
+                if upload is None:
+                    return None
+                self._uploads[upload_id] = upload
+        try:
+            with upload.lock, self._open_part(upload, 'rb') as f:
+                upload.offset = os.fstat(f.fileno()).st_size
+        except UploadError:
+            # 已由其他进程完成或已被清理
+            with self._lock:
+                self._uploads.pop(upload_id, None)
+            return None
+        return upload
+
+    def _load(self, upload_id: str) -> Optional[ChunkedUpload]:
+        meta_path = os.path.join(self.upload_dir, f"{upload_id}.json")
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        upload = ChunkedUpload(upload_id, meta['filename'], meta['size'], self.upload_dir, meta.get('options'))
+        if not os.path.exists(upload.part_path):
+            return None
+        # 已写入部分的哈希在下次写入或完成时补算
+        return upload
+
+    @staticmethod
+    def _open_part(upload: ChunkedUpload, mode: str):
+        """打开并锁定分块文件（调用方需持有 upload.lock）；文件已不存在（上传已完成）时抛出 UploadError"""
+        try:
+            f = open(upload.part_path, mode)
+        except FileNotFoundError:
+            raise UploadError('上传不存在或已完成', 404)
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if mode == 'rb' else fcntl.LOCK_EX)
+            # 等待锁期间其他进程可能已完成上传（分块文件已改名）
+            try:
+                current = os.stat(upload.part_path)
+            except OSError:
+                current = None
+            if current is None or current.st_ino != os.fstat(f.fileno()).st_ino:
+                f.close()
+                raise UploadError('上传不存在或已完成', 404)
+        return f
+
+    def _sync(self, upload: ChunkedUpload, f):
+        """在文件锁下读取已提交的偏移量，并补算其他进程写入部分的哈希"""
+        upload.offset = os.fstat(f.fileno()).st_size
+        if upload.hashed < upload.offset:
+            f.seek(upload.hashed)
+            while upload.hashed < upload.offset:
+                chunk = f.read(min(self.read_size, upload.offset - upload.hashed))
+                if not chunk:
+                    break
+                upload.sha.update(chunk)
+                upload.hashed += len(chunk)
+
+    def write_chunk(self, upload: ChunkedUpload, offset: int, stream) -> int:
+        """
+        把请求流中的分块追加写入磁盘
+
+        Args:
+            upload: 上传会话
+            offset: 客户端声明的分块起始偏移量，必须等于已提交的字节数
+            stream: 可读的请求体流
+
+        Returns:
+            int: 写入后的偏移量
+        """
+        with upload.lock, self._open_part(upload, 'r+b') as f:
+            self._sync(upload, f)
+            if offset != upload.offset:
+                raise UploadError(f'偏移量不匹配，当前已上传 {upload.offset} 字节', 409)
+
+            written = 0
+            f.seek(upload.offset)
+            try:
+                while True:
+                    chunk = stream.read(self.read_size)
+                    if not chunk:
+                        break
+                    if upload.offset + written + len(chunk) > upload.total_size:
+                        raise UploadError('分块超出声明的文件大小', 413)
+                    f.write(chunk)
+                    upload.sha.update(chunk)
+                    written += len(chunk)
+            finally:
+                # 连接中断时只提交已写入并计入哈希的部分，客户端可从新的偏移量继续
+                f.truncate(upload.offset + written)
+                f.flush()
+                upload.offset += written
+                upload.hashed = upload.offset
+
+            # 刷新元数据的修改时间，避免进行中的上传被当作过期文件清理
+            os.utime(upload.meta_path)
+            return upload.offset
+
+    def finish(self, upload: ChunkedUpload, final_path: str) -> str:
+        """
+        结束上传：把分块文件移动到最终路径
+
+        Returns:
+            str: 文件内容的SHA-256
+        """
+        with upload.lock, self._open_part(upload, 'r+b') as f:
+            self._sync(upload, f)
+            if not upload.complete:
+                raise UploadError(f'上传未完成，当前已上传 {upload.offset}/{upload.total_size} 字节', 409)
+            # 持有文件锁时改名，等待锁的其他进程随后发现分块文件已不存在
+            os.replace(upload.part_path, final_path)
+            try:
+                os.remove(upload.meta_path)
+            except OSError:
+                pass
+            with self._lock:
+                self._uploads.pop(upload.id, None)
+            return upload.sha.hexdigest()
+
+    def _prune(self):
+        """丢弃长时间没有新分块的上传会话记录（调用方需持有锁）"""
+        deadline = time.time() - self.expire_seconds
+        for upload_id, upload in list(self._uploads.items()):
+            try:
+                if os.path.getmtime(upload.meta_path) < deadline:
+                    del self._uploads[upload_id]
+            except OSError:
+                del self._uploads[upload_id]
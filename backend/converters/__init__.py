@@ -1,4 +1,5 @@
 """转换器模块"""
+from .registry import REGISTRY, ConverterRegistry
 from .to_pdf_converter import (
     WordToPDFConverter,
     PPTToPDFConverter,
@@ -15,6 +16,8 @@ from .from_pdf_converter import (
 )
 
 __all__ = [
+    'REGISTRY',
+    'ConverterRegistry',
     'WordToPDFConverter',
     'PPTToPDFConverter',
     'ExcelToPDFConverter',
@@ -1,12 +1,94 @@
 """基础转换器抽象类"""
 from abc import ABC, abstractmethod
 from typing import Optional
+import copy
 import os
 
+from ..metrics import instrument_conversion
+from .page_range import normalize_page_ranges, resolve_page_ranges
+from .registry import REGISTRY
+
+
+def default_parallelism() -> int:
+    """
+    单个转换默认使用的并行进程/线程数（pdf2docx进程数、poppler渲染线程数等）
+
+    在转换工作进程池（backend/sandbox.py）中，每个工作进程一次只执行一个转换，
+    取工作进程设置的环境变量 CONVERT_TASK_THREADS（默认为 CPU核心数 ÷ 工作进程数，至少1），
+    避免 工作进程数 × CPU核心数 的超额订阅；命令行等直接调用时默认等于CPU核心数。
+    在转换时而不是创建转换器时计算：Web进程中创建的转换器会被传到工作进程执行。
+    """
+    return int(os.environ.get('CONVERT_TASK_THREADS', 0)) or os.cpu_count() or 1
+
 
 class BaseConverter(ABC):
     """所有转换器的基类"""
     
+    # 转换类型标识（如 'word2pdf'），用于指标标签等，由子类声明
+    conversion_type = ''
+    
+    # 显示名称和类别（'to_pdf' / 'from_pdf'），用于 /api/info
+    display_name = ''
+    category = ''
+    
+    # 支持的输入文件扩展名（包含点号，小写）
+    input_extensions = ()
+    
+    # 输出文件扩展名（包含点号），由子类声明
+    output_extension = '.pdf'
+    
+    # 只影响性能、不影响输出内容的参数名，不计入 get_options()
+    runtime_options = ()
+    
+    # 是否支持通过 iter_entries() 边转换边流式打包输出
+    supports_streaming = False
+    
+    # 是否支持 convert_many() 把多个输入合并为一个输出
+    supports_merge = False
+    
+    # 是否支持 convert_batch() 在一次调用中高效转换多个输入（各自输出）
+    supports_batch = False
+    
+    # 是否支持 pages 参数只转换所选页面（页码写法见 page_range.py）
+    supports_pages = False
+    
+    # 所选页码的规范写法，None 表示全部页面
+    pages = None
+    
+    # 命名的参数组合（配置名 -> {参数名: 值}），可通过 select_profile() 按请求选用
+    render_profiles = {}
+    
+    # 估算的每页耗时（秒），调度器据此区分短任务和长任务，见 backend/preflight.py
+    page_cost = 1.0
+    
+    # 是否在进程内解析输入（而非调用LibreOffice等外部程序），
+    # Web服务中这类转换放在有资源限制的工作进程中执行，异常输入不会拖垮Web进程
+    sandboxed = False
+    
+    # 预热时预先导入的模块（首次导入pdf2docx、pandas等需要数秒）
+    warm_up_modules = ()
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # 自动为子类的 convert() 和 convert_many() 记录耗时、字节数和成功/失败次数
+        for method in ('convert', 'convert_many'):
+            if method in cls.__dict__:
+                setattr(cls, method, instrument_conversion(cls.__dict__[method]))
+        # 声明了转换类型的子类注册到转换器注册表
+        if 'conversion_type' in cls.__dict__ and cls.conversion_type:
+            REGISTRY.register(cls)
+    
+    @classmethod
+    def warm_up(cls):
+        """
+        预先导入依赖库并初始化转换引擎，避免第一个请求承担冷启动耗时
+        
+        默认导入 warm_up_modules 中的模块，需要启动外部引擎的子类可以覆盖。
+        """
+        import importlib
+        for module_name in cls.warm_up_modules:
+            importlib.import_module(module_name)
+    
     @abstractmethod
     def convert(self, input_file: str, output_file: Optional[str] = None) -> str:
         """
@@ -21,6 +103,83 @@ class BaseConverter(ABC):
         """
         pass
     
+    def iter_entries(self, input_file: str):
+        """
+        逐个产出多文件输出的条目，用于流式打包下载
+        
+        Args:
+            input_file: 输入文件路径
+            
+        Yields:
+            tuple: (压缩包内文件名, 文件内容字节)
+        """
+        raise NotImplementedError(f"{type(self).__name__} 不支持流式输出")
+    
+    def convert_batch(self, tasks: list):
+        """
+        批量转换多个文件，默认逐个调用 convert()，支持批量的子类可以覆盖
+        
+        Args:
+            tasks: [(输入路径, 输出路径)]
+            
+        Yields:
+            tuple: (输入路径, 输出路径或None, 错误信息或None)
+        """
+        for input_file, output_file in tasks:
+            try:
+                yield input_file, self.convert(input_file, output_file), None
+            except Exception as e:
+                yield input_file, None, str(e)
+    
+    def select_pages(self, spec: Optional[str]):
+        """
+        返回只转换所选页面的副本（用于单次请求，不修改共享的转换器实例）
+        
+        Args:
+            spec: 页码写法（如 '1-5,9,12-'），空值表示全部页面
+        """
+        if not self.supports_pages:
+            raise ValueError(f"转换类型 '{self.conversion_type}' 不支持页码范围")
+        converter = copy.copy(self)
+        converter.pages = normalize_page_ranges(spec)
+        return converter
+    
+    def select_profile(self, name: str):
+        """
+        返回使用命名配置的副本（用于单次请求，不修改共享的转换器实例）
+        
+        Args:
+            name: render_profiles 中的配置名
+        """
+        if name not in self.render_profiles:
+            if not self.render_profiles:
+                raise ValueError(f"转换类型 '{self.conversion_type}' 不支持渲染配置")
+            raise ValueError(f"未知的渲染配置: {name}, 支持的配置: {', '.join(self.render_profiles)}")
+        converter = copy.copy(self)
+        for key, value in self.render_profiles[name].items():
+            setattr(converter, key, value)
+        converter.profile = name
+        return converter
+    
+    def page_ranges(self, page_count: int) -> list:
+        """
+        所选页面在文档中的页码范围
+        
+        Returns:
+            list: [(起始页, 结束页)]，页码从1开始，两端都包含
+        """
+        return resolve_page_ranges(self.pages, page_count)
+    
+    def get_options(self) -> dict:
+        """
+        获取影响输出结果的转换参数
+        
+        Returns:
+            dict: 实例的公开属性（用于缓存键等）
+        """
+        return {key: value for key, value in vars(self).items()
+                if not key.startswith('_') and key not in self.runtime_options}
+    
     @staticmethod
     def validate_file(file_path: str, extensions: list) -> bool:
         """
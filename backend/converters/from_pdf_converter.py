@@ -1,12 +1,46 @@
 """PDF转其他格式的转换器"""
+import io
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
-from .base_converter import BaseConverter
+from .base_converter import BaseConverter, default_parallelism
+from .page_cache import document_digest, render_pages
+from .page_range import count_pages, format_page_ranges, is_open_ended, normalize_page_ranges, split_ranges
+from ..metrics import add_pages
+from .zip_stream import write_zip
 
 
 class PDFToWordConverter(BaseConverter):
     """PDF转Word转换器"""
     
+    conversion_type = 'pdf2word'
+    display_name = 'PDF转Word'
+    category = 'from_pdf'
+    input_extensions = ('.pdf',)
+    page_cost = 1.0
+    sandboxed = True
+    supports_pages = True
+    warm_up_modules = ('pdf2docx',)
+    output_extension = '.docx'
+    runtime_options = ('cpu_count', 'multi_processing_min_pages')
+    
+    def __init__(self, start: int = 0, end: Optional[int] = None, pages: Optional[str] = None,
+                 cpu_count: Optional[int] = None, multi_processing_min_pages: int = 50):
+        """
+        Args:
+            start: 起始页（从0开始）
+            end: 结束页（不包含，默认到最后一页）
+            pages: 页码范围（如 '1-5,9,12-'，页码从1开始），指定时代替 start/end
+            cpu_count: 单个任务可使用的进程数（默认见 default_parallelism()）
+            multi_processing_min_pages: 页数达到该值才启用多进程，小文档走单进程快速路径
+        """
+        self.start = start
+        self.end = end
+        self.pages = normalize_page_ranges(pages)
+        self.cpu_count = cpu_count
+        self.multi_processing_min_pages = multi_processing_min_pages
+    
     def convert(self, input_file: str, output_file: Optional[str] = None) -> str:
         """将PDF转换为Word"""
         try:
@@ -14,13 +48,34 @@ class PDFToWordConverter(BaseConverter):
         except ImportError:
             raise ImportError("需要安装pdf2docx库: pip install pdf2docx")
         
-        self.validate_file(input_file, ['.pdf'])
+        self.validate_file(input_file, self.input_extensions)
         output_file = self.get_output_path(input_file, '.docx', output_file)
         
         try:
             cv = Converter(input_file)
-            cv.convert(output_file)
-            cv.close()
+            try:
+                page_count = len(cv.fitz_doc)
+                if self.pages is not None:
+                    ranges = self.page_ranges(page_count)
+                else:
+                    ranges = [(self.start + 1, min(self.end, page_count) if self.end is not None else page_count)]
+                add_pages(max(0, count_pages(ranges)))
+                
+                if len(ranges) == 1:
+                    # 连续的页面：pdf2docx按页范围把版面分析分配到多个进程
+                    first, last = ranges[0]
+                    cpu_count = self.cpu_count or default_parallelism()
+                    multi_processing = (cpu_count > 1 and
+                                        last - first + 1 >= self.multi_processing_min_pages)
+                    cv.convert(output_file, start=first - 1, end=last,
+                               multi_processing=multi_processing,
+                               cpu_count=cpu_count if multi_processing else 0)
+                else:
+                    # 不连续的页面：pdf2docx的 pages 参数（从0开始的页码列表）只支持单进程
+                    cv.convert(output_file, pages=[page - 1 for first, last in ranges
+                                                   for page in range(first, last + 1)])
+            finally:
+                cv.close()
             return output_file
         except Exception as e:
             raise RuntimeError(f"PDF转Word失败: {str(e)}")
@@ -29,44 +84,91 @@ class PDFToWordConverter(BaseConverter):
 class PDFToPPTConverter(BaseConverter):
     """PDF转PowerPoint转换器"""
     
+    conversion_type = 'pdf2ppt'
+    display_name = 'PDF转PPT'
+    category = 'from_pdf'
+    input_extensions = ('.pdf',)
+    page_cost = 0.4
+    sandboxed = True
+    supports_pages = True
+    warm_up_modules = ('pdf2image', 'pptx', 'PIL.Image')
+    output_extension = '.pptx'
+    runtime_options = ('thread_count', 'window_size')
+    
+    def __init__(self, dpi: int = 200, image_format: str = 'JPEG', jpeg_quality: int = 85,
+                 pages: Optional[str] = None, thread_count: Optional[int] = None, window_size: Optional[int] = None):
+        """
+        Args:
+            dpi: 页面渲染分辨率
+            image_format: 幻灯片图片格式，JPEG 或 PNG
+            jpeg_quality: JPEG质量（1-95）
+            pages: 页码范围（如 '1-5,9,12-'，页码从1开始），默认全部页面
+            thread_count: 并行渲染/编码的线程数（默认见 default_parallelism()）
+            window_size: 每批渲染的页数（默认为线程数的2倍）
+        """
+        image_format = image_format.upper()
+        if image_format not in ('JPEG', 'PNG'):
+            raise ValueError(f"不支持的图片格式: {image_format}, 支持的格式: JPEG, PNG")
+        self.dpi = dpi
+        self.image_format = image_format
+        self.jpeg_quality = jpeg_quality
+        self.pages = normalize_page_ranges(pages)
+        self.thread_count = thread_count
+        self.window_size = window_size
+    
+    def _encode_page(self, image) -> io.BytesIO:
+        """把页面图片编码到内存缓冲区并释放位图"""
+        buffer = io.BytesIO()
+        if self.image_format == 'JPEG':
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            image.save(buffer, 'JPEG', quality=self.jpeg_quality)
+        else:
+            image.save(buffer, 'PNG')
+        image.close()
+        buffer.seek(0)
+        return buffer
+    
     def convert(self, input_file: str, output_file: Optional[str] = None) -> str:
         """将PDF转换为PowerPoint"""
         try:
-            from pdf2image import convert_from_path
+            from pdf2image import pdfinfo_from_path
             from pptx import Presentation
             from pptx.util import Inches
         except ImportError:
             raise ImportError("需要安装pdf2image和python-pptx库: pip install pdf2image python-pptx")
         
-        self.validate_file(input_file, ['.pdf'])
+        self.validate_file(input_file, self.input_extensions)
         output_file = self.get_output_path(input_file, '.pptx', output_file)
         
         try:
-            # 将PDF转换为图片
-            images = convert_from_path(input_file, dpi=200)
+            page_count = pdfinfo_from_path(input_file)['Pages']
+            digest = document_digest(input_file)
             
             # 创建PPT
             prs = Presentation()
             prs.slide_width = Inches(10)
             prs.slide_height = Inches(7.5)
+            blank_slide_layout = prs.slide_layouts[6]  # 空白布局
             
-            for i, image in enumerate(images):
-                # 保存临时图片
-                temp_image = f"temp_page_{i}.png"
-                image.save(temp_image, 'PNG')
-                
-                # 添加幻灯片
-                blank_slide_layout = prs.slide_layouts[6]  # 空白布局
-                slide = prs.slides.add_slide(blank_slide_layout)
-                
-                # 添加图片到幻灯片
-                left = top = Inches(0)
-                slide.shapes.add_picture(temp_image, left, top, 
-                                        width=prs.slide_width, 
-                                        height=prs.slide_height)
-                
-                # 删除临时文件
-                os.remove(temp_image)
+            # 分批并行渲染所选页面（优先使用页面缓存），在线程池中编码为内存缓冲区，不落盘临时文件
+            thread_count = self.thread_count or default_parallelism()
+            window_size = self.window_size or thread_count * 2
+            with ThreadPoolExecutor(max_workers=thread_count) as pool:
+                for first_page, last_page in split_ranges(self.page_ranges(page_count), window_size):
+                    images = render_pages(input_file, first_page, last_page, self.dpi,
+                                          thread_count=thread_count, digest=digest)
+                    buffers = list(pool.map(self._encode_page, images))
+                    del images
+                    add_pages(len(buffers))
+                    
+                    for buffer in buffers:
+                        # 添加幻灯片并把图片铺满
+                        slide = prs.slides.add_slide(blank_slide_layout)
+                        left = top = Inches(0)
+                        slide.shapes.add_picture(buffer, left, top,
+                                                width=prs.slide_width,
+                                                height=prs.slide_height)
             
             prs.save(output_file)
             return output_file
@@ -74,36 +176,209 @@ class PDFToPPTConverter(BaseConverter):
             raise RuntimeError(f"PDF转PPT失败: {str(e)}\n提示: 需要安装poppler (Windows: https://github.com/oschwartz10612/poppler-windows/releases/)")
 
 
+# PDF转图片的渲染配置：dpi 或 size（最长边的像素数，由poppler直接按目标尺寸渲染）、
+# 图片格式、质量（None 为编码器默认值）、灰度和渐进式JPEG
+RENDER_PROFILES = {
+    # 预览缩略图：pdftoppm -scale-to 直接按目标尺寸写出JPEG，不先渲染高分辨率位图再缩小，也不经过页面缓存
+    'thumbnail': {'dpi': None, 'size': 256, 'image_format': 'JPEG', 'quality': 70,
+                  'grayscale': False, 'progressive': False},
+    # 网页浏览：约等于屏幕分辨率，渐进式JPEG先显示模糊全图
+    'screen': {'dpi': 110, 'size': None, 'image_format': 'JPEG', 'quality': 80,
+               'grayscale': False, 'progressive': True},
+    'print': {'dpi': 300, 'size': None, 'image_format': 'JPEG', 'quality': 95,
+              'grayscale': False, 'progressive': False},
+}
+
+# 图片格式 -> (pdftoppm 的输出格式，不支持时为None, 扩展名)
+IMAGE_FORMATS = {
+    'JPEG': ('jpeg', '.jpg'),
+    'PNG': ('png', '.png'),
+    'WEBP': (None, '.webp'),
+}
+
+_EXTENSION_FORMATS = {'.jpg': 'JPEG', '.jpeg': 'JPEG', '.png': 'PNG', '.webp': 'WEBP'}
+
+
 class PDFToImageConverter(BaseConverter):
     """PDF转图片转换器"""
     
+    conversion_type = 'pdf2img'
+    display_name = 'PDF转图片'
+    category = 'from_pdf'
+    input_extensions = ('.pdf',)
+    page_cost = 0.3
+    sandboxed = True
+    supports_pages = True
+    render_profiles = RENDER_PROFILES
+    warm_up_modules = ('pdf2image', 'PIL.Image')
+    # 多页输出打包为一个ZIP
+    output_extension = '.zip'
+    supports_streaming = True
+    runtime_options = ('thread_count', 'window_size')
+    
+    def __init__(self, dpi: Optional[int] = None, pages: Optional[str] = None, profile: Optional[str] = None,
+                 image_format: Optional[str] = None, quality: Optional[int] = None, size: Optional[int] = None,
+                 grayscale: Optional[bool] = None, progressive: Optional[bool] = None,
+                 window_size: Optional[int] = None, thread_count: Optional[int] = None):
+        """
+        Args:
+            dpi: 渲染分辨率（默认300，或取渲染配置中的值）
+            pages: 页码范围（如 '1-5,9,12-'，页码从1开始），默认全部页面
+            profile: 渲染配置名（thumbnail、screen、print），其余参数未指定时取配置中的值
+            image_format: 图片格式，JPEG、PNG 或 WEBP
+            quality: JPEG/WebP质量（1-100）
+            size: 按最长边的像素数渲染（代替 dpi）
+            grayscale: 是否渲染为灰度图
+            progressive: 是否输出渐进式JPEG
+            window_size: 每批渲染的页数（默认为线程数的2倍），决定峰值内存
+            thread_count: 并行渲染的poppler进程数（默认见 default_parallelism()）
+        """
+        if profile is not None and profile not in RENDER_PROFILES:
+            raise ValueError(f"未知的渲染配置: {profile}, 支持的配置: {', '.join(RENDER_PROFILES)}")
+        settings = dict(RENDER_PROFILES[profile]) if profile else {
+            'dpi': 300, 'size': None, 'image_format': 'JPEG', 'quality': None,
+            'grayscale': False, 'progressive': False}
+        # 显式指定的 dpi 和 size 互相替代
+        if dpi is not None:
+            settings.update(dpi=dpi, size=None)
+        if size is not None:
+            settings.update(dpi=None, size=size)
+        for key, value in (('image_format', image_format), ('quality', quality),
+                           ('grayscale', grayscale), ('progressive', progressive)):
+            if value is not None:
+                settings[key] = value
+        settings['image_format'] = settings['image_format'].upper()
+        if settings['image_format'] not in IMAGE_FORMATS:
+            raise ValueError(f"不支持的图片格式: {settings['image_format']}, 支持的格式: {', '.join(IMAGE_FORMATS)}")
+        
+        self.profile = profile
+        self.dpi = settings['dpi']
+        self.size = settings['size']
+        self.image_format = settings['image_format']
+        self.quality = settings['quality']
+        self.grayscale = settings['grayscale']
+        self.progressive = settings['progressive']
+        self.pages = normalize_page_ranges(pages)
+        self.thread_count = thread_count
+        self.window_size = window_size
+    
+    def _save_options(self, image_format: str) -> dict:
+        """PIL编码参数"""
+        options = {}
+        if self.quality is not None and image_format in ('JPEG', 'WEBP'):
+            options['quality'] = self.quality
+        if self.progressive and image_format == 'JPEG':
+            options['progressive'] = True
+        return options
+    
+    def _render_pages(self, input_file: str, image_format: str, temp_root: Optional[str] = None):
+        """
+        按窗口分批渲染所选页面，逐页产出 (页码, 图片文件路径)
+        
+        页面缓存关闭或按目标尺寸渲染时，poppler直接把每页编码写入临时文件（WebP除外）；
+        否则先从缓存取得（或渲染并写入缓存）页面，再在线程池中编码为临时文件。两种方式都不在内存中
+        保留整份文档的位图，峰值内存与总页数无关。临时文件在下一个窗口开始渲染前删除，调用方需及时取走。
+        """
+        from pdf2image import convert_from_path, pdfinfo_from_path
+        
+        page_count = pdfinfo_from_path(input_file)['Pages']
+        # 缩略图等按尺寸渲染的结果不写入按DPI索引的页面缓存，JPEG/PNG始终由poppler直接输出
+        digest = None if self.size else document_digest(input_file)
+        poppler_format, extension = IMAGE_FORMATS[image_format]
+        save_options = self._save_options(image_format)
+        # size 为整数时pdf2image使用 pdftoppm -scale-to，直接按最长边的目标尺寸渲染
+        render_options = {'size': self.size} if self.size else {'dpi': self.dpi}
+        
+        def save_page(temp_dir, page_no, image):
+            path = os.path.join(temp_dir, f"page_{page_no}{extension}")
+            if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            image.save(path, image_format, **save_options)
+            image.close()
+            return path
+        
+        threads = self.thread_count or default_parallelism()
+        window_size = self.window_size or threads * 2
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            for first_page, last_page in split_ranges(self.page_ranges(page_count), window_size):
+                with tempfile.TemporaryDirectory(dir=temp_root) as temp_dir:
+                    thread_count = min(threads, last_page - first_page + 1)
+                    if digest is None and poppler_format is not None:
+                        jpegopt = None
+                        if poppler_format == 'jpeg' and (self.quality is not None or self.progressive):
+                            jpegopt = {'progressive': self.progressive}
+                            if self.quality is not None:
+                                jpegopt['quality'] = self.quality
+                        paths = convert_from_path(
+                            input_file,
+                            first_page=first_page,
+                            last_page=last_page,
+                            output_folder=temp_dir,
+                            fmt=poppler_format,
+                            jpegopt=jpegopt,
+                            grayscale=self.grayscale,
+                            paths_only=True,
+                            thread_count=thread_count,
+                            **render_options,
+                        )
+                    else:
+                        if digest is None:
+                            images = convert_from_path(input_file, first_page=first_page, last_page=last_page,
+                                                       grayscale=self.grayscale, thread_count=thread_count,
+                                                       **render_options)
+                        else:
+                            images = render_pages(input_file, first_page, last_page, self.dpi,
+                                                  thread_count=threads,
+                                                  colorspace='L' if self.grayscale else 'RGB', digest=digest)
+                        paths = list(pool.map(save_page, [temp_dir] * len(images),
+                                              range(first_page, last_page + 1), images))
+                        del images
+                    add_pages(len(paths))
+                    for page_no, path in enumerate(paths, start=first_page):
+                        yield page_no, path
+    
+    def iter_entries(self, input_file: str):
+        """逐页渲染并产出压缩包条目 (文件名, 图片字节)"""
+        try:
+            import pdf2image  # noqa: F401
+        except ImportError:
+            raise ImportError("需要安装pdf2image库: pip install pdf2image")
+        
+        self.validate_file(input_file, self.input_extensions)
+        base_name = os.path.splitext(os.path.basename(input_file))[0]
+        extension = IMAGE_FORMATS[self.image_format][1]
+        
+        for page_no, path in self._render_pages(input_file, self.image_format):
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.remove(path)
+            yield f"{base_name}_page_{page_no}{extension}", data
+    
     def convert(self, input_file: str, output_file: Optional[str] = None) -> str:
-        """将PDF转换为图片（每页一张）"""
+        """将PDF转换为图片（每页一张，默认打包为ZIP）"""
         try:
-            from pdf2image import convert_from_path
+            import pdf2image  # noqa: F401
         except ImportError:
             raise ImportError("需要安装pdf2image库: pip install pdf2image")
         
-        self.validate_file(input_file, ['.pdf'])
+        self.validate_file(input_file, self.input_extensions)
+        output_file = self.get_output_path(input_file, '.zip', output_file)
         
         try:
-            # 转换PDF为图片
-            images = convert_from_path(input_file, dpi=300)
+            if output_file.lower().endswith('.zip'):
+                write_zip(self.iter_entries(input_file), output_file)
+                return output_file
             
-            # 生成输出文件名
-            base_name = os.path.splitext(input_file)[0]
+            # 指定了图片输出文件时，每页一张，为多页添加序号；图片格式由扩展名决定
+            name_without_ext, ext = os.path.splitext(output_file)
+            ext = ext or IMAGE_FORMATS[self.image_format][1]
+            image_format = _EXTENSION_FORMATS.get(ext.lower(), self.image_format)
+            output_dir = os.path.dirname(os.path.abspath(output_file))
             output_files = []
             
-            for i, image in enumerate(images, start=1):
-                if output_file:
-                    # 如果指定了输出文件，为多页添加序号
-                    name_without_ext = os.path.splitext(output_file)[0]
-                    ext = os.path.splitext(output_file)[1] or '.jpg'
-                    page_output = f"{name_without_ext}_page_{i}{ext}"
-                else:
-                    page_output = f"{base_name}_page_{i}.jpg"
-                
-                image.save(page_output, 'JPEG')
+            for page_no, path in self._render_pages(input_file, image_format, temp_root=output_dir):
+                page_output = f"{name_without_ext}_page_{page_no}{ext}"
+                os.replace(path, page_output)
                 output_files.append(page_output)
             
             # 返回第一个文件路径或所有文件列表
@@ -115,20 +390,87 @@ class PDFToImageConverter(BaseConverter):
 class PDFToExcelConverter(BaseConverter):
     """PDF转Excel转换器"""
     
+    conversion_type = 'pdf2excel'
+    display_name = 'PDF转Excel'
+    category = 'from_pdf'
+    input_extensions = ('.pdf',)
+    page_cost = 0.5
+    sandboxed = True
+    supports_pages = True
+    warm_up_modules = ('pandas', 'openpyxl', 'tabula')
+    output_extension = '.xlsx'
+    runtime_options = ('thread_count', 'pages_per_chunk')
+    
+    @classmethod
+    def warm_up(cls):
+        super().warm_up()
+        # 启动常驻JVM并加载tabula
+        from .tabula_engine import warm_up
+        warm_up()
+    
+    def __init__(self, pages: Optional[str] = None, thread_count: Optional[int] = None, pages_per_chunk: int = 20):
+        """
+        Args:
+            pages: 页码范围（如 '1-5,9,12-'，页码从1开始），默认全部页面
+            thread_count: 并行提取的线程数（默认见 default_parallelism()）
+            pages_per_chunk: 每个并行提取任务处理的页数，页数不超过该值的文档只调用一次
+        """
+        self.pages = normalize_page_ranges(pages)
+        self.thread_count = thread_count
+        self.pages_per_chunk = max(1, pages_per_chunk)
+    
+    @staticmethod
+    def _page_count(input_file: str) -> Optional[int]:
+        """读取页数；未安装PyPDF2或读取失败时返回None，退回整份文档一次提取"""
+        try:
+            from PyPDF2 import PdfReader
+            return len(PdfReader(input_file).pages)
+        except Exception:
+            return None
+    
+    def _page_ranges(self, page_count: Optional[int]) -> list:
+        """
+        tabula的 pages 参数列表，每项由一个并行任务提取
+        
+        所选页面总是解析为闭区间：tabula-java 把 '20-' 解析为只有第20页。
+        """
+        if not page_count:
+            # 页数未知：整份文档（或所选页面）一次提取，无法确定省略的结束页
+            if is_open_ended(self.pages):
+                raise ValueError(f"无法读取PDF页数，页码范围 {self.pages} 需要指定结束页")
+            return [self.pages or 'all']
+        ranges = self.page_ranges(page_count)
+        if count_pages(ranges) <= self.pages_per_chunk or (self.thread_count or default_parallelism()) <= 1:
+            return ['all'] if self.pages is None else [format_page_ranges(ranges)]
+        return [f"{first}-{last}" for first, last in split_ranges(ranges, self.pages_per_chunk)]
+    
     def convert(self, input_file: str, output_file: Optional[str] = None) -> str:
         """将PDF转换为Excel"""
         try:
             import tabula
             import pandas as pd
         except ImportError:
-            raise ImportError("需要安装tabula-py和pandas库: pip install tabula-py pandas openpyxl")
+            raise ImportError("需要安装tabula-py和pandas库: pip install tabula-py jpype1 pandas openpyxl")
+        from .tabula_engine import read_tables, warm_up
         
-        self.validate_file(input_file, ['.pdf'])
+        self.validate_file(input_file, self.input_extensions)
         output_file = self.get_output_path(input_file, '.xlsx', output_file)
         
         try:
-            # 读取PDF中的所有表格
-            dfs = tabula.read_pdf(input_file, pages='all', multiple_tables=True)
+            page_count = self._page_count(input_file)
+            if page_count:
+                add_pages(count_pages(self.page_ranges(page_count)))
+            
+            # 长文档按页范围拆分，在同一个JVM中并行提取；结果按页序合并
+            page_ranges = self._page_ranges(page_count)
+            warm_up()
+            if len(page_ranges) == 1:
+                dfs = read_tables(input_file, page_ranges[0])
+            else:
+                thread_count = self.thread_count or default_parallelism()
+                with ThreadPoolExecutor(max_workers=min(thread_count, len(page_ranges))) as pool:
+                    dfs = [df for chunk in pool.map(lambda pages: read_tables(input_file, pages), page_ranges)
+                           for df in chunk]
             
             if not dfs:
                 raise ValueError("PDF中未找到表格")
@@ -0,0 +1,359 @@
+"""HTML批量渲染
+
+wkhtmltopdf每次启动都要初始化Qt和加载字体，逐个文档调用时启动开销远大于渲染本身。
+HTMLBatchRenderer 使用 ``--read-args-from-stdin``，让一个wkhtmltopdf进程依次渲染
+一批文档（每行一组参数），多批之间可以并行。
+
+AssetCache 把页面引用的远程CSS、字体和图片下载到本地缓存目录，渲染前把页面中的引用
+改写为本地文件，同一批发票页面共用的样式和字体只下载一次。只预取允许列表中的主机
+（HTMLToPDFConverter 的 asset_hosts，默认取环境变量 HTML_ASSET_HOSTS，为空时不预取），
+避免上传的页面让服务器请求内网地址。
+
+渲染时使用 ``--disable-local-file-access``，页面只能读取暂存目录、资源缓存目录和
+调用方指定的 local_root（如命令行的输入目录、批量上传的解压目录）中的文件。
+
+环境变量 HTML_ASSET_CACHE_DIR 指定缓存目录，HTML_ASSET_MAX_AGE_HOURS 指定缓存有效期
+（0 表示关闭缓存）。
+"""
+import hashlib
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urljoin, urlsplit
+from urllib.request import HTTPRedirectHandler
+
+# 页面中需要本地化的引用：<img>/<script> 等的 src、<link> 的 href、CSS中的 url() 和 @import
+_SRC_PATTERN = re.compile(rb'''(\bsrc\s*=\s*["'])(https?://[^"']+)(["'])''', re.IGNORECASE)
+_LINK_PATTERN = re.compile(rb'''<link\b[^>]*>''', re.IGNORECASE)
+_HREF_PATTERN = re.compile(rb'''(\bhref\s*=\s*["'])(https?://[^"']+)(["'])''', re.IGNORECASE)
+_CSS_URL_PATTERN = re.compile(rb'''(url\(\s*["']?)([^"')\s]+)(["']?\s*\))''', re.IGNORECASE)
+_CSS_IMPORT_PATTERN = re.compile(rb'''(@import\s+["'])([^"']+)(["'])''', re.IGNORECASE)
+_HEAD_PATTERN = re.compile(rb'<head\b[^>]*>', re.IGNORECASE)
+_BASE_PATTERN = re.compile(rb'<base\b', re.IGNORECASE)
+
+
+def host_filter(patterns):
+    """
+    由主机允许列表生成判断函数
+
+    Args:
+        patterns: 主机名列表，'*' 表示全部，'.example.com' 匹配 example.com 及其子域名
+
+    Returns:
+        callable: url -> 是否允许预取（只允许 http/https）
+    """
+    patterns = tuple(pattern.strip().lower() for pattern in patterns if pattern.strip())
+
+    def allowed(url: str) -> bool:
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            return False
+        host = parts.hostname.lower()
+        return any(pattern == '*' or host == pattern or
+                   (pattern.startswith('.') and (host == pattern[1:] or host.endswith(pattern)))
+                   for pattern in patterns)
+
+    return allowed
+
+
+def env_asset_hosts() -> tuple:
+    """环境变量 HTML_ASSET_HOSTS（逗号分隔）中允许预取资源的主机"""
+    return tuple(host.strip() for host in os.environ.get('HTML_ASSET_HOSTS', '').split(',') if host.strip())
+
+
+class _CheckedRedirectHandler(HTTPRedirectHandler):
+    """只跟随指向允许主机的重定向"""
+
+    def __init__(self, allowed):
+        super().__init__()
+        self._allowed = allowed
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        if not self._allowed(newurl):
+            return None
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+class AssetCache:
+    """远程CSS、字体和图片的本地缓存"""
+
+    def __init__(self, cache_dir: str, max_age_seconds: float = 24 * 3600, timeout: float = 15,
+                 max_bytes_per_asset: int = 20 * 1024 * 1024, failure_ttl: float = 300):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_age_seconds: 缓存有效期，过期后重新下载
+            timeout: 下载超时时间（秒）
+            max_bytes_per_asset: 单个资源的大小上限，超过时不缓存
+            failure_ttl: 下载失败的地址在多少秒内不再重试
+        """
+        self.cache_dir = cache_dir
+        self.max_age_seconds = max_age_seconds
+        self.timeout = timeout
+        self.max_bytes_per_asset = max_bytes_per_asset
+        self.failure_ttl = failure_ttl
+        # 下载失败的地址 -> 失败时间
+        self._failed = {}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path_for(self, url: str) -> str:
+        ext = os.path.splitext(urlsplit(url).path)[1].lower()
+        if not re.fullmatch(r'\.[a-z0-9]{1,5}', ext):
+            ext = ''
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode('utf-8')).hexdigest()[:32] + ext)
+
+    def _download(self, url: str, allowed):
+        """下载资源，返回 (内容, Content-Type)，失败时返回 (None, None)"""
+        from urllib.request import Request, build_opener
+
+        opener = build_opener(_CheckedRedirectHandler(allowed))
+        try:
+            with opener.open(Request(url, headers={'User-Agent': 'pdf-convert'}), timeout=self.timeout) as response:
+                data = response.read(self.max_bytes_per_asset + 1)
+                content_type = response.headers.get('Content-Type', '')
+        except Exception as e:
+            print(f"下载页面资源失败 {url}: {e}")
+            return None, None
+        if len(data) > self.max_bytes_per_asset:
+            print(f"页面资源过大，不缓存: {url}")
+            return None, None
+        return data, content_type
+
+    def fetch(self, url: str, allowed) -> Optional[str]:
+        """
+        返回资源的本地路径，缓存中没有或已过期时下载
+
+        Args:
+            url: 资源地址
+            allowed: url -> 是否允许预取，见 host_filter()
+
+        Returns:
+            str: 本地文件路径；不允许预取或下载失败时返回None（页面保留原地址）
+        """
+        if not allowed(url):
+            return None
+        path = self._path_for(url)
+        try:
+            if time.time() - os.path.getmtime(path) < self.max_age_seconds:
+                return path
+        except OSError:
+            pass
+        with self._lock:
+            failed_at = self._failed.get(url)
+            if failed_at is not None:
+                if time.time() - failed_at < self.failure_ttl:
+                    return None
+                del self._failed[url]
+
+        data, content_type = self._download(url, allowed)
+        if data is None:
+            with self._lock:
+                self._failed[url] = time.time()
+            return None
+        # 样式表（包括 fonts.googleapis.com/css?family=... 这类没有扩展名的地址）中引用的字体和图片一并缓存
+        if path.endswith('.css') or 'text/css' in content_type:
+            data = self._localize_css(data, url, allowed)
+
+        temp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"写入页面资源缓存失败: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None
+        return path
+
+    def _local_uri(self, url: str, allowed) -> Optional[bytes]:
+        path = self.fetch(url, allowed)
+        return Path(path).as_uri().encode('utf-8') if path else None
+
+    def _localize_css(self, css: bytes, css_url: str, allowed) -> bytes:
+        """把样式表中的字体、图片和 @import 引用（相对于样式表地址）改写为本地文件"""
+        def replace(match):
+            ref = match.group(2).decode('utf-8', 'replace')
+            if ref.startswith(('data:', '#')):
+                return match.group(0)
+            local = self._local_uri(urljoin(css_url, ref), allowed)
+            return match.group(1) + local + match.group(3) if local else match.group(0)
+
+        css = _CSS_URL_PATTERN.sub(replace, css)
+        return _CSS_IMPORT_PATTERN.sub(replace, css)
+
+    def localize_html(self, html: bytes, allowed) -> bytes:
+        """把页面中引用的、允许预取的远程资源改写为本地缓存文件（超链接不改写）"""
+        def replace_remote(match):
+            local = self._local_uri(match.group(2).decode('utf-8', 'replace'), allowed)
+            return match.group(1) + local + match.group(3) if local else match.group(0)
+
+        def replace_css(match):
+            if not match.group(2).lower().startswith((b'http://', b'https://')):
+                return match.group(0)
+            return replace_remote(match)
+
+        html = _SRC_PATTERN.sub(replace_remote, html)
+        html = _LINK_PATTERN.sub(lambda tag: _HREF_PATTERN.sub(replace_remote, tag.group(0)), html)
+        html = _CSS_URL_PATTERN.sub(replace_css, html)
+        return _CSS_IMPORT_PATTERN.sub(replace_css, html)
+
+
+_asset_cache = None
+_asset_cache_lock = threading.Lock()
+
+
+def get_asset_cache() -> Optional[AssetCache]:
+    """获取当前进程的页面资源缓存（首次调用时按环境变量创建），缓存关闭时返回None"""
+    global _asset_cache
+    with _asset_cache_lock:
+        if _asset_cache is None:
+            max_age_hours = float(os.environ.get('HTML_ASSET_MAX_AGE_HOURS', 24))
+            if max_age_hours <= 0:
+                return None
+            cache_dir = os.environ.get('HTML_ASSET_CACHE_DIR',
+                                       os.path.join(tempfile.gettempdir(), 'pdf-convert-assets'))
+            _asset_cache = AssetCache(cache_dir, max_age_seconds=max_age_hours * 3600)
+        return _asset_cache
+
+
+def _quote_arg(value: str) -> str:
+    """wkhtmltopdf从标准输入读取参数时按空白分隔，支持双引号和反斜杠转义"""
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+class HTMLBatchRenderer:
+    """用少量常驻的wkhtmltopdf进程批量渲染HTML"""
+
+    def __init__(self, wkhtmltopdf: str, options=(), assets: Optional[AssetCache] = None, asset_hosts=(),
+                 local_root: Optional[str] = None, chunk_size: int = 50, jobs: int = 1,
+                 timeout_base: float = 60, timeout_per_page: float = 10):
+        """
+        Args:
+            wkhtmltopdf: wkhtmltopdf可执行文件路径
+            options: 每个文档的wkhtmltopdf选项（如 ['--page-size', 'A4']）
+            assets: 页面资源缓存，None 表示不改写远程资源
+            asset_hosts: 允许预取资源的主机，见 host_filter()；为空时不预取
+            local_root: 页面可以读取的本地目录，页面中的相对路径相对于页面所在目录解析；
+                None 表示页面不能读取任何本地文件（上传到共享目录的页面必须为None）
+            chunk_size: 每个wkhtmltopdf进程渲染的文档数
+            jobs: 并行的wkhtmltopdf进程数
+            timeout_base, timeout_per_page: 每批的超时时间 = 基础时间 + 每个文档时间 × 文档数（秒）
+        """
+        self.wkhtmltopdf = wkhtmltopdf
+        self.options = list(options)
+        self.assets = assets if asset_hosts else None
+        self._allowed = host_filter(asset_hosts)
+        self.local_root = os.path.realpath(local_root) if local_root else None
+        self.chunk_size = max(1, chunk_size)
+        self.jobs = max(1, jobs)
+        self.timeout_base = timeout_base
+        self.timeout_per_page = timeout_per_page
+
+    def _base_dir(self, input_file: str) -> Optional[str]:
+        """页面相对路径的基准目录：页面位于 local_root 内时为页面所在目录，否则为None"""
+        if self.local_root is None:
+            return None
+        directory = os.path.dirname(os.path.realpath(input_file))
+        if directory != self.local_root and not directory.startswith(self.local_root.rstrip(os.sep) + os.sep):
+            return None
+        return directory
+
+    def _access_args(self, staged_dir: str) -> list:
+        """禁止读取本地文件，只允许暂存目录、资源缓存目录和 local_root"""
+        allowed = [staged_dir]
+        if self.assets is not None:
+            allowed.append(self.assets.cache_dir)
+        if self.local_root is not None:
+            allowed.append(self.local_root)
+        args = ['--disable-local-file-access']
+        for directory in allowed:
+            args += ['--allow', os.path.realpath(directory)]
+        return args
+
+    def _prepare(self, input_file: str, staged_path: str):
+        """
+        写入渲染用的页面副本：允许预取的远程资源改写为本地缓存；页面位于 local_root 内时
+        用 <base> 指向原目录，页面中的相对路径（同目录下的CSS、图片等）仍然有效
+        """
+        with open(input_file, 'rb') as f:
+            html = f.read()
+        if self.assets is not None:
+            html = self.assets.localize_html(html, self._allowed)
+        base_dir = self._base_dir(input_file)
+        if base_dir is not None and not _BASE_PATTERN.search(html):
+            base_uri = Path(base_dir).as_uri() + '/'
+            base = b'<base href="' + base_uri.encode('utf-8') + b'">'
+            head = _HEAD_PATTERN.search(html)
+            html = html[:head.end()] + base + html[head.end():] if head else base + html
+        with open(staged_path, 'wb') as f:
+            f.write(html)
+
+    def _render_chunk(self, chunk: list) -> list:
+        """用一个wkhtmltopdf进程渲染一批文档，返回 [(输入, 输出, 错误信息)]"""
+        results = []
+        with tempfile.TemporaryDirectory(prefix='html-batch-') as temp_dir:
+            access_args = self._access_args(temp_dir)
+            lines = []
+            staged = []
+            for index, (input_file, output_file) in enumerate(chunk):
+                staged_html = os.path.join(temp_dir, f"doc{index}.html")
+                staged_pdf = os.path.join(temp_dir, f"doc{index}.pdf")
+                try:
+                    self._prepare(input_file, staged_html)
+                except OSError as e:
+                    results.append((input_file, None, f"读取HTML失败: {e}"))
+                    continue
+                args = self.options + access_args + [staged_html, staged_pdf]
+                lines.append(' '.join(_quote_arg(arg) for arg in args))
+                staged.append((input_file, output_file, staged_pdf))
+
+            stderr = ''
+            if lines:
+                timeout = self.timeout_base + self.timeout_per_page * len(lines)
+                try:
+                    completed = subprocess.run([self.wkhtmltopdf, '--quiet', '--read-args-from-stdin'],
+                                               input='\n'.join(lines) + '\n', capture_output=True,
+                                               text=True, timeout=timeout)
+                    stderr = completed.stderr.strip()
+                except subprocess.TimeoutExpired:
+                    stderr = f"wkhtmltopdf超时（{timeout:.0f}秒）"
+
+            # wkhtmltopdf在部分资源加载失败时也返回非零，以是否生成输出判断每个文档的结果
+            for input_file, output_file, staged_pdf in staged:
+                if os.path.exists(staged_pdf) and os.path.getsize(staged_pdf) > 0:
+                    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+                    os.replace(staged_pdf, output_file)
+                    results.append((input_file, output_file, None))
+                else:
+                    results.append((input_file, None, stderr[-500:] or "wkhtmltopdf未生成输出"))
+        return results
+
+    def render(self, tasks: list):
+        """
+        批量渲染
+
+        Args:
+            tasks: [(HTML路径, 输出PDF路径)]
+
+        Yields:
+            tuple: (输入, 输出或None, 错误信息或None)，每批完成时产出该批的结果
+        """
+        # 文档较少时缩小每批的大小，让各个进程都分到文档
+        size = min(self.chunk_size, max(1, -(-len(tasks) // self.jobs)))
+        chunks = [tasks[i:i + size] for i in range(0, len(tasks), size)]
+        if len(chunks) <= 1 or self.jobs == 1:
+            for chunk in chunks:
+                yield from self._render_chunk(chunk)
+            return
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            for future in as_completed([pool.submit(self._render_chunk, chunk) for chunk in chunks]):
+                yield from future.result()
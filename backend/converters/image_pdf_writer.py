@@ -0,0 +1,118 @@
+"""逐页写出的图片PDF生成器
+
+每添加一页就把图片数据直接写入文件，只在内存中保留对象偏移量，
+因此内存占用与页数无关。JPEG数据以DCTDecode原样嵌入，不解码、不重新压缩；
+其他图片解码后以FlateDecode无损压缩。
+"""
+import os
+import zlib
+
+
+class ImagePDFWriter:
+    """把多张图片依次写成一个PDF，每张图片一页"""
+
+    def __init__(self, output_file: str, resolution: float = 100.0, compress_level: int = 6):
+        """
+        Args:
+            output_file: 输出PDF路径
+            resolution: 图片分辨率（DPI），决定页面尺寸
+            compress_level: 非JPEG图片的zlib压缩级别（0-9）
+        """
+        self.resolution = resolution
+        self.compress_level = compress_level
+        self._file = open(output_file, 'wb')
+        self._offsets = {}
+        self._page_ids = []
+        # 1号对象为Catalog，2号对象为Pages，在 close() 时写入
+        self._next_id = 3
+        self._file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # 中途失败（如某张图片无法解码）时删除写了一半的PDF
+            self._file.close()
+            try:
+                os.remove(self._file.name)
+            except OSError:
+                pass
+
+    @property
+    def page_count(self) -> int:
+        return len(self._page_ids)
+
+    def _write_object(self, body: bytes, stream: bytes = None, obj_id: int = None) -> int:
+        if obj_id is None:
+            obj_id = self._next_id
+            self._next_id += 1
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(f'{obj_id} 0 obj\n'.encode('ascii'))
+        self._file.write(body)
+        if stream is not None:
+            self._file.write(b'\nstream\n')
+            self._file.write(stream)
+            self._file.write(b'\nendstream')
+        self._file.write(b'\nendobj\n')
+        return obj_id
+
+    def _add_page(self, image_id: int, width: int, height: int, dpi=None):
+        dpi = dpi or self.resolution
+        page_width = width * 72.0 / dpi
+        page_height = height * 72.0 / dpi
+        content = f'q {page_width:.4f} 0 0 {page_height:.4f} 0 0 cm /Im0 Do Q'.encode('ascii')
+        content_id = self._write_object(f'<< /Length {len(content)} >>'.encode('ascii'), content)
+        page_id = self._write_object((
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width:.4f} {page_height:.4f}] '
+            f'/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>'
+        ).encode('ascii'))
+        self._page_ids.append(page_id)
+
+    def add_jpeg(self, data: bytes, width: int, height: int, mode: str, adobe_cmyk: bool = False):
+        """
+        原样嵌入JPEG数据
+
+        Args:
+            data: JPEG文件字节
+            width, height: 像素尺寸
+            mode: Pillow图像模式，RGB / L / CMYK
+            adobe_cmyk: Adobe生成的CMYK JPEG（反相存储，需要Decode数组）
+        """
+        colorspace = {'RGB': '/DeviceRGB', 'L': '/DeviceGray', 'CMYK': '/DeviceCMYK'}[mode]
+        decode = ' /Decode [1 0 1 0 1 0 1 0]' if mode == 'CMYK' and adobe_cmyk else ''
+        image_id = self._write_object((
+            f'<< /Type /XObject /Subtype /Image /Width {width} /Height {height} '
+            f'/ColorSpace {colorspace} /BitsPerComponent 8 /Filter /DCTDecode{decode} /Length {len(data)} >>'
+        ).encode('ascii'), data)
+        self._add_page(image_id, width, height)
+
+    def add_image(self, image):
+        """解码后的图片（RGB或L模式）以FlateDecode写入"""
+        colorspace = '/DeviceGray' if image.mode == 'L' else '/DeviceRGB'
+        data = zlib.compress(image.tobytes(), self.compress_level)
+        width, height = image.size
+        image_id = self._write_object((
+            f'<< /Type /XObject /Subtype /Image /Width {width} /Height {height} '
+            f'/ColorSpace {colorspace} /BitsPerComponent 8 /Filter /FlateDecode /Length {len(data)} >>'
+        ).encode('ascii'), data)
+        self._add_page(image_id, width, height)
+
+    def close(self):
+        """写入页面树、交叉引用表和文件尾"""
+        if self._file.closed:
+            return
+        kids = ' '.join(f'{page_id} 0 R' for page_id in self._page_ids)
+        self._write_object(f'<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>'.encode('ascii'),
+                           obj_id=2)
+        self._write_object(b'<< /Type /Catalog /Pages 2 0 R >>', obj_id=1)
+
+        xref_offset = self._file.tell()
+        size = self._next_id
+        lines = [f'xref\n0 {size}\n', '0000000000 65535 f \n']
+        lines.extend(f'{self._offsets[obj_id]:010d} 00000 n \n' for obj_id in range(1, size))
+        lines.append(f'trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n')
+        self._file.write(''.join(lines).encode('ascii'))
+        self._file.close()
@@ -0,0 +1,416 @@
+"""常驻的无头LibreOffice引擎池
+
+Word/PPT/Excel转PDF在Linux上通过本模块完成：预先启动若干个
+``soffice --headless`` 进程，通过UNO管道接收转换请求，
+每个进程处理一定数量的任务或内存超限后自动重启。
+
+UNO绑定（``uno`` 模块）由系统的 python3-uno 包提供，只能被系统Python导入；
+在虚拟环境中运行时需使用 ``--system-site-packages`` 创建虚拟环境，
+或把其所在目录（如 /usr/lib/python3/dist-packages）加入 PYTHONPATH。
+导入失败时退回为每个文件启动一次 ``soffice --convert-to pdf``（较慢，但功能相同）。
+
+soffice 在独立的进程组中启动（启动脚本会再启动 soffice.bin），
+超时或回收时终止整个进程组，不留下孤儿进程。
+"""
+import atexit
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+
+# 输入扩展名 -> LibreOffice PDF导出过滤器
+PDF_EXPORT_FILTERS = {
+    '.doc': 'writer_pdf_Export',
+    '.docx': 'writer_pdf_Export',
+    '.ppt': 'impress_pdf_Export',
+    '.pptx': 'impress_pdf_Export',
+    '.xls': 'calc_pdf_Export',
+    '.xlsx': 'calc_pdf_Export',
+}
+
+
+def use_office_pool() -> bool:
+    """
+    是否使用LibreOffice引擎池
+
+    环境变量 OFFICE_ENGINE 可取 libreoffice / msoffice / auto（默认），
+    auto 时非Windows平台使用LibreOffice，Windows平台沿用Microsoft Office COM。
+    """
+    engine = os.environ.get('OFFICE_ENGINE', 'auto').lower()
+    if engine == 'libreoffice':
+        return True
+    if engine == 'msoffice':
+        return False
+    return sys.platform != 'win32'
+
+
+def uno_available() -> bool:
+    """当前Python能否导入LibreOffice的UNO绑定（python3-uno）"""
+    try:
+        import uno  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def find_soffice(soffice_path: Optional[str] = None) -> Optional[str]:
+    return (soffice_path or os.environ.get('SOFFICE_PATH')
+            or shutil.which('soffice') or shutil.which('libreoffice'))
+
+
+def _kill_process_group(process: subprocess.Popen):
+    """终止以 start_new_session=True 启动的进程及其整个进程组"""
+    if process is None:
+        return
+    if hasattr(os, 'killpg'):
+        try:
+            # 新会话的进程组号等于组长的进程号；组长退出后子进程仍在组中
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+    if process.poll() is None:
+        process.kill()
+
+
+def _process_tree_rss(pid: int) -> int:
+    """读取进程及其子进程的常驻内存总量（字节，仅Linux）"""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+                        break
+            task_dir = f'/proc/{current}/task'
+            for tid in os.listdir(task_dir):
+                with open(os.path.join(task_dir, tid, 'children')) as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+def _property(name, value):
+    from com.sun.star.beans import PropertyValue
+    prop = PropertyValue()
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+
+class OfficeWorker:
+    """单个常驻的soffice进程"""
+
+    def __init__(self, soffice_path: str, startup_timeout: float = 60):
+        self.soffice_path = soffice_path
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.desktop = None
+        self.jobs_done = 0
+        self.pipe_name = None
+        self.profile_dir = None
+
+    def start(self):
+        """启动soffice并建立UNO连接"""
+        try:
+            import uno
+        except ImportError:
+            raise ImportError("需要安装LibreOffice及其Python UNO绑定: apt install libreoffice python3-uno")
+
+        self.pipe_name = f"pdfconv_{os.getpid()}_{uuid.uuid4().hex[:8]}"
+        # 每个进程使用独立的用户配置目录，否则多个soffice实例会互相加锁
+        self.profile_dir = tempfile.mkdtemp(prefix='pdfconv_office_')
+        self.process = subprocess.Popen(
+            [
+                self.soffice_path,
+                '--headless', '--invisible', '--nologo', '--nodefault',
+                '--norestore', '--nolockcheck',
+                f'-env:UserInstallation={uno.systemPathToFileUrl(self.profile_dir)}',
+                f'--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext',
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+        local_ctx = uno.getComponentContext()
+        resolver = local_ctx.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local_ctx)
+        deadline = time.time() + self.startup_timeout
+        while True:
+            try:
+                ctx = resolver.resolve(f'uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext')
+                break
+            except Exception:
+                if self.process.poll() is not None:
+                    self.stop()
+                    raise RuntimeError("LibreOffice进程启动失败")
+                if time.time() > deadline:
+                    self.stop()
+                    raise RuntimeError(f"LibreOffice启动超时({self.startup_timeout}秒)")
+                time.sleep(0.2)
+
+        self.desktop = ctx.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', ctx)
+        self.jobs_done = 0
+        print(f"[Office引擎] 已启动 soffice (pid={self.process.pid})")
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def rss(self) -> int:
+        """当前内存占用（字节）"""
+        if not self.is_alive():
+            return 0
+        return _process_tree_rss(self.process.pid)
+
+    def convert(self, input_file: str, output_file: str, filter_name: str, timeout: float):
+        """
+        在该进程中把文档导出为PDF
+
+        超时后直接杀掉soffice进程，阻塞中的UNO调用随之抛出异常。
+        """
+        import uno
+
+        watchdog = threading.Timer(timeout, self.kill)
+        watchdog.daemon = True
+        watchdog.start()
+        doc = None
+        try:
+            doc = self.desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(input_file), '_blank', 0,
+                (_property('Hidden', True), _property('ReadOnly', True)))
+            if doc is None:
+                raise RuntimeError("LibreOffice无法打开该文件")
+            doc.storeToURL(uno.systemPathToFileUrl(output_file),
+                           (_property('FilterName', filter_name),))
+        except Exception as e:
+            if not self.is_alive():
+                raise RuntimeError(f"LibreOffice转换超时({timeout}秒)或进程崩溃")
+            raise RuntimeError(str(e))
+        finally:
+            watchdog.cancel()
+            if doc is not None:
+                try:
+                    doc.close(True)
+                except Exception:
+                    pass
+            self.jobs_done += 1
+
+    def kill(self):
+        if self.is_alive():
+            _kill_process_group(self.process)
+
+    def stop(self):
+        """结束进程并删除配置目录"""
+        if self.desktop is not None and self.is_alive():
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                pass
+            # 连同启动脚本留下的 soffice.bin 等子进程一起终止
+            _kill_process_group(self.process)
+            self.process.wait()
+        self.desktop = None
+        self.process = None
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            self.profile_dir = None
+
+
+class OfficeEnginePool:
+    """LibreOffice进程池，进程启动一次后复用"""
+
+    def __init__(self, size: int = 2, max_jobs: int = 200, max_rss_mb: int = 1024,
+                 soffice_path: Optional[str] = None, job_timeout: float = 120):
+        """
+        Args:
+            size: 常驻soffice进程数
+            max_jobs: 每个进程处理多少个任务后重启
+            max_rss_mb: 进程内存超过该值（MB）后重启
+            soffice_path: soffice可执行文件路径（默认从PATH查找）
+            job_timeout: 单个转换的超时时间（秒）
+        """
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.soffice_path = find_soffice(soffice_path)
+        self.job_timeout = job_timeout
+        self._idle = queue.Queue()
+        self._workers = []
+
+        if not self.soffice_path:
+            raise RuntimeError("未找到soffice，请安装LibreOffice或设置环境变量 SOFFICE_PATH")
+
+        for _ in range(size):
+            worker = OfficeWorker(self.soffice_path)
+            self._workers.append(worker)
+            self._idle.put(worker)
+
+    def start(self):
+        """预先启动全部进程（可选，否则在首次使用时启动）"""
+        workers = [self._idle.get() for _ in range(self.size)]
+        try:
+            for worker in workers:
+                if not worker.is_alive():
+                    worker.start()
+        finally:
+            for worker in workers:
+                self._idle.put(worker)
+
+    def _needs_recycle(self, worker: OfficeWorker) -> bool:
+        if worker.jobs_done >= self.max_jobs:
+            return True
+        return self.max_rss > 0 and worker.rss() > self.max_rss
+
+    def convert(self, input_file: str, output_file: str, filter_name: str) -> str:
+        """
+        使用池中的空闲进程把文档转换为PDF
+
+        Args:
+            input_file: 输入文件绝对路径
+            output_file: 输出PDF绝对路径
+            filter_name: LibreOffice导出过滤器名
+
+        Returns:
+            str: 输出文件路径
+        """
+        worker = self._idle.get()
+        try:
+            if not worker.is_alive():
+                worker.start()
+            worker.convert(input_file, output_file, filter_name, self.job_timeout)
+        finally:
+            # 达到任务数或内存上限、或进程已崩溃时回收，下一次使用时重新启动
+            if not worker.is_alive() or self._needs_recycle(worker):
+                print(f"[Office引擎] 回收soffice进程 (已处理{worker.jobs_done}个任务)")
+                worker.stop()
+            self._idle.put(worker)
+
+        if not os.path.exists(output_file):
+            raise RuntimeError("转换完成但输出文件不存在")
+        return output_file
+
+    def shutdown(self):
+        """结束全部进程"""
+        for worker in self._workers:
+            worker.stop()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_office_pool() -> OfficeEnginePool:
+    """获取当前进程的引擎池（首次调用时按环境变量创建）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = OfficeEnginePool(
+                size=int(os.environ.get('OFFICE_POOL_SIZE', 2)),
+                max_jobs=int(os.environ.get('OFFICE_MAX_JOBS', 200)),
+                max_rss_mb=int(os.environ.get('OFFICE_MAX_RSS_MB', 1024)),
+                soffice_path=os.environ.get('SOFFICE_PATH'),
+                job_timeout=float(os.environ.get('OFFICE_TIMEOUT', 120)),
+            )
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def warm_up_office_pool():
+    """使用引擎池时预先启动全部soffice进程；使用Microsoft Office或没有UNO绑定时无需预热"""
+    if not use_office_pool():
+        return
+    if not uno_available():
+        print("[Office引擎] 未找到LibreOffice的Python UNO绑定（python3-uno），"
+              "将为每个文件单独启动soffice（较慢）")
+        return
+    get_office_pool().start()
+
+
+def convert_with_soffice(input_file: str, output_file: str, filter_name: str,
+                         soffice_path: Optional[str] = None, timeout: float = 120) -> str:
+    """
+    没有UNO绑定时的后备方式：启动一次 soffice --convert-to pdf 转换单个文件
+
+    Args:
+        input_file: 输入文件绝对路径
+        output_file: 输出PDF绝对路径
+        filter_name: LibreOffice导出过滤器名
+        soffice_path: soffice可执行文件路径（默认从 SOFFICE_PATH 或PATH查找）
+        timeout: 超时时间（秒），超时后终止整个进程组
+
+    Returns:
+        str: 输出文件路径
+    """
+    soffice_path = find_soffice(soffice_path)
+    if not soffice_path:
+        raise RuntimeError("未找到soffice，请安装LibreOffice或设置环境变量 SOFFICE_PATH")
+
+    profile_dir = tempfile.mkdtemp(prefix='pdfconv_office_')
+    output_dir = tempfile.mkdtemp(prefix='pdfconv_out_')
+    # 错误输出写入文件而不是管道：留在进程组中的子进程会一直持有管道
+    stderr_file = tempfile.TemporaryFile()
+    try:
+        process = subprocess.Popen(
+            [
+                soffice_path,
+                '--headless', '--invisible', '--nologo', '--nodefault',
+                '--norestore', '--nolockcheck',
+                f'-env:UserInstallation={Path(profile_dir).as_uri()}',
+                '--convert-to', f'pdf:{filter_name}', '--outdir', output_dir, input_file,
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=stderr_file,
+            start_new_session=True,
+        )
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            raise RuntimeError(f"LibreOffice转换超时({timeout}秒)")
+        finally:
+            # 超时或 soffice 退出后仍留在组中的子进程一并终止
+            _kill_process_group(process)
+            process.wait()
+
+        produced = os.path.join(output_dir, os.path.splitext(os.path.basename(input_file))[0] + '.pdf')
+        if not os.path.exists(produced):
+            stderr_file.seek(0)
+            message = stderr_file.read().decode(errors='replace').strip()
+            raise RuntimeError(f"LibreOffice转换失败: {message or f'退出码 {process.returncode}'}")
+        shutil.move(produced, output_file)
+        return output_file
+    finally:
+        stderr_file.close()
+        shutil.rmtree(profile_dir, ignore_errors=True)
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def convert_with_office_pool(input_file: str, output_file: str) -> str:
+    """按输入扩展名选择导出过滤器，通过引擎池转换为PDF（没有UNO绑定时逐个启动soffice）"""
+    ext = os.path.splitext(input_file)[1].lower()
+    filter_name = PDF_EXPORT_FILTERS.get(ext)
+    if filter_name is None:
+        raise ValueError(f"LibreOffice引擎不支持的文件格式: {ext}")
+    if not uno_available():
+        return convert_with_soffice(os.path.abspath(input_file), os.path.abspath(output_file), filter_name,
+                                    timeout=float(os.environ.get('OFFICE_TIMEOUT', 120)))
+    return get_office_pool().convert(os.path.abspath(input_file), os.path.abspath(output_file), filter_name)
@@ -0,0 +1,246 @@
+"""PDF页面渲染缓存
+
+PDF转图片、PDF转PPT等按页渲染的转换器共用同一个磁盘缓存，缓存键为
+（文档SHA-256, 页码, DPI, 色彩模式）。重复转换同一文档，或把同一文档转换为
+另一种格式时，只需要重新编码，不再调用poppler渲染：
+
+- 命中相同DPI的缓存直接使用
+- 只有更高DPI的缓存时缩小后使用（如PDF转图片的300DPI渲染可供PDF转PPT的200DPI使用）
+
+渲染结果以快速压缩的无损PNG保存在 ``<缓存目录>/<文档哈希>/`` 下，
+总大小超过预算时按最近使用时间（文件修改时间）淘汰。多个进程可共享同一目录。
+
+缓存默认关闭，设置环境变量 PAGE_CACHE_MAX_MB（预算，MB）后开启，PAGE_CACHE_DIR 指定缓存目录。
+只有同一文档会被反复转换时才值得开启：开启后PDF转图片需要先把每页渲染为位图、
+写入缓存再编码，不能再由poppler直接输出JPEG/PNG文件。
+"""
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+
+class PageRenderCache:
+    """磁盘上的页面渲染缓存"""
+
+    def __init__(self, cache_dir: str, max_bytes: int = 2 * 1024 * 1024 * 1024, compress_level: int = 1):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限（字节）
+            compress_level: PNG压缩级别，越低写入越快、占用空间越大
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.compress_level = compress_level
+        self._written = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def _entry_name(page: int, dpi: int, colorspace: str) -> str:
+        return f"p{page}_{dpi}_{colorspace}.png"
+
+    def _doc_dir(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, digest)
+
+    def lookup(self, digest: str, pages, dpi: int, colorspace: str) -> dict:
+        """
+        查找一批页面的缓存（每次只列一次文档目录）
+
+        Returns:
+            dict: 页码 -> (缓存文件路径, 缓存的DPI)，优先相同DPI，其次最接近的更高DPI
+        """
+        try:
+            names = os.listdir(self._doc_dir(digest))
+        except OSError:
+            return {}
+
+        wanted = set(pages)
+        found = {}
+        for name in names:
+            stem, ext = os.path.splitext(name)
+            parts = stem.split('_')
+            if ext != '.png' or len(parts) != 3 or parts[2] != colorspace:
+                continue
+            try:
+                page, cached_dpi = int(parts[0][1:]), int(parts[1])
+            except ValueError:
+                continue
+            if page not in wanted or cached_dpi < dpi:
+                continue
+            if page not in found or cached_dpi < found[page][1]:
+                found[page] = (os.path.join(self._doc_dir(digest), name), cached_dpi)
+        return found
+
+    @staticmethod
+    def load(path: str, cached_dpi: int, dpi: int):
+        """读取缓存的页面，DPI更高时按比例缩小；读取失败返回None"""
+        from PIL import Image
+
+        try:
+            with Image.open(path) as image:
+                image.load()
+                # 刷新最近使用时间
+                os.utime(path)
+                if cached_dpi == dpi:
+                    return image.copy()
+                scale = dpi / cached_dpi
+                size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+                return image.resize(size, Image.Resampling.LANCZOS)
+        except OSError:
+            return None
+
+    def store(self, digest: str, page: int, dpi: int, colorspace: str, image):
+        """写入一页渲染结果（先写临时文件再改名，并发写入同一页时互不影响）"""
+        doc_dir = self._doc_dir(digest)
+        path = os.path.join(doc_dir, self._entry_name(page, dpi, colorspace))
+        temp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            os.makedirs(doc_dir, exist_ok=True)
+            image.save(temp_path, 'PNG', compress_level=self.compress_level)
+            os.replace(temp_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            print(f"写入页面缓存失败: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        # 每写入约十分之一预算检查一次总大小，避免每页都遍历目录
+        with self._lock:
+            self._written += size
+            due = self._written > self.max_bytes // 10
+            if due:
+                self._written = 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        """缓存超出预算时，按最近使用时间从旧到新删除页面"""
+        entries = []
+        total = 0
+        for doc_entry in os.scandir(self.cache_dir):
+            if not doc_entry.is_dir():
+                continue
+            try:
+                for entry in os.scandir(doc_entry.path):
+                    if entry.name.endswith('.png'):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                        total += stat.st_size
+            except OSError:
+                continue
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+        # 删除已经空了的文档目录
+        for doc_entry in os.scandir(self.cache_dir):
+            if doc_entry.is_dir():
+                try:
+                    os.rmdir(doc_entry.path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> Optional[PageRenderCache]:
+    """获取当前进程的页面缓存（首次调用时按环境变量创建），缓存关闭时返回None"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            max_mb = int(os.environ.get('PAGE_CACHE_MAX_MB', 0))
+            if max_mb <= 0:
+                return None
+            cache_dir = os.environ.get('PAGE_CACHE_DIR',
+                                       os.path.join(tempfile.gettempdir(), 'pdf-convert-pages'))
+            _cache = PageRenderCache(cache_dir, max_bytes=max_mb * 1024 * 1024)
+        return _cache
+
+
+def document_digest(input_file: str) -> Optional[str]:
+    """缓存开启时返回文档的SHA-256（作为缓存键），关闭时返回None，不做多余的哈希计算"""
+    if get_page_cache() is None:
+        return None
+    from ..result_cache import file_digest
+    return file_digest(input_file)
+
+
+def render_pages(input_file: str, first_page: int, last_page: int, dpi: int, thread_count: int = 1,
+                 colorspace: str = 'RGB', digest: Optional[str] = None) -> list:
+    """
+    渲染 [first_page, last_page] 范围内的页面，优先使用缓存
+
+    Args:
+        input_file: PDF文件路径
+        first_page, last_page: 页码范围（从1开始，包含两端）
+        dpi: 渲染分辨率
+        thread_count: 并行渲染的poppler进程数
+        colorspace: 'RGB' 或 'L'（灰度）
+        digest: 文档的SHA-256，未提供或缓存关闭时直接渲染
+
+    Returns:
+        list: 按页序排列的PIL图片
+    """
+    from pdf2image import convert_from_path
+
+    def render(first, last):
+        return convert_from_path(input_file, dpi=dpi, first_page=first, last_page=last,
+                                 grayscale=colorspace == 'L',
+                                 thread_count=min(thread_count, last - first + 1))
+
+    cache = get_page_cache()
+    if cache is None or digest is None:
+        return render(first_page, last_page)
+
+    pages = range(first_page, last_page + 1)
+    images = {}
+    for page, (path, cached_dpi) in cache.lookup(digest, pages, dpi, colorspace).items():
+        image = cache.load(path, cached_dpi, dpi)
+        if image is not None:
+            images[page] = image
+
+    # 把未命中的页面合并为连续的区间渲染
+    rendered = []
+    page = first_page
+    while page <= last_page:
+        if page in images:
+            page += 1
+            continue
+        run_end = page
+        while run_end + 1 <= last_page and run_end + 1 not in images:
+            run_end += 1
+        for page_no, image in enumerate(render(page, run_end), start=page):
+            images[page_no] = image
+            rendered.append((page_no, image))
+        page = run_end + 1
+
+    if rendered:
+        with ThreadPoolExecutor(max_workers=max(1, thread_count)) as pool:
+            list(pool.map(lambda item: cache.store(digest, item[0], dpi, colorspace, item[1]), rendered))
+
+    hits = len(pages) - len(rendered)
+    if hits:
+        print(f"页面缓存命中 {hits}/{len(pages)} 页")
+    return [images[page] for page in pages]
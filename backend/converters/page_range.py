@@ -0,0 +1,106 @@
+"""页码范围
+
+页码写法为逗号分隔的单页或范围，页码从1开始：``1-5,9,12-`` 表示第1到5页、
+第9页和第12页到最后一页。解析结果按页序排序并合并重叠的范围，
+转换引擎只解析和渲染所选的页面。
+"""
+import re
+from typing import Optional
+
+_PART_PATTERN = re.compile(r'^(\d+)?\s*(-)?\s*(\d+)?$')
+
+
+def parse_page_ranges(spec: str) -> list:
+    """
+    解析页码写法
+
+    Args:
+        spec: 页码写法，如 '1-5,9,12-'
+
+    Returns:
+        list: [(起始页, 结束页或None)]，结束页为None表示到最后一页
+
+    Raises:
+        ValueError: 写法无效
+    """
+    ranges = []
+    for part in (spec or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        match = _PART_PATTERN.match(part)
+        if not match or not (match.group(1) or match.group(3)):
+            raise ValueError(f"无效的页码范围: '{part}'（写法如 1-5,9,12-）")
+        first_text, dash, last_text = match.groups()
+        first = int(first_text) if first_text else 1
+        last = (int(last_text) if last_text else None) if dash else first
+        if first < 1 or (last is not None and last < first):
+            raise ValueError(f"无效的页码范围: '{part}'")
+        ranges.append((first, last))
+    if not ranges:
+        raise ValueError("页码范围为空")
+    return ranges
+
+
+def normalize_page_ranges(spec: Optional[str]) -> Optional[str]:
+    """校验页码写法并返回规范形式（排序、合并），空值返回None表示全部页面"""
+    if spec is None or not str(spec).strip() or str(spec).strip().lower() == 'all':
+        return None
+    ranges = sorted(parse_page_ranges(str(spec)), key=lambda item: item[0])
+    merged = []
+    for first, last in ranges:
+        if merged and (merged[-1][1] is None or first <= merged[-1][1] + 1):
+            previous_first, previous_last = merged[-1]
+            merged[-1] = (previous_first, None if previous_last is None or last is None
+                          else max(previous_last, last))
+        else:
+            merged.append((first, last))
+    return ','.join(str(first) if first == last else f"{first}-{'' if last is None else last}"
+                    for first, last in merged)
+
+
+def resolve_page_ranges(spec: Optional[str], page_count: int) -> list:
+    """
+    把页码写法解析为文档中实际存在的页码范围
+
+    Args:
+        spec: 页码写法，None 表示全部页面
+        page_count: 文档页数
+
+    Returns:
+        list: [(起始页, 结束页)]，按页序排列、互不重叠，两端都包含
+
+    Raises:
+        ValueError: 所选页面都超出了文档页数
+    """
+    spec = normalize_page_ranges(spec)
+    if spec is None:
+        return [(1, page_count)] if page_count > 0 else []
+    resolved = [(first, page_count if last is None else min(last, page_count))
+                for first, last in parse_page_ranges(spec) if first <= page_count]
+    if not resolved:
+        raise ValueError(f"所选页码 {spec} 超出文档页数（共 {page_count} 页）")
+    return resolved
+
+
+def format_page_ranges(ranges: list) -> str:
+    """把闭区间页码范围格式化为 '1-5,9' 形式（tabula的 pages 参数）"""
+    return ','.join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+
+def is_open_ended(spec: Optional[str]) -> bool:
+    """页码写法是否包含省略结束页的范围（如 12-）"""
+    return spec is not None and any(last is None for _, last in parse_page_ranges(spec))
+
+
+def count_pages(ranges: list) -> int:
+    return sum(last - first + 1 for first, last in ranges)
+
+
+def split_ranges(ranges: list, size: int) -> list:
+    """把页码范围切分为每段最多 size 页的小范围（用于分批渲染或并行提取）"""
+    chunks = []
+    for first, last in ranges:
+        for start in range(first, last + 1, size):
+            chunks.append((start, min(start + size - 1, last)))
+    return chunks
@@ -0,0 +1,113 @@
+"""转换器注册表
+
+每个转换器类在类属性中声明自己的转换类型、输入格式、输出格式和能力，
+定义时由 BaseConverter 自动注册到 REGISTRY。Web服务、命令行和基准测试
+都从这里获取支持的转换类型，不再各自维护一份扩展名映射。
+"""
+import os
+import time
+from typing import Optional
+
+
+class ConverterRegistry:
+    """转换类型 -> 转换器类"""
+
+    def __init__(self):
+        self._classes = {}
+
+    def register(self, converter_class):
+        """注册转换器类（转换类型重复时报错）"""
+        conversion_type = converter_class.conversion_type
+        existing = self._classes.get(conversion_type)
+        if existing is not None and existing is not converter_class:
+            raise ValueError(f"转换类型 '{conversion_type}' 已由 {existing.__name__} 注册")
+        self._classes[conversion_type] = converter_class
+        return converter_class
+
+    def __contains__(self, conversion_type) -> bool:
+        return conversion_type in self._classes
+
+    def types(self) -> list:
+        """按注册顺序返回所有转换类型"""
+        return list(self._classes)
+
+    def classes(self) -> list:
+        return list(self._classes.values())
+
+    def get(self, conversion_type: str):
+        """获取转换器类，未注册时返回None"""
+        return self._classes.get(conversion_type)
+
+    def create(self, conversion_type: str, **options):
+        """用给定参数创建转换器实例"""
+        converter_class = self._classes.get(conversion_type)
+        if converter_class is None:
+            raise KeyError(f"未知的转换类型: {conversion_type}")
+        return converter_class(**options)
+
+    def input_extensions(self, conversion_type: str) -> tuple:
+        converter_class = self._classes.get(conversion_type)
+        return converter_class.input_extensions if converter_class else ()
+
+    def accepts(self, conversion_type: str, filename: str) -> bool:
+        """检查文件扩展名是否为该转换类型支持的输入格式"""
+        ext = os.path.splitext(filename)[1].lower()
+        return ext in self.input_extensions(conversion_type)
+
+    def describe(self) -> dict:
+        """按类别汇总所有转换类型的名称、格式和能力（用于 /api/info）"""
+        info = {}
+        for conversion_type, converter_class in self._classes.items():
+            info.setdefault(converter_class.category, {})[conversion_type] = {
+                'name': converter_class.display_name,
+                'formats': list(converter_class.input_extensions),
+                'output': converter_class.output_extension,
+                'streaming': converter_class.supports_streaming,
+                'merge': converter_class.supports_merge,
+                'batch': converter_class.supports_batch,
+                'pages': converter_class.supports_pages,
+                'profiles': list(converter_class.render_profiles),
+            }
+        return info
+
+    def parse_types(self, value: Optional[str]) -> list:
+        """
+        解析逗号分隔的转换类型列表
+
+        'all' 表示全部类型，空值表示不选择任何类型，未知类型报错。
+        """
+        value = (value or '').strip()
+        if not value or value.lower() == 'none':
+            return []
+        if value.lower() == 'all':
+            return self.types()
+        selected = [item.strip() for item in value.split(',') if item.strip()]
+        unknown = [item for item in selected if item not in self._classes]
+        if unknown:
+            raise ValueError(f"未知的转换类型: {', '.join(unknown)}，支持的类型: {', '.join(self.types())}")
+        return selected
+
+    def warm_up(self, conversion_types=None) -> dict:
+        """
+        预先导入并初始化所选转换器依赖的引擎
+
+        单个转换器预热失败（如缺少可选依赖）只记录错误，不影响其他类型。
+
+        Returns:
+            dict: 转换类型 -> {'ok': 是否成功, 'seconds': 耗时, 'error': 错误信息}
+        """
+        results = {}
+        for conversion_type in (self.types() if conversion_types is None else conversion_types):
+            start = time.perf_counter()
+            try:
+                self._classes[conversion_type].warm_up()
+                results[conversion_type] = {'ok': True}
+            except Exception as e:
+                results[conversion_type] = {'ok': False, 'error': str(e)}
+            results[conversion_type]['seconds'] = round(time.perf_counter() - start, 3)
+            status = '完成' if results[conversion_type]['ok'] else f"失败: {results[conversion_type]['error']}"
+            print(f"预热 {conversion_type} {status} ({results[conversion_type]['seconds']}s)")
+        return results
+
+
+REGISTRY = ConverterRegistry()
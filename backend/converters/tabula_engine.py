@@ -0,0 +1,89 @@
+"""常驻JVM的tabula表格提取
+
+tabula-py 默认每次调用都启动一个 ``java`` 子进程并重新加载tabula的jar包，
+小文件的耗时主要花在JVM启动上。安装 jpype1 后，tabula-py 可以在当前进程内
+启动一个JVM并在之后的调用中复用。本模块统一管理该JVM：
+
+- 环境变量 TABULA_MODE 取 jpype（默认）或 subprocess
+- 环境变量 TABULA_JAVA_OPTIONS 设置JVM参数（如 ``-Xmx2g``），
+  jpype模式下只在JVM启动时生效一次
+- warm_up() 用一个空白页PDF触发JVM启动和类加载，可在服务启动时预先调用
+"""
+import os
+import shlex
+import tempfile
+import threading
+
+
+# 只有一个空白页的最小PDF，用于预热JVM
+_BLANK_PDF = (
+    b'%PDF-1.4\n'
+    b'1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n'
+    b'2 0 obj\n<< /Type /Pages /Kids [3 0 R] /Count 1 >>\nendobj\n'
+    b'3 0 obj\n<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] >>\nendobj\n'
+    b'xref\n0 4\n'
+    b'0000000000 65535 f \n'
+    b'0000000009 00000 n \n'
+    b'0000000058 00000 n \n'
+    b'0000000115 00000 n \n'
+    b'trailer\n<< /Size 4 /Root 1 0 R >>\nstartxref\n186\n%%EOF\n'
+)
+
+_warm_lock = threading.Lock()
+_warmed = False
+
+
+def tabula_options() -> dict:
+    """根据环境变量生成传给 tabula.read_pdf 的JVM相关参数"""
+    return {
+        'java_options': shlex.split(os.environ.get('TABULA_JAVA_OPTIONS', '')),
+        'force_subprocess': os.environ.get('TABULA_MODE', 'jpype').lower() == 'subprocess',
+    }
+
+
+def warm_up():
+    """
+    启动进程内JVM并加载tabula（每个进程只执行一次）
+
+    多个线程同时首次调用 tabula 可能重复启动JVM，
+    所以并行提取前先在锁内完成启动。subprocess模式下无需预热。
+    """
+    global _warmed
+    options = tabula_options()
+    if _warmed or options['force_subprocess']:
+        return
+
+    try:
+        import tabula
+    except ImportError:
+        raise ImportError("需要安装tabula-py库: pip install tabula-py jpype1")
+
+    with _warm_lock:
+        if _warmed:
+            return
+        fd, blank_path = tempfile.mkstemp(suffix='.pdf')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_BLANK_PDF)
+            tabula.read_pdf(blank_path, pages=1, silent=True, **options)
+            _warmed = True
+            print("tabula JVM已启动")
+        finally:
+            os.remove(blank_path)
+
+
+def read_tables(input_file: str, pages) -> list:
+    """
+    提取指定页范围内的所有表格
+
+    Args:
+        input_file: PDF文件路径
+        pages: tabula的页码参数，如 'all'、'1-20'
+
+    Returns:
+        list: pandas.DataFrame列表
+    """
+    import tabula
+
+    warm_up()
+    return tabula.read_pdf(input_file, pages=pages, multiple_tables=True, **tabula_options())
@@ -1,20 +1,44 @@
 """各种格式转PDF的转换器"""
 import os
 from typing import Optional
-from .base_converter import BaseConverter
+from .base_converter import BaseConverter, default_parallelism
+from ..metrics import add_pages
+from .image_pdf_writer import ImagePDFWriter
+from .office_pool import use_office_pool, convert_with_office_pool, warm_up_office_pool
+from .html_renderer import HTMLBatchRenderer, env_asset_hosts, get_asset_cache
 
 
 class WordToPDFConverter(BaseConverter):
     """Word转PDF转换器"""
     
+    conversion_type = 'word2pdf'
+    display_name = 'Word转PDF'
+    category = 'to_pdf'
+    input_extensions = ('.docx', '.doc')
+    page_cost = 0.2
+    
+    @classmethod
+    def warm_up(cls):
+        # 预先启动常驻的LibreOffice进程
+        warm_up_office_pool()
+    
     def convert(self, input_file: str, output_file: Optional[str] = None) -> str:
         """将Word文档转换为PDF"""
         import subprocess
         import sys
         
-        self.validate_file(input_file, ['.docx', '.doc'])
+        self.validate_file(input_file, self.input_extensions)
         output_file = self.get_output_path(input_file, '.pdf', output_file)
         
+        # Linux等平台使用常驻的LibreOffice引擎池
+        if use_office_pool():
+            try:
+                return convert_with_office_pool(input_file, output_file)
+            except ImportError:
+                raise
+            except Exception as e:
+                raise RuntimeError(f"Word转PDF失败: {str(e)}")
+        
         abs_input = os.path.abspath(input_file)
         abs_output = os.path.abspath(output_file)
         
@@ -57,14 +81,34 @@ finally:
 class PPTToPDFConverter(BaseConverter):
     """PowerPoint转PDF转换器"""
     
+    conversion_type = 'ppt2pdf'
+    display_name = 'PPT转PDF'
+    category = 'to_pdf'
+    input_extensions = ('.pptx', '.ppt')
+    page_cost = 0.3
+    
+    @classmethod
+    def warm_up(cls):
+        # 预先启动常驻的LibreOffice进程
+        warm_up_office_pool()
+    
     def convert(self, input_file: str, output_file: Optional[str] = None) -> str:
         """将PowerPoint转换为PDF"""
         import subprocess
         import sys
         
-        self.validate_file(input_file, ['.pptx', '.ppt'])
+        self.validate_file(input_file, self.input_extensions)
         output_file = self.get_output_path(input_file, '.pdf', output_file)
         
+        # Linux等平台使用常驻的LibreOffice引擎池
+        if use_office_pool():
+            try:
+                return convert_with_office_pool(input_file, output_file)
+            except ImportError:
+                raise
+            except Exception as e:
+                raise RuntimeError(f"PPT转PDF失败: {str(e)}")
+        
         abs_input = os.path.abspath(input_file)
         abs_output = os.path.abspath(output_file)
         
@@ -113,14 +157,34 @@ finally:
 class ExcelToPDFConverter(BaseConverter):
     """Excel转PDF转换器"""
     
+    conversion_type = 'excel2pdf'
+    display_name = 'Excel转PDF'
+    category = 'to_pdf'
+    input_extensions = ('.xlsx', '.xls')
+    page_cost = 0.2
+    
+    @classmethod
+    def warm_up(cls):
+        # 预先启动常驻的LibreOffice进程
+        warm_up_office_pool()
+    
     def convert(self, input_file: str, output_file: Optional[str] = None) -> str:
         """将Excel转换为PDF"""
         import subprocess
         import sys
         
-        self.validate_file(input_file, ['.xlsx', '.xls'])
+        self.validate_file(input_file, self.input_extensions)
         output_file = self.get_output_path(input_file, '.pdf', output_file)
         
+        # Linux等平台使用常驻的LibreOffice引擎池
+        if use_office_pool():
+            try:
+                return convert_with_office_pool(input_file, output_file)
+            except ImportError:
+                raise
+            except Exception as e:
+                raise RuntimeError(f"Excel转PDF失败: {str(e)}")
+        
         abs_input = os.path.abspath(input_file)
         abs_output = os.path.abspath(output_file)
         
@@ -197,48 +261,164 @@ finally:
 class ImageToPDFConverter(BaseConverter):
     """图片转PDF转换器"""
     
+    conversion_type = 'img2pdf'
+    display_name = '图片转PDF'
+    category = 'to_pdf'
+    input_extensions = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff')
+    page_cost = 0.1
+    warm_up_modules = ('PIL.Image',)
+    # 支持 convert_many() 把多张图片合并为一个PDF
+    supports_merge = True
+    sandboxed = True
+    
+    def __init__(self, resolution: float = 100.0, compress_level: int = 6):
+        """
+        Args:
+            resolution: 图片分辨率（DPI），决定PDF页面尺寸
+            compress_level: 非JPEG图片无损压缩的zlib级别（0-9）
+        """
+        self.resolution = resolution
+        self.compress_level = compress_level
+    
     def convert(self, input_file: str, output_file: Optional[str] = None) -> str:
-        """将图片转换为PDF"""
+        """将图片转换为PDF（多帧TIFF/GIF的每一帧各占一页）"""
+        output_file = self.get_output_path(input_file, '.pdf', output_file)
+        return self.convert_many([input_file], output_file)
+    
+    def convert_many(self, input_files: list, output_file: str) -> str:
+        """
+        把多张图片按顺序合并为一个PDF
+        
+        Args:
+            input_files: 图片路径列表
+            output_file: 输出PDF路径
+            
+        Returns:
+            str: 输出文件路径
+        """
         try:
-            from PIL import Image
+            from PIL import Image  # noqa: F401
         except ImportError:
             raise ImportError("需要安装Pillow库: pip install Pillow")
         
-        self.validate_file(input_file, ['.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff'])
-        output_file = self.get_output_path(input_file, '.pdf', output_file)
+        for input_file in input_files:
+            self.validate_file(input_file, self.input_extensions)
         
         try:
-            image = Image.open(input_file)
-            
-            # 转换RGBA到RGB
-            if image.mode == 'RGBA':
-                background = Image.new('RGB', image.size, (255, 255, 255))
-                background.paste(image, mask=image.split()[3])
-                image = background
-            elif image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            image.save(output_file, 'PDF', resolution=100.0)
+            with ImagePDFWriter(output_file, self.resolution, self.compress_level) as writer:
+                for input_file in input_files:
+                    self._write_image(writer, input_file)
+            add_pages(writer.page_count)
             return output_file
         except Exception as e:
             raise RuntimeError(f"图片转PDF失败: {str(e)}")
+    
+    def _write_image(self, writer: ImagePDFWriter, input_file: str):
+        """写入一个图片文件的全部帧，每次只解码一帧"""
+        from PIL import Image, ImageSequence
+        
+        with Image.open(input_file) as image:
+            # JPEG数据原样嵌入，不解码也不重新压缩
+            if image.format == 'JPEG' and image.mode in ('RGB', 'L', 'CMYK'):
+                with open(input_file, 'rb') as f:
+                    data = f.read()
+                writer.add_jpeg(data, image.width, image.height, image.mode,
+                                adobe_cmyk='adobe' in image.info)
+                return
+            
+            for frame in ImageSequence.Iterator(image):
+                writer.add_image(self._flatten(frame))
+    
+    @staticmethod
+    def _flatten(frame):
+        """转换为PDF可直接使用的RGB或灰度图，透明区域填充白色"""
+        from PIL import Image
+        
+        if frame.mode in ('RGBA', 'LA') or (frame.mode == 'P' and 'transparency' in frame.info):
+            rgba = frame.convert('RGBA')
+            background = Image.new('RGB', rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.split()[3])
+            return background
+        if frame.mode in ('RGB', 'L'):
+            return frame
+        return frame.convert('RGB')
 
 
 class HTMLToPDFConverter(BaseConverter):
     """HTML转PDF转换器"""
     
-    def convert(self, input_file: str, output_file: Optional[str] = None) -> str:
-        """将HTML转换为PDF"""
+    conversion_type = 'html2pdf'
+    display_name = 'HTML转PDF'
+    category = 'to_pdf'
+    input_extensions = ('.html', '.htm')
+    page_cost = 0.5
+    warm_up_modules = ('pdfkit',)
+    # 支持 convert_batch()：一个wkhtmltopdf进程依次渲染多个文档
+    supports_batch = True
+    runtime_options = ('chunk_size', 'jobs')
+    
+    def __init__(self, options: Optional[list] = None, chunk_size: int = 50, jobs: Optional[int] = None,
+                 asset_hosts: Optional[tuple] = None, local_root: Optional[str] = None):
+        """
+        Args:
+            options: 传给wkhtmltopdf的选项（如 ['--page-size', 'A4']）
+            chunk_size: 批量转换时每个wkhtmltopdf进程渲染的文档数
+            jobs: 批量转换时并行的wkhtmltopdf进程数（默认见 default_parallelism()）
+            asset_hosts: 允许预取远程资源的主机（'*' 表示全部），默认取环境变量 HTML_ASSET_HOSTS，为空时不预取
+            local_root: 页面可以读取的本地目录（如命令行的输入目录），默认不允许读取本地文件
+        """
+        self.options = list(options or [])
+        self.asset_hosts = tuple(asset_hosts) if asset_hosts is not None else env_asset_hosts()
+        self.local_root = local_root
+        self.chunk_size = chunk_size
+        self.jobs = jobs
+    
+    def _renderer(self) -> HTMLBatchRenderer:
         try:
             import pdfkit
         except ImportError:
             raise ImportError("需要安装pdfkit库: pip install pdfkit")
         
-        self.validate_file(input_file, ['.html', '.htm'])
-        output_file = self.get_output_path(input_file, '.pdf', output_file)
-        
         try:
-            pdfkit.from_file(input_file, output_file)
-            return output_file
-        except Exception as e:
+            # 与pdfkit相同的方式查找wkhtmltopdf
+            wkhtmltopdf = pdfkit.configuration().wkhtmltopdf
+        except OSError as e:
             raise RuntimeError(f"HTML转PDF失败: {str(e)}\n提示: 需要安装wkhtmltopdf (https://wkhtmltopdf.org/)")
+        if isinstance(wkhtmltopdf, bytes):
+            wkhtmltopdf = wkhtmltopdf.decode('utf-8')
+        return HTMLBatchRenderer(wkhtmltopdf, self.options, assets=get_asset_cache(), asset_hosts=self.asset_hosts,
+                                 local_root=self.local_root, chunk_size=self.chunk_size,
+                                 jobs=self.jobs or default_parallelism())
+    
+    def convert(self, input_file: str, output_file: Optional[str] = None) -> str:
+        """将HTML转换为PDF"""
+        renderer = self._renderer()
+        self.validate_file(input_file, self.input_extensions)
+        output_file = self.get_output_path(input_file, '.pdf', output_file)
+        
+        for _, result, error in renderer.render([(input_file, output_file)]):
+            if error is not None:
+                raise RuntimeError(f"HTML转PDF失败: {error}\n提示: 需要安装wkhtmltopdf (https://wkhtmltopdf.org/)")
+        return output_file
+    
+    def convert_batch(self, tasks: list):
+        """
+        批量将HTML转换为PDF，每批文档只启动一次wkhtmltopdf
+        
+        Args:
+            tasks: [(HTML路径, 输出路径或None)]
+            
+        Yields:
+            tuple: (输入路径, 输出路径或None, 错误信息或None)，每批完成时产出
+        """
+        renderer = self._renderer()
+        valid = []
+        for input_file, output_file in tasks:
+            try:
+                self.validate_file(input_file, self.input_extensions)
+            except (FileNotFoundError, ValueError) as e:
+                yield input_file, None, str(e)
+                continue
+            valid.append((input_file, self.get_output_path(input_file, '.pdf', output_file)))
+        
+        yield from renderer.render(valid)
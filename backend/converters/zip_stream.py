@@ -0,0 +1,56 @@
+"""流式生成ZIP压缩包
+
+zipfile 写入不可seek的输出时会使用数据描述符，因此可以边添加文件边把
+已生成的字节交给HTTP响应，不需要先在磁盘上生成完整的ZIP。
+"""
+import io
+import zipfile
+
+
+class _ZipSink(io.RawIOBase):
+    """收集zipfile写出的字节，供生成器逐段取走"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries, compression=zipfile.ZIP_STORED):
+    """
+    把 (文件名, 字节) 序列打包为ZIP，逐段产出压缩包数据
+
+    Args:
+        entries: 可迭代的 (压缩包内文件名, 文件内容) ，可以是惰性生成器
+        compression: 压缩方式，JPEG/PNG等已压缩的数据使用默认的 ZIP_STORED 即可
+
+    Yields:
+        bytes: 压缩包数据片段
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', compression=compression) as archive:
+        for name, data in entries:
+            archive.writestr(name, data)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    chunk = sink.drain()
+    if chunk:
+        yield chunk
+
+
+def write_zip(entries, output_file: str, compression=zipfile.ZIP_STORED):
+    """把 (文件名, 字节) 序列写入ZIP文件"""
+    with open(output_file, 'wb') as f:
+        for chunk in stream_zip(entries, compression):
+            f.write(chunk)
@@ -0,0 +1,208 @@
+"""后台文件清理
+
+每个受管目录按文件的过期时间维护一个最小堆，后台线程在最早的过期时间到达时删除文件，
+不在请求处理过程中遍历目录。上传文件和转换输出写入后调用 track() 登记；
+启动时和之后每隔 rescan_interval 扫描一次目录，补登记其他进程写入的文件。
+
+计入配额的目录总大小超过配额时，提前删除其中最早过期（即最旧）的文件。
+"""
+import heapq
+import os
+import threading
+import time
+from typing import Optional
+
+
+class Janitor:
+    """基于过期时间堆的后台清理线程"""
+
+    def __init__(self, max_bytes: int = 0, rescan_interval: float = 3600):
+        """
+        Args:
+            max_bytes: 计入配额的目录总大小上限（字节），0 表示不限制
+            rescan_interval: 重新扫描目录的间隔（秒）
+        """
+        self.max_bytes = max_bytes
+        self.rescan_interval = rescan_interval
+        self._folders = {}
+        self._quota_folders = set()
+        # 每个目录一个堆，元素为 (过期时间, 路径)；_entries 记录每个路径当前有效的
+        # (过期时间, 大小)，重新登记的路径在堆中留下的旧元素弹出时忽略
+        self._heaps = {}
+        self._entries = {}
+        self._total_bytes = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def add_folder(self, folder: str, max_age_seconds: float, count_quota: bool = True):
+        """
+        添加受管目录
+
+        Args:
+            folder: 目录路径（只管理直接位于其中的文件）
+            max_age_seconds: 文件最后修改后保留的时间
+            count_quota: 是否计入磁盘配额（上传目录中的文件可能正在转换，不应提前删除）
+        """
+        folder = os.path.abspath(folder)
+        with self._cond:
+            self._folders[folder] = max_age_seconds
+            self._heaps.setdefault(folder, [])
+            if count_quota:
+                self._quota_folders.add(folder)
+
+    def _max_age(self, path: str) -> Optional[float]:
+        return self._folders.get(os.path.dirname(os.path.abspath(path)))
+
+    def track(self, path: str, mtime: Optional[float] = None, size: Optional[int] = None):
+        """登记受管目录中新写入（或修改）的文件"""
+        max_age = self._max_age(path)
+        if max_age is None:
+            return
+        if mtime is None or size is None:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return
+            mtime, size = stat.st_mtime, stat.st_size
+
+        path = os.path.abspath(path)
+        folder = os.path.dirname(path)
+        counted = folder in self._quota_folders
+        deadline = mtime + max_age
+        with self._cond:
+            previous = self._entries.get(path)
+            if previous is not None and counted:
+                self._total_bytes -= previous[1]
+            self._entries[path] = (deadline, size)
+            if counted:
+                self._total_bytes += size
+            heap = self._heaps[folder]
+            heapq.heappush(heap, (deadline, path))
+            # 新的过期时间更早或超出配额时唤醒清理线程
+            if heap[0][1] == path or self._over_quota():
+                self._cond.notify()
+
+    def scan(self):
+        """扫描全部受管目录，登记已有文件"""
+        for folder in list(self._folders):
+            try:
+                entries = list(os.scandir(folder))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        self.track(entry.path, stat.st_mtime, stat.st_size)
+                except OSError:
+                    pass
+
+    def _over_quota(self) -> bool:
+        return self.max_bytes > 0 and self._total_bytes > self.max_bytes
+
+    def _peek(self, heap: list):
+        """丢弃堆顶的失效元素，返回有效的堆顶 (过期时间, 路径)（调用方需持有锁）"""
+        while heap:
+            deadline, path = heap[0]
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == deadline:
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+    def _pop(self, folder: str):
+        deadline, path = heapq.heappop(self._heaps[folder])
+        _, size = self._entries.pop(path)
+        if folder in self._quota_folders:
+            self._total_bytes -= size
+        return path
+
+    def _pop_due(self, now: float) -> list:
+        """取出已过期或因超出配额需要删除的路径（调用方需持有锁）"""
+        due = []
+        for folder, heap in self._heaps.items():
+            while True:
+                top = self._peek(heap)
+                if top is None or top[0] > now:
+                    break
+                due.append((self._pop(folder), False))
+
+        # 超出配额：从计入配额的目录中依次删除最早过期的文件
+        while self._over_quota():
+            tops = [(top[0], folder) for folder in self._quota_folders
+                    for top in [self._peek(self._heaps[folder])] if top is not None]
+            if not tops:
+                break
+            due.append((self._pop(min(tops)[1]), True))
+        return due
+
+    def _next_deadline(self) -> Optional[float]:
+        deadlines = [top[0] for top in map(self._peek, self._heaps.values()) if top is not None]
+        return min(deadlines) if deadlines else None
+
+    def _remove(self, path: str, for_quota: bool, now: float):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        max_age = self._max_age(path)
+        # 登记后又被修改过（如仍在上传的分块文件），按新的修改时间重新登记
+        if not for_quota and max_age is not None and stat.st_mtime + max_age > now:
+            self.track(path, stat.st_mtime, stat.st_size)
+            return
+        try:
+            os.remove(path)
+            reason = '超出磁盘配额' if for_quota else '已过期'
+            print(f"已清理文件（{reason}）: {os.path.basename(path)}")
+        except OSError as e:
+            print(f"清理文件失败 {os.path.basename(path)}: {e}")
+
+    def run_once(self, now: Optional[float] = None) -> Optional[float]:
+        """
+        删除到期的文件
+
+        Returns:
+            float: 下一个过期时间，没有待清理的文件时返回None
+        """
+        now = now or time.time()
+        with self._cond:
+            due = self._pop_due(now)
+        for path, for_quota in due:
+            self._remove(path, for_quota, now)
+        with self._cond:
+            return self._next_deadline()
+
+    def _loop(self):
+        next_scan = 0
+        while True:
+            now = time.time()
+            if now >= next_scan:
+                self.scan()
+                next_scan = now + self.rescan_interval
+            next_deadline = self.run_once()
+            with self._cond:
+                if self._stopped:
+                    return
+                wake_at = next_scan if next_deadline is None else min(next_deadline, next_scan)
+                if not self._over_quota():
+                    self._cond.wait(max(0.0, wake_at - time.time()))
+                if self._stopped:
+                    return
+
+    def start(self):
+        """启动后台清理线程（重复调用无影响）"""
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._loop, name='janitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,461 @@
+"""异步转换任务队列
+
+/api/convert 的异步模式通过本模块把转换提交到一个有界的工作进程池，
+请求线程立即返回任务ID，客户端再通过 /api/jobs/<id> 查询进度。
+
+转换在 SandboxPool 的工作进程中执行，每个任务按页数限制执行时间，
+并限制内存和CPU时间；超出限制的进程被替换，不影响其他任务和Web进程本身。
+提交前预检估算任务耗时（backend/preflight.py），短任务优先调度。
+同步转换也可以通过 run() 在同一个进程池中执行；流式下载的多文件输出通过 stream()
+在工作进程中逐项生成，经临时目录传回Web进程。
+
+指定 state_dir 时，任务记录同时写入磁盘，多进程部署（serve.py）下
+查询请求落到其他Web进程也能读到任务状态。磁盘上的过期记录由后台清理线程
+（backend/janitor.py）按修改时间删除，不在提交任务时遍历目录。
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from backend import metrics
+from backend.preflight import estimate
+from backend.sandbox import SandboxPool
+
+
+def _write_record(record_path: str, record: dict):
+    """原子地写入任务记录文件"""
+    temp_path = f"{record_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f)
+    os.replace(temp_path, record_path)
+
+
+def _run_conversion(converter, input_path, output_path: str, record_path: str = None, method: str = 'convert'):
+    """
+    在工作进程中执行转换（必须是模块级函数，才能被pickle到子进程）
+
+    Args:
+        input_path: 输入文件路径（method 为 convert_many 时为路径列表）
+        record_path: 任务记录文件，开始执行时更新为 running 状态
+        method: 调用的转换器方法
+
+    Returns:
+        tuple: (开始时间, 结束时间, 输出路径, 错误信息, 指标样本)
+    """
+    started_at = time.time()
+    if record_path:
+        try:
+            with open(record_path, encoding='utf-8') as f:
+                record = json.load(f)
+            record.update(state='running', started_at=started_at)
+            _write_record(record_path, record)
+        except (OSError, ValueError):
+            pass
+    with metrics.capture() as samples:
+        try:
+            result = getattr(converter, method)(input_path, output_path)
+        except Exception as e:
+            return started_at, time.time(), None, str(e), samples
+    return started_at, time.time(), result, None, samples
+
+
+def _spool_entries(converter, input_path: str, spool_dir: str) -> int:
+    """
+    在工作进程中逐项生成多文件输出，写入临时目录（必须是模块级函数）
+
+    每项写为 <序号>.data，随后原子地写入 <序号>.name，主进程看到 .name 即可读取该项。
+    主进程删除临时目录后（客户端断开），写入失败，转换随之结束。
+
+    Returns:
+        int: 条目数
+    """
+    count = 0
+    for name, data in converter.iter_entries(input_path):
+        count += 1
+        entry_path = os.path.join(spool_dir, f"{count:06d}")
+        with open(f"{entry_path}.data", 'wb') as f:
+            f.write(data)
+        with open(f"{entry_path}.tmp", 'w', encoding='utf-8') as f:
+            f.write(name)
+        os.replace(f"{entry_path}.tmp", f"{entry_path}.name")
+    return count
+
+
+def _track_in_flight(future, conversion_type: str) -> None:
+    """任务结束时减去进行中的转换数（与 submit 的 on_start 配对，取消的任务从未开始）"""
+    if not future.cancelled():
+        metrics.IN_FLIGHT.dec(type=conversion_type)
+
+
+def _warm_up_worker(conversion_types):
+    """工作进程初始化：预热所选转换引擎"""
+    from backend.converters import REGISTRY
+    REGISTRY.warm_up(conversion_types)
+
+
+class ConversionJob:
+    """单个转换任务的状态记录"""
+
+    def __init__(self, job_id: str, conversion_type: str, input_path: str, output_path: str):
+        self.id = job_id
+        self.conversion_type = conversion_type
+        self.input_path = input_path
+        self.output_path = output_path
+        self.state = 'queued'
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.future = None
+        self.estimate = None
+        self.lane = None
+
+    def to_record(self) -> dict:
+        """转换为写入磁盘的完整记录"""
+        return {
+            'id': self.id,
+            'conversion_type': self.conversion_type,
+            'output_path': self.output_path,
+            'state': self.state,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'result': self.result,
+            'error': self.error,
+        }
+
+    @classmethod
+    def from_record(cls, record: dict) -> 'ConversionJob':
+        """从磁盘记录恢复（恢复的任务没有future，状态以记录为准）"""
+        job = cls(record['id'], record['conversion_type'], None, record['output_path'])
+        for key in ('state', 'submitted_at', 'started_at', 'finished_at', 'result', 'error'):
+            setattr(job, key, record.get(key))
+        return job
+
+    def refresh_state(self):
+        """根据future状态更新 queued -> running"""
+        if self.state == 'queued' and self.future is not None and self.future.running():
+            self.state = 'running'
+
+    def to_dict(self) -> dict:
+        """转换为可JSON序列化的字典"""
+        self.refresh_state()
+        timings = {'submitted_at': self.submitted_at}
+        if self.started_at is not None:
+            timings['started_at'] = self.started_at
+            timings['queue_seconds'] = round(self.started_at - self.submitted_at, 3)
+        if self.finished_at is not None:
+            timings['finished_at'] = self.finished_at
+            timings['total_seconds'] = round(self.finished_at - self.submitted_at, 3)
+            if self.started_at is not None:
+                timings['run_seconds'] = round(self.finished_at - self.started_at, 3)
+        info = {
+            'job_id': self.id,
+            'type': self.conversion_type,
+            'state': self.state,
+            'timings': timings,
+            'error': self.error,
+        }
+        if self.estimate is not None:
+            info['estimate'] = dict(self.estimate.to_dict(), lane=self.lane)
+        return info
+
+
+class JobQueue:
+    """有界的沙箱工作进程池 + 内存中的任务表"""
+
+    def __init__(self, max_workers: int = None, retention_seconds: int = 24 * 3600, warm_up_types=(),
+                 state_dir: str = None, sandbox_options: dict = None, prune_interval: float = 60):
+        """
+        Args:
+            max_workers: 工作进程数（默认等于CPU核心数）
+            retention_seconds: 已完成任务记录的保留时间（state_dir 中的记录文件由调用方交给后台清理线程删除）
+            warm_up_types: 工作进程启动时预热的转换类型
+            state_dir: 任务记录目录（可选），多个Web进程共享
+            sandbox_options: 传给 SandboxPool 的资源限制参数（memory_limit_bytes、timeout_per_page 等）
+            prune_interval: 清理内存中过期任务的最短间隔（秒）
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.retention_seconds = retention_seconds
+        self.warm_up_types = list(warm_up_types)
+        self.state_dir = state_dir
+        self.sandbox_options = dict(sandbox_options or {})
+        self.prune_interval = prune_interval
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        self._executor = None
+        self._jobs = {}
+        self._next_prune = 0.0
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> SandboxPool:
+        # 延迟创建进程池，避免在导入阶段（以及Windows spawn子进程中）启动进程
+        with self._lock:
+            if self._executor is None:
+                if self.warm_up_types:
+                    self._executor = SandboxPool(self.max_workers, initializer=_warm_up_worker,
+                                                 initargs=(self.warm_up_types,), **self.sandbox_options)
+                else:
+                    self._executor = SandboxPool(self.max_workers, **self.sandbox_options)
+            return self._executor
+
+    def start(self):
+        """预先启动全部工作进程并等待其完成预热"""
+        self._get_executor().start()
+
+    def run(self, converter, input_path, output_path: str, method: str = 'convert'):
+        """
+        在工作进程池中同步执行转换并等待结果
+
+        Args:
+            input_path: 输入文件路径（method 为 convert_many 时为路径列表）
+            method: 调用的转换器方法
+
+        Returns:
+            str: 转换器返回的输出路径
+
+        Raises:
+            RuntimeError: 转换失败或超出资源限制
+        """
+        executor = self._get_executor()
+        job_estimate = estimate(converter, input_path)
+        timeout, cpu_seconds = executor.limits_for(job_estimate.pages)
+        conversion_type = converter.conversion_type
+        # 进行中的转换数在主进程中计数，工作进程的计数不会出现在 /metrics
+        future = executor.submit(_run_conversion, converter, input_path, output_path, None, method,
+                                 timeout=timeout, cpu_seconds=cpu_seconds, cost=job_estimate.cost,
+                                 on_start=lambda: metrics.IN_FLIGHT.inc(type=conversion_type))
+        future.add_done_callback(lambda future: _track_in_flight(future, conversion_type))
+        _, _, result, error, samples = future.result()
+        metrics.replay(samples)
+        if error is not None:
+            raise RuntimeError(error)
+        return result
+
+    def stream(self, converter, input_path: str, poll_interval: float = 0.1):
+        """
+        在工作进程池中执行 converter.iter_entries()，边生成边产出条目
+
+        与 run() 一样受沙箱的内存、CPU和执行时间限制；关闭生成器（如客户端断开）时
+        删除临时目录，工作进程中的转换随之失败结束。
+
+        Yields:
+            tuple: (文件名, 字节)
+
+        Raises:
+            RuntimeError: 转换失败或超出资源限制
+        """
+        executor = self._get_executor()
+        job_estimate = estimate(converter, input_path)
+        timeout, cpu_seconds = executor.limits_for(job_estimate.pages)
+        conversion_type = converter.conversion_type
+        spool_dir = tempfile.mkdtemp(prefix='pdfconvert-stream-')
+        future = executor.submit(_spool_entries, converter, input_path, spool_dir,
+                                 timeout=timeout, cpu_seconds=cpu_seconds, cost=job_estimate.cost,
+                                 on_start=lambda: metrics.IN_FLIGHT.inc(type=conversion_type))
+        future.add_done_callback(lambda future: _track_in_flight(future, conversion_type))
+        try:
+            index = 1
+            while True:
+                entry_path = os.path.join(spool_dir, f"{index:06d}")
+                if os.path.exists(f"{entry_path}.name"):
+                    with open(f"{entry_path}.name", encoding='utf-8') as f:
+                        name = f.read()
+                    with open(f"{entry_path}.data", 'rb') as f:
+                        data = f.read()
+                    os.remove(f"{entry_path}.name")
+                    os.remove(f"{entry_path}.data")
+                    index += 1
+                    yield name, data
+                    continue
+                if future.done():
+                    # 结束前写入的最后一项
+                    if os.path.exists(f"{entry_path}.name"):
+                        continue
+                    future.result()
+                    return
+                wait([future], timeout=poll_interval)
+        finally:
+            future.cancel()
+            shutil.rmtree(spool_dir, ignore_errors=True)
+
+    def submit(self, conversion_type: str, converter, input_path: str, output_path: str,
+               on_success=None) -> ConversionJob:
+        """
+        提交转换任务
+
+        Args:
+            conversion_type: 转换类型
+            converter: 转换器实例（需可pickle）
+            input_path: 输入文件路径，任务结束后删除
+            output_path: 输出文件路径
+            on_success: 转换成功后在主进程中调用的回调，参数为任务本身
+
+        Returns:
+            ConversionJob: 新建的任务
+        """
+        job = ConversionJob(uuid.uuid4().hex, conversion_type, input_path, output_path)
+        executor = self._get_executor()
+        job.estimate = estimate(converter, input_path)
+        job.lane = executor.lane_for(job.estimate.cost)
+        timeout, cpu_seconds = executor.limits_for(job.estimate.pages)
+        metrics.JOBS_PENDING.inc(type=conversion_type)
+        # 先写入 queued 记录，工作进程开始执行时再改为 running
+        self._save(job)
+        try:
+            with self._lock:
+                self._prune()
+                self._jobs[job.id] = job
+                job.future = executor.submit(_run_conversion, converter, input_path, output_path,
+                                             self._record_path(job.id), timeout=timeout, cpu_seconds=cpu_seconds,
+                                             cost=job.estimate.cost,
+                                             on_start=lambda: metrics.IN_FLIGHT.inc(type=conversion_type))
+        except Exception:
+            # 提交失败（如进程池已关闭）：撤销计数和 queued 记录，不留下永远排队的任务
+            metrics.JOBS_PENDING.dec(type=conversion_type)
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            self._remove_record(job.id)
+            raise
+        job.future.add_done_callback(lambda future, job=job: self._on_done(job, future, on_success))
+        return job
+
+    def record_completed(self, conversion_type: str, output_path: str) -> ConversionJob:
+        """登记一个无需执行的已完成任务（例如命中结果缓存）"""
+        job = ConversionJob(uuid.uuid4().hex, conversion_type, None, output_path)
+        job.started_at = job.finished_at = job.submitted_at
+        job.result = output_path
+        job.state = 'done'
+        self._save(job)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        return job
+
+    def _record_path(self, job_id: str):
+        return os.path.join(self.state_dir, f"{job_id}.json") if self.state_dir else None
+
+    def _remove_record(self, job_id: str):
+        record_path = self._record_path(job_id)
+        if record_path:
+            try:
+                os.remove(record_path)
+            except OSError:
+                pass
+
+    def _save(self, job: ConversionJob):
+        record_path = self._record_path(job.id)
+        if record_path:
+            try:
+                _write_record(record_path, job.to_record())
+            except OSError as e:
+                print(f"保存任务记录失败: {e}")
+
+    def _on_done(self, job: ConversionJob, future, on_success=None):
+        metrics.JOBS_PENDING.dec(type=job.conversion_type)
+        _track_in_flight(future, job.conversion_type)
+        try:
+            if future.cancelled():
+                raise RuntimeError('服务重启，任务已取消，请重新提交')
+            job.started_at, job.finished_at, job.result, error, samples = future.result()
+            # 工作进程中收集的指标在主进程中记录
+            metrics.replay(samples)
+            if error is not None:
+                raise RuntimeError(error)
+        except Exception as e:
+            job.finished_at = job.finished_at or time.time()
+            # drain() 取消的任务保留其说明
+            job.error = job.error or str(e)
+            job.state = 'failed'
+            print(f"任务 {job.id} 失败: {e}")
+        else:
+            job.state = 'done'
+            if on_success is not None:
+                try:
+                    on_success(job)
+                except Exception as e:
+                    print(f"任务 {job.id} 完成回调出错: {e}")
+        finally:
+            self._save(job)
+            if job.input_path and os.path.exists(job.input_path):
+                try:
+                    os.remove(job.input_path)
+                except OSError:
+                    pass
+
+    def _prune(self):
+        """每隔 prune_interval 删除内存中过期的已完成任务（调用方需持有锁）"""
+        now = time.monotonic()
+        if now < self._next_prune:
+            return
+        self._next_prune = now + self.prune_interval
+        deadline = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at < deadline]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str):
+        """按ID获取任务，不存在时返回None；本进程没有时从磁盘记录读取"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None or not self.state_dir or not job_id.isalnum():
+            return job
+        try:
+            with open(self._record_path(job_id), encoding='utf-8') as f:
+                return ConversionJob.from_record(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def pending(self) -> dict:
+        """各调度通道排队中的任务数"""
+        with self._lock:
+            executor = self._executor
+        return executor.pending() if executor is not None else {}
+
+    def drain(self, timeout: float = None, heartbeat=None, poll_interval: float = 1.0) -> bool:
+        """
+        Web进程退出前排空本进程提交的异步任务，然后关闭进程池
+
+        Args:
+            timeout: 最长等待时间（秒），None 表示等到全部结束；超时后取消剩余任务，
+                其记录标记为失败，客户端不会一直轮询
+            heartbeat: 等待期间定期调用（如gunicorn的心跳），避免进程被判定为无响应而杀死
+            poll_interval: 调用 heartbeat 的间隔（秒）
+
+        Returns:
+            bool: 是否全部任务都已结束
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            with self._lock:
+                active = [job for job in self._jobs.values() if job.future is not None and not job.future.done()]
+            if not active or (deadline is not None and time.monotonic() >= deadline):
+                break
+            if heartbeat is not None:
+                heartbeat()
+            wait([job.future for job in active], timeout=poll_interval, return_when=FIRST_COMPLETED)
+
+        if active:
+            print(f"等待超时，取消 {len(active)} 个未完成的任务")
+        for job in active:
+            if job.state not in ('done', 'failed'):
+                job.finished_at = time.time()
+                job.error = '服务重启，任务未能完成，请重新提交'
+                job.state = 'failed'
+                self._save(job)
+        self.shutdown(wait=not active)
+        return not active
+
+    def shutdown(self, wait: bool = True):
+        """关闭进程池"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,161 @@
+"""增量转换清单
+
+用SQLite记录批量转换和监视文件夹模式中每个输入文件的转换情况：
+输入路径、大小、修改时间、内容哈希、转换类型、参数、输出路径、状态和耗时。
+
+- 输入的大小和修改时间都没变、输出仍然存在时直接跳过，不读取文件内容，
+  扫描大目录时只有新增或修改过的文件需要处理
+- 修改时间变了但内容哈希相同（如被touch或重新复制）时只更新记录
+- 转换开始前先记为 running，进程中途崩溃后再次运行时，已完成的文件被跳过，
+  running 和未处理的文件重新转换
+- 记录开始时不读取文件内容：大小和修改时间没变时沿用已有的哈希，否则由转换任务计算哈希，
+  转换结束时随结果一起记录，提交任务前不需要逐个读取全部输入
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from backend.result_cache import file_digest
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS conversions (
+    input_path TEXT NOT NULL,
+    conversion_type TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    digest TEXT,
+    options TEXT,
+    output_path TEXT,
+    status TEXT NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    seconds REAL,
+    error TEXT,
+    PRIMARY KEY (input_path, conversion_type)
+)
+'''
+
+
+def options_key(options: dict) -> str:
+    """把转换参数序列化为稳定的字符串，用于比较参数是否变化"""
+    return json.dumps(options, sort_keys=True, default=str)
+
+
+class ConversionManifest:
+    """基于SQLite的增量转换清单"""
+
+    def __init__(self, db_path: str, retry_failed: bool = False):
+        """
+        Args:
+            db_path: 清单数据库文件路径
+            retry_failed: 输入未变化时是否重新转换上次失败的文件
+        """
+        self.db_path = db_path
+        self.retry_failed = retry_failed
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # WAL模式下每次提交只追加日志，崩溃后数据库仍然完整
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    def _row(self, input_path: str, conversion_type: str):
+        return self._conn.execute(
+            'SELECT * FROM conversions WHERE input_path = ? AND conversion_type = ?',
+            (input_path, conversion_type)).fetchone()
+
+    def needs_conversion(self, input_path: str, conversion_type: str, options: str, output_path: str) -> bool:
+        """
+        判断文件是否需要转换
+
+        Args:
+            input_path: 输入文件路径
+            conversion_type: 转换类型
+            options: options_key() 序列化的转换参数
+            output_path: 预期的输出路径
+        """
+        input_path = os.path.abspath(input_path)
+        try:
+            stat = os.stat(input_path)
+        except OSError:
+            return False
+        with self._lock:
+            row = self._row(input_path, conversion_type)
+        if row is None or row['options'] != options or row['output_path'] != os.path.abspath(output_path):
+            return True
+
+        unchanged = row['size'] == stat.st_size and row['mtime_ns'] == stat.st_mtime_ns
+        if row['status'] == 'failed':
+            return not unchanged or self.retry_failed
+        if row['status'] != 'done' or not os.path.exists(row['output_path']):
+            return True
+        if unchanged:
+            return False
+
+        # 修改时间变了：内容相同时只更新记录
+        if row['size'] == stat.st_size and file_digest(input_path) == row['digest']:
+            with self._lock:
+                self._conn.execute(
+                    'UPDATE conversions SET mtime_ns = ? WHERE input_path = ? AND conversion_type = ?',
+                    (stat.st_mtime_ns, input_path, conversion_type))
+                self._conn.commit()
+            return False
+        return True
+
+    def start(self, input_path: str, conversion_type: str, options: str, output_path: str):
+        """
+        记录转换开始（状态 running），保存开始时输入的大小和修改时间
+
+        大小和修改时间与已有记录相同时沿用记录中的哈希，否则哈希留空，由 finish() 记录转换任务计算的哈希
+        """
+        input_path = os.path.abspath(input_path)
+        stat = os.stat(input_path)
+        with self._lock:
+            row = self._row(input_path, conversion_type)
+            digest = (row['digest'] if row is not None and row['size'] == stat.st_size
+                      and row['mtime_ns'] == stat.st_mtime_ns else None)
+            self._conn.execute(
+                'INSERT OR REPLACE INTO conversions (input_path, conversion_type, size, mtime_ns, digest, options, '
+                'output_path, status, started_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (input_path, conversion_type, stat.st_size, stat.st_mtime_ns, digest, options,
+                 os.path.abspath(output_path), 'running', time.time()))
+            self._conn.commit()
+
+    def finish(self, input_path: str, conversion_type: str, seconds: Optional[float] = None,
+               error: Optional[str] = None, digest: Optional[str] = None):
+        """
+        记录转换结束（状态 done 或 failed）
+
+        Args:
+            digest: 转换任务开始时计算的输入内容哈希（可选，为None时保留开始时沿用的哈希）
+        """
+        with self._lock:
+            self._conn.execute(
+                'UPDATE conversions SET status = ?, finished_at = ?, seconds = ?, error = ?, '
+                'digest = COALESCE(?, digest) WHERE input_path = ? AND conversion_type = ?',
+                ('failed' if error else 'done', time.time(), seconds, error, digest,
+                 os.path.abspath(input_path), conversion_type))
+            self._conn.commit()
+
+    def interrupted(self, conversion_type: str) -> list:
+        """上次运行中断时仍处于 running 状态的输入"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT input_path FROM conversions WHERE conversion_type = ? AND status = 'running'",
+                (conversion_type,)).fetchall()
+        return [row['input_path'] for row in rows]
+
+    def summary(self) -> dict:
+        """各状态的文件数"""
+        with self._lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) AS count FROM conversions GROUP BY status').fetchall()
+        return {row['status']: row['count'] for row in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,408 @@
+"""转换服务的指标采集
+
+提供计数器、仪表和直方图，以Prometheus文本格式在 /metrics 输出。
+转换器的 convert() 由 BaseConverter 自动包装，记录每种转换类型的耗时、
+成功/失败次数、输入输出字节数、处理页数和进行中的转换数。
+
+指标保存在当前进程内。异步任务在工作进程中执行时，用 capture() 收集样本，
+任务结束后在主进程中 replay()；进行中的转换数由主进程的任务队列计数
+（backend/job_queue.py），工作进程内不再重复计数。
+
+多个Web进程（serve.py）各有一份指标，任一进程响应 /metrics 都应输出全部进程的汇总。
+enable_multiprocess() 后，各进程在指标变化后（最多延迟 flush_interval 秒）把自己的指标
+写入共享目录中的 <pid>.json，render() 读取并汇总目录中所有进程的文件：
+计数器和直方图累加（已退出进程的文件保留，总数不会回退），仪表只累加存活进程的值，
+进程退出后由 mark_process_dead() 删除其仪表值。
+"""
+import atexit
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """带标签的指标基类"""
+
+    metric_type = ''
+
+    def __init__(self, name: str, help_text: str, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+        self._registry = None
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def _changed(self):
+        if self._registry is not None:
+            self._registry.changed()
+
+    def snapshot(self) -> dict:
+        """当前值的副本 {标签值元组: 值}"""
+        with self._lock:
+            return dict(self._values)
+
+    def merge_value(self, value, other):
+        """汇总两个进程的同一样本"""
+        return value + other
+
+    def load_value(self, value):
+        """从共享目录的JSON文件读取的样本值"""
+        return value
+
+    def render(self, values: dict = None) -> list:
+        """输出本指标的文本行，values 为汇总后的值（默认为本进程的值）"""
+        if values is None:
+            values = self.snapshot()
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.metric_type}']
+        for key, value in sorted(values.items()):
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value) -> list:
+        return [f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}']
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    metric_type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self._changed()
+
+
+class Gauge(_Metric):
+    """可增可减的当前值"""
+
+    metric_type = 'gauge'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self._changed()
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+        self._changed()
+
+
+class Histogram(_Metric):
+    """按区间统计分布（用于计算p50/p99等分位数）"""
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, help_text: str, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+        self._changed()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+
+    def merge_value(self, value, other):
+        if len(value[0]) != len(other[0]):
+            # 区间定义不同（如新旧版本代码的进程），无法合并，保留当前值
+            return value
+        return [a + b for a, b in zip(value[0], other[0])], value[1] + other[1]
+
+    def load_value(self, value):
+        counts, total = value
+        return list(counts), total
+
+    def _render_sample(self, key, value) -> list:
+        counts, total = value
+        lines = [
+            f'{self.name}_bucket{_format_labels(self.label_names, key, ("le", _format_value(float(bound))))} {count}'
+            for bound, count in zip(self.buckets, counts)
+        ]
+        labels = _format_labels(self.label_names, key)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {counts[-1]}')
+        return lines
+
+
+def _state_path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"{pid}.json")
+
+
+def _read_state(path: str) -> dict:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_state(path: str, state: dict):
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(temp_path, path)
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = []
+        self._directory = None
+        self._flush_interval = 1.0
+        self._writer_pid = None
+        self._dirty = None
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        metric._registry = self
+        self._metrics.append(metric)
+        return metric
+
+    def enable_multiprocess(self, directory: str, flush_interval: float = 1.0):
+        """
+        多进程汇总：本进程的指标写入共享目录，render() 输出目录中所有进程的汇总
+
+        Args:
+            directory: 共享目录（同一台机器上的所有Web进程相同，服务启动时清空）
+            flush_interval: 指标变化后最多多久写入文件（秒）
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._flush_interval = flush_interval
+
+    def changed(self):
+        """指标变化时调用：多进程模式下由后台线程延迟写入文件"""
+        if self._directory is None:
+            return
+        pid = os.getpid()
+        if self._writer_pid != pid:
+            with self._lock:
+                # 本进程第一次变化（或fork出的子进程）时启动写入线程
+                if self._writer_pid != pid:
+                    self._dirty = threading.Event()
+                    threading.Thread(target=self._flush_loop, args=(self._dirty,),
+                                     name='metrics-flush', daemon=True).start()
+                    if self._writer_pid is None:
+                        atexit.register(self.flush)
+                    self._writer_pid = pid
+        self._dirty.set()
+
+    def _flush_loop(self, dirty: threading.Event):
+        while True:
+            dirty.wait()
+            time.sleep(self._flush_interval)
+            dirty.clear()
+            self.flush()
+
+    def flush(self):
+        """把本进程的指标写入共享目录（只有指标发生过变化的进程才写）"""
+        if self._directory is None or self._writer_pid != os.getpid():
+            return
+        state = {metric.name: [[list(key), value] for key, value in metric.snapshot().items()]
+                 for metric in self._metrics}
+        try:
+            _write_state(_state_path(self._directory, os.getpid()), state)
+        except OSError as e:
+            print(f"写入指标文件失败: {e}")
+
+    def _collect(self) -> dict:
+        """汇总共享目录中所有进程的指标 {指标名: {标签值元组: 值}}"""
+        self.flush()
+        merged = {metric.name: {} for metric in self._metrics}
+        for entry in os.scandir(self._directory):
+            if not entry.name.endswith('.json'):
+                continue
+            state = _read_state(entry.path)
+            for metric in self._metrics:
+                values = merged[metric.name]
+                for key, value in state.get(metric.name, ()):
+                    key, value = tuple(key), metric.load_value(value)
+                    values[key] = metric.merge_value(values[key], value) if key in values else value
+        return merged
+
+    def render(self) -> str:
+        """输出Prometheus文本格式（多进程模式下为所有进程的汇总）"""
+        merged = self._collect() if self._directory is not None else {}
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(merged.get(metric.name)))
+        return '\n'.join(lines) + '\n'
+
+    def mark_process_dead(self, pid: int, directory: str):
+        """进程退出后删除其仪表值（进行中的转换数等），计数器和直方图保留"""
+        path = _state_path(directory, pid)
+        if not os.path.exists(path):
+            return
+        state = _read_state(path)
+        for metric in self._metrics:
+            if metric.metric_type == 'gauge':
+                state.pop(metric.name, None)
+        try:
+            _write_state(path, state)
+        except OSError as e:
+            print(f"更新指标文件失败: {e}")
+
+
+REGISTRY = MetricsRegistry()
+
+CONVERSION_SECONDS = REGISTRY.register(Histogram(
+    'pdfconvert_conversion_duration_seconds', '单次转换耗时（秒）', ('type', 'status')))
+CONVERSIONS_TOTAL = REGISTRY.register(Counter(
+    'pdfconvert_conversions_total', '转换次数', ('type', 'status')))
+INPUT_BYTES = REGISTRY.register(Counter(
+    'pdfconvert_input_bytes_total', '转换输入的字节数', ('type',)))
+OUTPUT_BYTES = REGISTRY.register(Counter(
+    'pdfconvert_output_bytes_total', '转换输出的字节数', ('type',)))
+PAGES_TOTAL = REGISTRY.register(Counter(
+    'pdfconvert_pages_processed_total', '处理的页数', ('type',)))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    'pdfconvert_conversions_in_flight', '正在执行的转换数（含本进程提交到沙箱工作进程的任务）', ('type',)))
+JOBS_PENDING = REGISTRY.register(Gauge(
+    'pdfconvert_jobs_pending', '异步任务队列中排队和执行中的任务数', ('type',)))
+HTTP_SECONDS = REGISTRY.register(Histogram(
+    'pdfconvert_http_request_duration_seconds', 'HTTP请求处理耗时（秒）', ('endpoint', 'method', 'status')))
+
+
+# 当前转换中累计的页数；capture() 期间的样本列表
+_current_pages = contextvars.ContextVar('pdfconvert_current_pages', default=None)
+_captured = contextvars.ContextVar('pdfconvert_captured', default=None)
+
+
+def add_pages(count: int):
+    """转换器内调用：记录本次转换处理的页数"""
+    pages = _current_pages.get()
+    if pages is not None:
+        pages[0] += count
+
+
+def record_conversion(conversion_type: str, status: str, duration: float,
+                      bytes_in: int = 0, bytes_out: int = 0, pages: int = 0):
+    """记录一次转换的结果"""
+    sample = (conversion_type, status, duration, bytes_in, bytes_out, pages)
+    captured = _captured.get()
+    if captured is not None:
+        captured.append(sample)
+        return
+
+    CONVERSION_SECONDS.observe(duration, type=conversion_type, status=status)
+    CONVERSIONS_TOTAL.inc(type=conversion_type, status=status)
+    if bytes_in:
+        INPUT_BYTES.inc(bytes_in, type=conversion_type)
+    if bytes_out:
+        OUTPUT_BYTES.inc(bytes_out, type=conversion_type)
+    if pages:
+        PAGES_TOTAL.inc(pages, type=conversion_type)
+
+
+@contextlib.contextmanager
+def capture():
+    """在工作进程中收集样本而不是直接记录，返回的列表可传回主进程"""
+    samples = []
+    token = _captured.set(samples)
+    try:
+        yield samples
+    finally:
+        _captured.reset(token)
+
+
+def replay(samples):
+    """在主进程中记录工作进程收集的样本"""
+    for sample in samples or ():
+        record_conversion(*sample)
+
+
+def _file_size(path) -> int:
+    # convert_many() 的输入为路径列表，记录总字节数
+    if isinstance(path, (list, tuple)):
+        return sum(_file_size(item) for item in path)
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return 0
+
+
+def instrument_conversion(convert):
+    """
+    包装转换器的 convert() 和 convert_many()，记录耗时、字节数、页数和进行中的转换数
+
+    在另一个已记录的转换中调用时（如 convert() 调用 convert_many()）不重复记录
+    """
+
+    @functools.wraps(convert)
+    def wrapper(self, input_file, output_file=None, *args, **kwargs):
+        if _current_pages.get() is not None:
+            return convert(self, input_file, output_file, *args, **kwargs)
+        conversion_type = self.conversion_type
+        pages = [0]
+        token = _current_pages.set(pages)
+        # capture() 期间在沙箱工作进程中，进行中的转换数由主进程计数
+        track_in_flight = _captured.get() is None
+        if track_in_flight:
+            IN_FLIGHT.inc(type=conversion_type)
+        start = time.perf_counter()
+        status = 'failure'
+        result = None
+        try:
+            result = convert(self, input_file, output_file, *args, **kwargs)
+            status = 'success'
+            return result
+        finally:
+            duration = time.perf_counter() - start
+            if track_in_flight:
+                IN_FLIGHT.dec(type=conversion_type)
+            _current_pages.reset(token)
+            bytes_out = 0
+            if isinstance(result, str):
+                bytes_out = sum(_file_size(path.strip()) for path in result.split(','))
+            record_conversion(conversion_type, status, duration,
+                              _file_size(input_file), bytes_out, pages[0])
+
+    return wrapper
@@ -0,0 +1,132 @@
+"""转换流水线
+
+把多个转换器串联起来，在服务端依次执行，中间结果写入本地暂存区
+（小文件在内存文件系统中），不经过客户端下载再上传。
+
+流水线写法：各阶段用 ``|`` 分隔，最后一个阶段可以用 ``,`` 列出多个分支，
+分支共用上一阶段的输出并行执行，例如：
+
+    word2pdf|pdf2img            Word -> PDF -> 图片
+    ppt2pdf|pdf2word            PPT -> PDF -> Word
+    word2pdf|pdf2img,pdf2word   Word -> PDF，再同时转换为图片和Word
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.converters import REGISTRY
+
+
+class PipelineError(ValueError):
+    """流水线写法无效，或相邻阶段的格式不衔接"""
+
+
+class Pipeline:
+    """按顺序执行的转换阶段，最后一个阶段可以有多个并行分支"""
+
+    def __init__(self, chain: list, branches: list):
+        """
+        Args:
+            chain: 依次执行的转换类型（不含最后一个阶段）
+            branches: 最后一个阶段的转换类型（一个或多个）
+        """
+        self.chain = list(chain)
+        self.branches = list(branches)
+        self._validate()
+
+    @classmethod
+    def parse(cls, spec: str) -> 'Pipeline':
+        """解析 ``word2pdf|pdf2img,pdf2word`` 形式的写法"""
+        stages = [[item.strip() for item in stage.split(',')] for stage in (spec or '').split('|')]
+        if any(not all(stage) for stage in stages):
+            raise PipelineError(f"流水线写法无效: '{spec}'")
+        for stage in stages[:-1]:
+            if len(stage) > 1:
+                raise PipelineError("只有最后一个阶段可以有多个分支")
+        return cls([stage[0] for stage in stages[:-1]], stages[-1])
+
+    @staticmethod
+    def is_pipeline(spec: str) -> bool:
+        return '|' in spec or ',' in spec
+
+    def _validate(self):
+        for conversion_type in self.chain + self.branches:
+            if conversion_type not in REGISTRY:
+                raise PipelineError(f"未知的转换类型: {conversion_type}")
+        if len(set(self.branches)) != len(self.branches):
+            raise PipelineError("最后一个阶段的分支重复")
+
+        previous = None
+        for conversion_type in self.chain:
+            self._check_link(previous, conversion_type)
+            previous = conversion_type
+        for conversion_type in self.branches:
+            self._check_link(previous, conversion_type)
+
+    @staticmethod
+    def _check_link(previous, conversion_type):
+        if previous is None:
+            return
+        output_ext = REGISTRY.get(previous).output_extension
+        if output_ext not in REGISTRY.input_extensions(conversion_type):
+            raise PipelineError(f"{previous} 输出的 {output_ext} 文件不能作为 {conversion_type} 的输入")
+
+    @property
+    def input_extensions(self) -> tuple:
+        """流水线接受的输入格式（即第一个阶段的输入格式）"""
+        return REGISTRY.input_extensions((self.chain + self.branches)[0])
+
+    def output_extension(self, conversion_type: str) -> str:
+        return REGISTRY.get(conversion_type).output_extension
+
+    def __str__(self) -> str:
+        return '|'.join(self.chain + [','.join(self.branches)])
+
+    def run(self, input_file: str, output_paths: dict, spool, converters: dict = None, runner=None) -> dict:
+        """
+        执行流水线
+
+        Args:
+            input_file: 输入文件路径
+            output_paths: 最后一个阶段各分支的输出路径 {转换类型: 路径}
+            spool: 中间结果的暂存区（提供 writable_path(name, size_hint) 的存储）
+            converters: 使用的转换器实例 {转换类型: 实例}，未提供的按默认参数创建
+            runner: 执行单个阶段的函数 runner(转换器, 输入路径, 输出路径)，默认直接调用 convert()
+
+        Returns:
+            dict: {转换类型: 转换结果}
+        """
+        converters = converters or {}
+        runner = runner or (lambda converter, input_path, output_path: converter.convert(input_path, output_path))
+
+        def converter_for(conversion_type):
+            return converters.get(conversion_type) or REGISTRY.create(conversion_type)
+
+        stem = os.path.splitext(os.path.basename(input_file))[0]
+        current = input_file
+        intermediates = []
+        try:
+            for index, conversion_type in enumerate(self.chain):
+                converter = converter_for(conversion_type)
+                path = spool.writable_path(f"{stem}_stage{index + 1}{converter.output_extension}",
+                                           os.path.getsize(current))
+                intermediates.append(path)
+                current = runner(converter, current, path)
+                print(f"流水线阶段 {index + 1} ({conversion_type}) 完成: {current}")
+
+            if len(self.branches) == 1:
+                conversion_type = self.branches[0]
+                return {conversion_type: runner(converter_for(conversion_type), current, output_paths[conversion_type])}
+
+            # 多个分支读取同一个中间文件，并行执行
+            with ThreadPoolExecutor(max_workers=len(self.branches)) as pool:
+                futures = {conversion_type: pool.submit(runner, converter_for(conversion_type), current,
+                                                        output_paths[conversion_type])
+                           for conversion_type in self.branches}
+                return {conversion_type: future.result() for conversion_type, future in futures.items()}
+        finally:
+            for path in intermediates:
+                if os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
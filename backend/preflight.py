@@ -0,0 +1,121 @@
+"""转换任务的预检与成本估算
+
+在提交到工作进程池之前，用很小的代价估算任务的页数和耗时：
+
+- PDF：不超过 MAX_PARSE_BYTES 时用PyPDF2读取页数（只解析交叉引用表和页面树，不解析页面内容），
+  更大的PDF按文件大小折算
+- 图片：用PIL读取图片头获得尺寸和帧数（多帧TIFF/GIF每帧一页），按像素数折算页数（大图的解码和压缩更慢）
+- Office、HTML：转换前无法获得页数，按文件大小粗略折算
+
+估算耗时 = 页数 × 转换器声明的 page_cost（每页秒数）；转换器指定了页码范围时只计所选页面。调度器据此把任务分到
+短任务和长任务通道，超时时间也按页数计算。
+"""
+import os
+from typing import Optional
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff', '.tif', '.webp')
+
+# 超过该大小的PDF不再用PyPDF2预检，按文件大小估算：预检在没有资源限制的Web进程中执行，
+# PyPDF2会把整个文件读入内存并遍历不可信的交叉引用表和页面树，只对小文件这样做
+MAX_PARSE_BYTES = 4 * 1024 * 1024
+
+# 无法获得页数时，按文件大小折算页数
+BYTES_PER_PAGE = 100 * 1024
+
+# 按像素数折算页数时，一页相当于多少像素（约A4页面150DPI）
+PIXELS_PER_PAGE = 1240 * 1754
+
+
+class JobEstimate:
+    """任务的预检结果"""
+
+    def __init__(self, pages: Optional[int], approx_pages: float, cost: float):
+        """
+        Args:
+            pages: 准确的页数（PDF页数或图片张数），无法获得时为None
+            approx_pages: 用于估算耗时的等效页数
+            cost: 估算的耗时（秒）
+        """
+        self.pages = pages
+        self.approx_pages = approx_pages
+        self.cost = cost
+
+    def to_dict(self) -> dict:
+        return {
+            'pages': self.pages,
+            'estimated_seconds': round(self.cost, 1),
+        }
+
+
+def count_pdf_pages(path: str) -> Optional[int]:
+    """读取PDF页数，失败或文件过大时返回None"""
+    try:
+        if os.path.getsize(path) > MAX_PARSE_BYTES:
+            return None
+        from PyPDF2 import PdfReader
+        return len(PdfReader(path).pages)
+    except Exception:
+        return None
+
+
+def image_frames(path: str) -> Optional[tuple]:
+    """
+    读取图片的帧数和每帧像素数（只读取图片头和各帧的头部），失败时返回None
+
+    Returns:
+        tuple: (帧数, 第一帧的像素数)
+    """
+    try:
+        from PIL import Image
+        with Image.open(path) as image:
+            return getattr(image, 'n_frames', 1), image.width * image.height
+    except Exception:
+        return None
+
+
+def _measure(path: str) -> tuple:
+    """返回单个输入的 (准确页数或None, 等效页数)"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.pdf':
+        pages = count_pdf_pages(path)
+        if pages is not None:
+            return pages, pages
+    elif ext in IMAGE_EXTENSIONS:
+        info = image_frames(path)
+        if info is None:
+            return 1, 1.0
+        # 图片转PDF时每帧一页
+        frames, pixels = info
+        return frames, frames * max(1.0, pixels / PIXELS_PER_PAGE)
+
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        size = 0
+    return None, max(1.0, size / BYTES_PER_PAGE)
+
+
+def _selected_pages(converter, page_count: int) -> int:
+    """页码范围中实际存在的页数（所选页面都超出页数时为0，由转换器报错）"""
+    try:
+        return sum(last - first + 1 for first, last in converter.page_ranges(page_count))
+    except ValueError:
+        return 0
+
+
+def estimate(converter, input_path) -> JobEstimate:
+    """
+    估算转换任务的页数和耗时
+
+    Args:
+        converter: 转换器实例（使用其 page_cost）
+        input_path: 输入文件路径，或多个路径（合并转换）
+    """
+    paths = input_path if isinstance(input_path, (list, tuple)) else [input_path]
+    measured = [_measure(path) for path in paths]
+    if getattr(converter, 'pages', None) is not None:
+        measured = [(_selected_pages(converter, exact), _selected_pages(converter, exact))
+                    if exact is not None else (exact, approx) for exact, approx in measured]
+    pages = None if any(exact is None for exact, _ in measured) else sum(exact for exact, _ in measured)
+    approx_pages = sum(approx for _, approx in measured)
+    return JobEstimate(pages, approx_pages, approx_pages * converter.page_cost)
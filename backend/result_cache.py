@@ -0,0 +1,176 @@
+"""内容寻址的转换结果缓存
+
+缓存键由输入文件内容的哈希、转换类型和转换参数共同决定，
+命中时直接复用已有的输出文件，不再执行转换。
+缓存总大小超过预算时按最近最少使用（LRU）顺序淘汰。
+写入时只更新进程内记录的总大小，超出预算（或累计写入较多，需要计入其他进程的写入）时才遍历目录。
+
+缓存文件与转换输出之间不使用硬链接：共享inode时，命中缓存刷新修改时间会同时改变
+已有输出的修改时间（过期时间和ETag），删除其中一方也不能释放磁盘空间。
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# 超过该时间未修改的临时文件视为写入中途退出的残留，淘汰时删除
+_STALE_TEMP_SECONDS = 3600
+
+# linux/fs.h 中的 FICLONE：在支持写时复制的文件系统（btrfs、XFS等）上克隆文件
+_FICLONE = 0x40049409
+
+
+def file_digest(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """计算文件内容的SHA-256"""
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def clone_or_copy(src: str, dst: str):
+    """复制文件：支持写时复制的文件系统上克隆（不复制数据、不额外占用空间），否则完整复制"""
+    if fcntl is not None and sys.platform.startswith('linux'):
+        try:
+            with open(src, 'rb') as source, open(dst, 'wb') as target:
+                fcntl.ioctl(target.fileno(), _FICLONE, source.fileno())
+            return
+        except OSError:
+            pass
+    shutil.copyfile(src, dst)
+
+
+class ResultCache:
+    """基于磁盘目录的结果缓存，文件的修改时间即最近使用时间"""
+
+    def __init__(self, cache_dir: str, max_bytes: int = 2 * 1024 * 1024 * 1024):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限（字节）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # 进程内记录的缓存总大小（None 表示尚未统计）和上次遍历目录后本进程写入的字节数
+        self._total = None
+        self._written = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def __getstate__(self):
+        # 锁不能pickle，批量转换的工作进程各自重建
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(digest: str, conversion_type: str, options: Optional[dict] = None) -> str:
+        """
+        生成缓存键
+
+        Args:
+            digest: 输入文件内容的SHA-256
+            conversion_type: 转换类型
+            options: 影响输出的转换参数
+        """
+        payload = json.dumps(
+            {'digest': digest, 'type': conversion_type, 'options': options or {}},
+            sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str, ext: str) -> str:
+        return os.path.join(self.cache_dir, key + ext)
+
+    def get(self, key: str, ext: str) -> Optional[str]:
+        """查找缓存，命中时刷新最近使用时间并返回缓存文件路径"""
+        path = self._entry_path(key, ext)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def temp_path(self, key: str, ext: str) -> str:
+        """缓存目录中的临时文件路径：边生成边写入（如流式下载），完成后用 put(move=True) 加入缓存"""
+        return f"{self._entry_path(key, ext)}.{uuid.uuid4().hex[:8]}.tmp"
+
+    def put(self, key: str, ext: str, source_path: str, move: bool = False) -> str:
+        """
+        把转换结果加入缓存，返回缓存文件路径
+
+        Args:
+            move: source_path 为 temp_path() 返回的临时文件，直接改名而不复制
+        """
+        path = self._entry_path(key, ext)
+        if move:
+            temp_path = source_path
+        else:
+            temp_path = self.temp_path(key, ext)
+            clone_or_copy(source_path, temp_path)
+        size = os.path.getsize(temp_path)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        os.replace(temp_path, path)
+
+        # 总大小超出预算，或本进程累计写入超过预算的十分之一（其他进程也在写入同一目录）时才遍历目录
+        with self._lock:
+            if self._total is not None:
+                self._total += size - replaced
+            self._written += size
+            due = (self._total is None or self._total > self.max_bytes or
+                   self._written > self.max_bytes // 10)
+        if due:
+            self.evict()
+        return path
+
+    def evict(self):
+        """统计缓存总大小，超出预算时按最近使用时间从旧到新删除到预算的90%（留出余量，避免之后每次写入都遍历目录）"""
+        with self._lock:
+            self._written = 0
+            entries = []
+            total = 0
+            stale_before = time.time() - _STALE_TEMP_SECONDS
+            for entry in os.scandir(self.cache_dir):
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                if entry.name.endswith('.tmp'):
+                    # 写入中途进程退出留下的临时文件
+                    if stat.st_mtime < stale_before:
+                        try:
+                            os.remove(entry.path)
+                        except OSError:
+                            pass
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            if total > self.max_bytes:
+                target = self.max_bytes * 9 // 10
+                entries.sort()
+                for _, size, path in entries:
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                        total -= size
+                    except OSError:
+                        pass
+            self._total = total
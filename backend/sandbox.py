@@ -0,0 +1,404 @@
+"""带资源限制的转换工作进程池
+
+替代 ProcessPoolExecutor 执行转换任务。每个工作进程由一个调度线程管理，
+一次执行一个任务，并对每个任务施加限制：
+
+- 内存：调度线程定期读取工作进程及其子进程（poppler、pdf2docx的多进程等）的RSS之和
+  （Linux /proc），超过上限时杀死整个进程组；可选再用 RLIMIT_AS 限制地址空间，
+  超大分配在工作进程内直接失败
+- CPU时间：执行前按进程已用的CPU时间设置 RLIMIT_CPU，超出时由内核终止进程
+- 墙钟时间：按文档页数估算超时时间，超时杀死进程
+
+超出限制的工作进程被杀死并替换为新进程，只有该任务失败，其他进行中的任务不受影响
+（ProcessPoolExecutor 中任一进程被杀死会使整个进程池失效）。
+
+工作进程用 forkserver（不支持时用 spawn）方式启动：Web进程是多线程的，
+直接fork会继承其他线程持有的锁，子进程可能死锁。
+
+排队中的任务按估算耗时分为短任务和长任务通道调度，见 backend/scheduler.py。
+"""
+import atexit
+import math
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
+
+from backend.scheduler import SHORT, LONG, LaneScheduler
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，只保留墙钟超时
+    resource = None
+
+
+class SandboxLimitExceeded(RuntimeError):
+    """任务超出资源限制，工作进程已被终止"""
+
+
+def _set_soft_limit(kind, soft):
+    _, hard = resource.getrlimit(kind)
+    if hard != resource.RLIM_INFINITY and (soft == resource.RLIM_INFINITY or soft > hard):
+        soft = hard
+    resource.setrlimit(kind, (soft, hard))
+
+
+def _worker_main(conn, address_space_bytes, task_threads, initializer, initargs):
+    """工作进程主循环（必须是模块级函数，才能在spawn模式下启动）"""
+    # 单个转换的默认并行度（见 converters.base_converter.default_parallelism）
+    os.environ['CONVERT_TASK_THREADS'] = str(task_threads)
+    # 成为新进程组的组长，终止时连同转换库启动的子进程一起杀死
+    if hasattr(os, 'setsid'):
+        try:
+            os.setsid()
+        except OSError:
+            pass
+    if resource is not None and address_space_bytes:
+        _set_soft_limit(resource.RLIMIT_AS, address_space_bytes)
+    if initializer is not None:
+        try:
+            initializer(*initargs)
+        except Exception as e:
+            print(f"工作进程初始化失败: {e}")
+    conn.send('ready')
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        fn, args, cpu_seconds = message
+
+        if resource is not None:
+            if cpu_seconds:
+                usage = resource.getrusage(resource.RUSAGE_SELF)
+                _set_soft_limit(resource.RLIMIT_CPU, math.ceil(usage.ru_utime + usage.ru_stime + cpu_seconds))
+            else:
+                _set_soft_limit(resource.RLIMIT_CPU, resource.RLIM_INFINITY)
+
+        exhausted = False
+        try:
+            reply = (True, fn(*args))
+        except MemoryError:
+            reply = (False, '内存不足（超出工作进程的地址空间限制）')
+            exhausted = True
+        except Exception as e:
+            reply = (False, str(e))
+        try:
+            conn.send(reply)
+        except Exception as e:
+            conn.send((False, f"转换结果无法传回主进程: {e}"))
+        if exhausted:
+            # 内存分配失败后进程状态不可靠，退出后由调度线程替换
+            return
+
+
+def _children(pid: int) -> list:
+    """进程的直接子进程（Linux /proc）"""
+    try:
+        tasks = os.listdir(f'/proc/{pid}/task')
+    except OSError:
+        return []
+    children = []
+    for task in tasks:
+        try:
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                children.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    if children or os.path.exists(f'/proc/{pid}/task/{pid}/children'):
+        return children
+    # 内核未提供 children 文件时扫描所有进程的父进程号
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # 进程名可能包含空格和括号，父进程号在最后一个 ')' 之后的第二个字段
+                if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                    children.append(int(entry))
+        except (OSError, ValueError, IndexError):
+            continue
+    return children
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    """读取进程及其所有子孙进程的常驻内存之和（仅Linux），无法读取时返回None"""
+    total = None
+    pending = [pid]
+    seen = set()
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        try:
+            with open(f'/proc/{current}/statm') as f:
+                total = (total or 0) + int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            continue
+        pending.extend(_children(current))
+    return total
+
+
+def _default_context():
+    """forkserver（Linux等）或 spawn：不在多线程的Web进程中直接fork"""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+class SandboxPool:
+    """限制内存、CPU时间和执行时间的工作进程池，接口与 Executor.submit 类似"""
+
+    def __init__(self, max_workers: int, memory_limit_bytes: int = 0, address_space_bytes: int = 0,
+                 timeout_base: float = 60, timeout_per_page: float = 10, default_timeout: float = 600,
+                 cpu_factor: float = 2, short_workers: Optional[int] = None, long_threshold: float = 30,
+                 aging_rate: float = 1.0, task_threads: Optional[int] = None,
+                 initializer=None, initargs=(), poll_interval: float = 0.2):
+        """
+        Args:
+            max_workers: 工作进程数
+            memory_limit_bytes: 单个工作进程的RSS上限（字节），0 表示不限制
+            address_space_bytes: 工作进程的地址空间上限（RLIMIT_AS），0 表示不限制；
+                JVM（tabula）启动时会预留大量虚拟内存，启用时需留足余量
+            timeout_base, timeout_per_page: 超时时间 = 基础时间 + 每页时间 × 页数（秒）
+            default_timeout: 无法获得页数时的超时时间（秒）
+            cpu_factor: CPU时间上限 = 超时时间 × 该系数（多线程转换的CPU时间可能超过墙钟时间）
+            short_workers: 只处理短任务的工作进程数（默认为总数的1/4，至少1个；只有1个进程时为0）
+            long_threshold: 估算耗时超过该值（秒）的任务进入长任务通道
+            aging_rate: 排队任务的老化速度，见 LaneScheduler
+            task_threads: 单个转换默认使用的进程/线程数（pdf2docx、poppler等），
+                默认为 CPU核心数 ÷ 工作进程数（至少1），避免各工作进程都按全部核心并行
+            initializer, initargs: 工作进程启动时调用（如预热转换引擎）
+            poll_interval: 检查内存和超时的间隔（秒）
+        """
+        self.max_workers = max(1, max_workers)
+        self.memory_limit_bytes = memory_limit_bytes
+        self.address_space_bytes = address_space_bytes
+        self.timeout_base = timeout_base
+        self.timeout_per_page = timeout_per_page
+        self.default_timeout = default_timeout
+        self.cpu_factor = cpu_factor
+        if short_workers is None:
+            short_workers = max(1, self.max_workers // 4) if self.max_workers > 1 else 0
+        self.short_workers = min(short_workers, self.max_workers - 1)
+        self.task_threads = max(1, task_threads or (os.cpu_count() or 1) // self.max_workers)
+        self.initializer = initializer
+        self.initargs = initargs
+        self.poll_interval = poll_interval
+        self._context = _default_context()
+        self._tasks = LaneScheduler(long_threshold, aging_rate)
+        self._threads = []
+        self._ready = []
+        self._processes = set()
+        self._lock = threading.Lock()
+        self._shutdown = False
+        atexit.register(self.shutdown, wait=False)
+
+    def limits_for(self, pages: Optional[int]) -> tuple:
+        """
+        按输入页数计算任务限制
+
+        Args:
+            pages: 页数（见 backend/preflight.py），None 表示无法获得
+
+        Returns:
+            tuple: (超时时间, CPU时间上限)，单位秒
+        """
+        if pages is None:
+            timeout = self.default_timeout
+        else:
+            timeout = self.timeout_base + self.timeout_per_page * pages
+        return timeout, timeout * self.cpu_factor
+
+    def _spawn(self):
+        parent_conn, child_conn = self._context.Pipe()
+        # 非守护进程：pdf2docx 等库会在工作进程内再创建子进程
+        process = self._context.Process(
+            target=_worker_main, name='convert-sandbox',
+            args=(child_conn, self.address_space_bytes, self.task_threads,
+                  self.initializer, self.initargs))
+        process.start()
+        child_conn.close()
+        self._processes.add(process)
+        try:
+            # 等待初始化（预热）完成
+            parent_conn.recv()
+        except EOFError:
+            process.join()
+            self._processes.discard(process)
+            raise RuntimeError(f"工作进程启动失败（退出码 {process.exitcode}）")
+        return process, parent_conn
+
+    def _kill(self, process, conn):
+        if process.is_alive():
+            # 工作进程是进程组组长，连同其子进程一起终止
+            if hasattr(os, 'killpg'):
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except OSError:
+                    pass
+            process.kill()
+        process.join()
+        conn.close()
+        self._processes.discard(process)
+
+    @staticmethod
+    def _exit_reason(process) -> str:
+        process.join(1)
+        code = process.exitcode
+        if resource is not None and code == -signal.SIGXCPU:
+            return "转换超出CPU时间限制，已终止"
+        if code == -getattr(signal, 'SIGKILL', 9):
+            return "转换进程被系统终止（可能内存不足）"
+        return f"转换进程异常退出（退出码 {code}）"
+
+    def _wait(self, process, conn, timeout: Optional[float]):
+        """等待任务结果，超出限制时抛出 SandboxLimitExceeded"""
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            if conn.poll(self.poll_interval):
+                try:
+                    return conn.recv()
+                except EOFError:
+                    raise SandboxLimitExceeded(self._exit_reason(process))
+            if not process.is_alive():
+                raise SandboxLimitExceeded(self._exit_reason(process))
+            if deadline is not None and time.monotonic() > deadline:
+                raise SandboxLimitExceeded(f"转换超时（{timeout:.0f}秒），已终止")
+            if self.memory_limit_bytes:
+                rss = _rss_bytes(process.pid)
+                if rss is not None and rss > self.memory_limit_bytes:
+                    raise SandboxLimitExceeded(
+                        f"转换占用内存超出限制（{rss // (1024 * 1024)}MB > "
+                        f"{self.memory_limit_bytes // (1024 * 1024)}MB），已终止")
+
+    def _dispatch(self, ready: threading.Event, lanes: tuple):
+        """调度线程：管理一个工作进程，逐个执行所给通道中的任务"""
+        process = conn = None
+        try:
+            process, conn = self._spawn()
+        except Exception as e:
+            print(f"沙箱工作进程启动失败: {e}")
+        ready.set()
+
+        try:
+            while True:
+                task = self._tasks.get(lanes)
+                if task is None:
+                    break
+                future, fn, args, timeout, cpu_seconds, on_start = task
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if on_start is not None:
+                    try:
+                        on_start()
+                    except Exception as e:
+                        print(f"任务开始回调出错: {e}")
+
+                try:
+                    if process is None or not process.is_alive():
+                        if process is not None:
+                            self._kill(process, conn)
+                        process = conn = None
+                        process, conn = self._spawn()
+                    conn.send((fn, args, cpu_seconds))
+                except Exception as e:
+                    future.set_exception(e)
+                    continue
+
+                try:
+                    ok, value = self._wait(process, conn, timeout)
+                except SandboxLimitExceeded as e:
+                    print(f"沙箱工作进程 {process.pid}: {e}，替换为新进程")
+                    self._kill(process, conn)
+                    process = conn = None
+                    future.set_exception(e)
+                    continue
+
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(RuntimeError(value))
+        finally:
+            if process is not None:
+                try:
+                    conn.send(None)
+                    process.join(5)
+                except (OSError, ValueError):
+                    pass
+                self._kill(process, conn)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("进程池已关闭")
+            while len(self._threads) < self.max_workers:
+                ready = threading.Event()
+                lanes = (SHORT,) if len(self._threads) < self.short_workers else (SHORT, LONG)
+                thread = threading.Thread(target=self._dispatch, args=(ready, lanes),
+                                          name=f'sandbox-{len(self._threads)}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+                self._ready.append(ready)
+
+    def start(self):
+        """预先启动全部工作进程并等待其完成初始化"""
+        self._ensure_started()
+        for ready in self._ready:
+            ready.wait()
+
+    def submit(self, fn, *args, timeout: Optional[float] = None, cpu_seconds: Optional[float] = None,
+               cost: float = 0, on_start=None) -> Future:
+        """
+        提交任务
+
+        Args:
+            fn: 在工作进程中执行的函数（需可pickle，参数同理）
+            timeout: 墙钟超时时间（秒），None 表示不限制
+            cpu_seconds: 本任务可用的CPU时间（秒），None 表示不限制
+            cost: 估算耗时（秒），决定任务所在的通道和排队顺序
+            on_start: 任务开始执行时在调度线程中调用（无参数）；取消的任务不会调用
+
+        Returns:
+            Future: 任务结果；超出限制时为 SandboxLimitExceeded 异常
+        """
+        self._ensure_started()
+        future = Future()
+        self._tasks.put((future, fn, args, timeout, cpu_seconds, on_start), cost)
+        return future
+
+    def lane_for(self, cost: float) -> str:
+        return self._tasks.lane_for(cost)
+
+    def pending(self) -> dict:
+        """各通道排队中的任务数"""
+        return self._tasks.pending()
+
+    def shutdown(self, wait: bool = True):
+        """关闭进程池：wait=True 时等待已提交的任务执行完，否则放弃排队中的任务"""
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            threads = list(self._threads)
+        for task in self._tasks.close(discard=not wait):
+            task[0].cancel()
+        if not wait:
+            # 进行中的任务随进程一起终止，避免解释器退出时等待非守护子进程
+            for process in list(self._processes):
+                if process.is_alive():
+                    if hasattr(os, 'killpg'):
+                        try:
+                            os.killpg(process.pid, signal.SIGKILL)
+                        except OSError:
+                            pass
+                    process.kill()
+        else:
+            for thread in threads:
+                thread.join()
@@ -0,0 +1,93 @@
+"""按估算成本调度的任务队列
+
+任务按预检估算的耗时分为短任务和长任务两个通道，每个通道内短作业优先。
+一部分工作进程只处理短任务，一个800页的PDF转Word不会让后面的单页转换排长队；
+其余工作进程两个通道都处理。
+
+为避免长任务在持续的短任务流中饿死，任务的优先级随等待时间提升（老化）：
+排序键为 估算耗时 + aging_rate × 提交时间，所有任务以相同速度老化，
+因此键在提交时即可确定，等待 (长任务耗时 - 短任务耗时) / aging_rate 秒后长任务排到短任务之前。
+"""
+import heapq
+import itertools
+import threading
+import time
+
+SHORT = 'short'
+LONG = 'long'
+
+
+class LaneScheduler:
+    """短任务/长任务两个通道的优先队列"""
+
+    def __init__(self, long_threshold: float = 30, aging_rate: float = 1.0):
+        """
+        Args:
+            long_threshold: 估算耗时超过该值（秒）的任务进入长任务通道
+            aging_rate: 每等待1秒，优先级相当于估算耗时减少多少秒
+        """
+        self.long_threshold = long_threshold
+        self.aging_rate = aging_rate
+        self._heaps = {SHORT: [], LONG: []}
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def lane_for(self, cost: float) -> str:
+        return LONG if cost > self.long_threshold else SHORT
+
+    def put(self, item, cost: float) -> str:
+        """
+        加入任务
+
+        Returns:
+            str: 任务所在的通道
+        """
+        lane = self.lane_for(cost)
+        key = cost + self.aging_rate * time.monotonic()
+        with self._cond:
+            heapq.heappush(self._heaps[lane], (key, next(self._sequence), item))
+            self._cond.notify_all()
+        return lane
+
+    def get(self, lanes=(SHORT, LONG)):
+        """
+        取出所给通道中优先级最高的任务，没有任务时等待
+
+        Returns:
+            任务；队列已关闭且所给通道中没有任务时返回None
+        """
+        with self._cond:
+            while True:
+                heads = [(self._heaps[lane][0], lane) for lane in lanes if self._heaps[lane]]
+                if heads:
+                    _, lane = min(heads)
+                    return heapq.heappop(self._heaps[lane])[2]
+                if self._closed:
+                    return None
+                self._cond.wait()
+
+    def pending(self) -> dict:
+        """各通道排队中的任务数"""
+        with self._cond:
+            return {lane: len(heap) for lane, heap in self._heaps.items()}
+
+    def close(self, discard: bool = False) -> list:
+        """
+        关闭队列：之后 get() 取完剩余任务后返回None
+
+        Args:
+            discard: 是否丢弃排队中的任务
+
+        Returns:
+            list: 被丢弃的任务
+        """
+        with self._cond:
+            self._closed = True
+            discarded = []
+            if discard:
+                for heap in self._heaps.values():
+                    discarded.extend(entry[2] for entry in heap)
+                    heap.clear()
+            self._cond.notify_all()
+        return discarded
@@ -0,0 +1,301 @@
+"""上传文件和转换输出的存储后端
+
+转换库（pdf2docx、poppler、tabula等）都需要本地文件路径，所以文件总是先写入
+本地暂存区，转换完成后再 commit() 到存储后端：
+
+- LocalStorage：本地目录。提供 memory_dir（如 /dev/shm 下的tmpfs目录）时，
+  小文件写入内存文件系统，转换后超过阈值的输出移回磁盘
+- DirectoryStorage：共享目录（如多台主机挂载的NFS），输出提交后移动到该目录
+- S3Storage：S3兼容的对象存储（含MinIO等本地部署），输出提交后上传
+
+create_storage() 按 STORAGE_URL 形式的地址创建输出存储。
+"""
+import os
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from backend.result_cache import clone_or_copy
+
+
+class StoredFile:
+    """存储中的文件信息"""
+
+    def __init__(self, name: str, size: int, mtime: float, etag: str):
+        self.name = name
+        self.size = size
+        self.mtime = mtime
+        self.etag = etag
+
+
+def _stat_file(name: str, path: str) -> Optional[StoredFile]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    # 与nginx相同，用修改时间和大小生成ETag，共享目录在各主机上一致
+    return StoredFile(name, stat.st_size, stat.st_mtime, f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+
+
+def _iter_file_range(path: str, start: int, stop: int, chunk_size: int = 256 * 1024):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = stop - start
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def default_memory_dir() -> Optional[str]:
+    """
+    内存暂存目录：环境变量 SPOOL_MEMORY_DIR，未设置时在Linux上使用 /dev/shm，
+    设为 none 时不使用内存暂存
+    """
+    value = os.environ.get('SPOOL_MEMORY_DIR')
+    if value is not None:
+        return None if value.lower() in ('', 'none') else value
+    return '/dev/shm/pdf-convert' if os.path.isdir('/dev/shm') else None
+
+
+class Storage(ABC):
+    """存储后端接口：先通过 writable_path() 获得本地路径写入，再 commit()"""
+
+    @abstractmethod
+    def writable_path(self, name: str, size_hint: Optional[int] = None) -> str:
+        """
+        返回写入文件用的本地路径
+
+        Args:
+            name: 文件名（不含目录）
+            size_hint: 预计大小（字节），用于选择内存或磁盘暂存
+        """
+
+    @abstractmethod
+    def commit(self, name: str):
+        """写入完成，把文件提交到存储后端"""
+
+    @abstractmethod
+    def local_path(self, name: str) -> Optional[str]:
+        """已提交文件的本地路径，不在本地时返回None"""
+
+    @abstractmethod
+    def stat(self, name: str) -> Optional[StoredFile]:
+        """文件信息，不存在时返回None"""
+
+    @abstractmethod
+    def delete(self, name: str):
+        pass
+
+    def iter_range(self, name: str, start: int, stop: int):
+        """逐块读取 [start, stop) 字节范围"""
+        path = self.local_path(name)
+        if path is None:
+            raise FileNotFoundError(name)
+        return _iter_file_range(path, start, stop)
+
+    def put_file(self, name: str, source_path: str):
+        """把已有文件（如缓存结果）存入存储"""
+        path = self.writable_path(name, os.path.getsize(source_path))
+        clone_or_copy(source_path, path)
+        self.commit(name)
+
+    def local_folders(self) -> list:
+        """本地暂存目录，由后台清理线程管理"""
+        return []
+
+
+class LocalStorage(Storage):
+    """本地目录，可选把小文件放在内存文件系统中"""
+
+    def __init__(self, root: str, memory_dir: Optional[str] = None,
+                 memory_max_bytes: int = 8 * 1024 * 1024, memory_min_free_ratio: float = 0.25):
+        """
+        Args:
+            root: 磁盘目录
+            memory_dir: 内存文件系统（tmpfs）中的目录，None 表示不使用
+            memory_max_bytes: 不超过该大小的文件放在内存中
+            memory_min_free_ratio: 内存文件系统剩余空间低于该比例时不再使用
+        """
+        self.root = root
+        self.memory_dir = memory_dir
+        self.memory_max_bytes = memory_max_bytes
+        self.memory_min_free_ratio = memory_min_free_ratio
+        os.makedirs(root, exist_ok=True)
+        if memory_dir:
+            try:
+                os.makedirs(memory_dir, exist_ok=True)
+            except OSError as e:
+                print(f"内存暂存目录不可用，使用磁盘: {e}")
+                self.memory_dir = None
+
+    def _fits_in_memory(self, size: Optional[int]) -> bool:
+        if not self.memory_dir or size is None or size > self.memory_max_bytes:
+            return False
+        try:
+            usage = shutil.disk_usage(self.memory_dir)
+        except OSError:
+            return False
+        return usage.free - size >= usage.total * self.memory_min_free_ratio
+
+    def writable_path(self, name: str, size_hint: Optional[int] = None) -> str:
+        folder = self.memory_dir if self._fits_in_memory(size_hint) else self.root
+        return os.path.join(folder, name)
+
+    def commit(self, name: str):
+        # 内存中的输出超过阈值时移回磁盘
+        if not self.memory_dir:
+            return
+        memory_path = os.path.join(self.memory_dir, name)
+        try:
+            if os.path.getsize(memory_path) > self.memory_max_bytes:
+                shutil.move(memory_path, os.path.join(self.root, name))
+        except OSError:
+            pass
+
+    def local_path(self, name: str) -> Optional[str]:
+        for folder in (self.memory_dir, self.root):
+            if folder:
+                path = os.path.join(folder, name)
+                if os.path.isfile(path):
+                    return path
+        return None
+
+    def stat(self, name: str) -> Optional[StoredFile]:
+        path = self.local_path(name)
+        return _stat_file(name, path) if path else None
+
+    def delete(self, name: str):
+        path = self.local_path(name)
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def local_folders(self) -> list:
+        return [folder for folder in (self.root, self.memory_dir) if folder]
+
+
+class DirectoryStorage(Storage):
+    """共享目录：写入本地暂存区，提交时移动到共享目录"""
+
+    def __init__(self, root: str, spool: LocalStorage):
+        self.root = root
+        self.spool = spool
+        os.makedirs(root, exist_ok=True)
+
+    def writable_path(self, name: str, size_hint: Optional[int] = None) -> str:
+        return self.spool.writable_path(name, size_hint)
+
+    def commit(self, name: str):
+        source = self.spool.local_path(name)
+        if source is None:
+            raise FileNotFoundError(name)
+        # 先移动为临时文件再改名，其他主机不会读到写了一半的文件
+        temp_path = os.path.join(self.root, f".{name}.{uuid.uuid4().hex[:8]}.tmp")
+        shutil.move(source, temp_path)
+        os.replace(temp_path, os.path.join(self.root, name))
+
+    def local_path(self, name: str) -> Optional[str]:
+        path = os.path.join(self.root, name)
+        return path if os.path.isfile(path) else None
+
+    def stat(self, name: str) -> Optional[StoredFile]:
+        return _stat_file(name, os.path.join(self.root, name))
+
+    def delete(self, name: str):
+        try:
+            os.remove(os.path.join(self.root, name))
+        except OSError:
+            pass
+
+    def local_folders(self) -> list:
+        return self.spool.local_folders() + [self.root]
+
+
+class S3Storage(Storage):
+    """S3兼容的对象存储：写入本地暂存区，提交时上传"""
+
+    def __init__(self, bucket: str, prefix: str, spool: LocalStorage, endpoint_url: Optional[str] = None):
+        """
+        Args:
+            bucket: 存储桶
+            prefix: 对象键前缀
+            spool: 本地暂存区
+            endpoint_url: S3兼容服务的地址（如本地部署的MinIO），默认使用AWS
+        """
+        try:
+            import boto3
+        except ImportError:
+            raise ImportError("需要安装boto3库: pip install boto3")
+
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.spool = spool
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def writable_path(self, name: str, size_hint: Optional[int] = None) -> str:
+        return self.spool.writable_path(name, size_hint)
+
+    def commit(self, name: str):
+        source = self.spool.local_path(name)
+        if source is None:
+            raise FileNotFoundError(name)
+        try:
+            self.client.upload_file(source, self.bucket, self._key(name))
+        finally:
+            os.remove(source)
+
+    def put_file(self, name: str, source_path: str):
+        self.client.upload_file(source_path, self.bucket, self._key(name))
+
+    def local_path(self, name: str) -> Optional[str]:
+        return None
+
+    def stat(self, name: str) -> Optional[StoredFile]:
+        from botocore.exceptions import ClientError
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(name))
+        except ClientError:
+            return None
+        return StoredFile(name, head['ContentLength'], head['LastModified'].timestamp(),
+                          head['ETag'].strip('"'))
+
+    def iter_range(self, name: str, start: int, stop: int):
+        if stop <= start:
+            return iter(())
+        body = self.client.get_object(Bucket=self.bucket, Key=self._key(name),
+                                      Range=f"bytes={start}-{stop - 1}")['Body']
+        return body.iter_chunks(256 * 1024)
+
+    def delete(self, name: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+
+    def local_folders(self) -> list:
+        return self.spool.local_folders()
+
+
+def create_storage(url: Optional[str], spool: LocalStorage) -> Storage:
+    """
+    按地址创建输出存储
+
+    Args:
+        url: 空值表示直接使用本地暂存区；目录路径或 file:///path 表示共享目录；
+             s3://bucket/prefix 表示对象存储（环境变量 S3_ENDPOINT_URL 指定S3兼容服务地址）
+        spool: 本地暂存区
+    """
+    if not url:
+        return spool
+    if url.startswith('s3://'):
+        bucket, _, prefix = url[len('s3://'):].partition('/')
+        return S3Storage(bucket, prefix, spool, endpoint_url=os.environ.get('S3_ENDPOINT_URL'))
+    if url.startswith('file://'):
+        url = url[len('file://'):]
+    return DirectoryStorage(url, spool)
@@ -0,0 +1,122 @@
+"""文件夹监视
+
+Linux上通过ctypes调用inotify，文件写入完成（IN_CLOSE_WRITE）或移入（IN_MOVED_TO）
+目录时立即得到通知，新建的子目录自动加入监视。其他平台退回定时扫描。
+
+read() 返回有变化的文件路径列表；返回None表示需要重新扫描整个目录
+（定时扫描模式，或inotify事件队列溢出）。
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from typing import Optional
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """基于inotify的文件夹监视（仅Linux）"""
+
+    def __init__(self, root: str, recursive: bool = False):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify仅支持Linux")
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify初始化失败")
+        self.root = root
+        self.recursive = recursive
+        self._dirs = {}
+        if recursive:
+            for dirpath, _, _ in os.walk(root):
+                self._add_watch(dirpath)
+        else:
+            self._add_watch(root)
+
+    def _add_watch(self, path: str):
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | (IN_CREATE if self.recursive else 0)
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+        if wd < 0:
+            print(f"无法监视目录 {path}: {os.strerror(ctypes.get_errno())}")
+            return
+        self._dirs[wd] = path
+
+    def read(self, timeout: Optional[float] = None) -> Optional[list]:
+        """等待事件（最多 timeout 秒），返回有变化的文件路径"""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self._fd, 64 * 1024)
+
+        paths = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + length].rstrip(b'\0')
+            offset += _EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                # 新建或移入的子目录：加入监视，并处理在加入监视之前已经写入的文件
+                if self.recursive:
+                    for dirpath, _, names in os.walk(path):
+                        self._add_watch(dirpath)
+                        paths.extend(os.path.join(dirpath, item) for item in names)
+                continue
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                paths.append(path)
+        return paths
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """定时扫描（不支持inotify的平台）"""
+
+    def __init__(self, root: str, recursive: bool = False, interval: float = 5):
+        self.root = root
+        self.recursive = recursive
+        self.interval = interval
+        self._next_scan = time.monotonic() + interval
+
+    def read(self, timeout: Optional[float] = None) -> Optional[list]:
+        """到达扫描时间时返回None（由调用方重新扫描），否则最多等待 timeout 秒后返回空列表"""
+        now = time.monotonic()
+        if now >= self._next_scan:
+            self._next_scan = now + self.interval
+            return None
+        wait = self._next_scan - now
+        time.sleep(wait if timeout is None else min(timeout, wait))
+        return []
+
+    def close(self):
+        pass
+
+
+def create_watcher(root: str, recursive: bool = False, poll_interval: float = 5):
+    """优先使用inotify，不可用时退回定时扫描"""
+    try:
+        return InotifyWatcher(root, recursive)
+    except (OSError, AttributeError) as e:
+        print(f"inotify不可用（{e}），每 {poll_interval} 秒扫描一次")
+        return PollingWatcher(root, recursive, poll_interval)
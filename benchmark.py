@@ -0,0 +1,437 @@
+"""转换器性能基准测试
+
+在本地生成合成测试文件，按规模档位运行 backend/converters 中的每个转换器，
+记录耗时、每秒页数、峰值内存和输出大小，结果保存为JSON；
+compare 子命令对比两次结果并标出性能回退。
+
+重复运行时页面渲染缓存会让后几次测到热缓存，默认关闭缓存（--cache off）；
+--cache cold-warm 时每轮先清空缓存运行一次（冷），再运行一次（热），分别记录。
+转换器直接调用，不经过Web服务的结果缓存。
+
+示例:
+  python benchmark.py run -o results.json
+  python benchmark.py run --only PDFToImageConverter PDFToWordConverter --tiers small medium
+  python benchmark.py run --only PDFToImageConverter PDFToPPTConverter --cache cold-warm
+  python benchmark.py compare baseline.json results.json --threshold 0.1
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend.converters import REGISTRY
+
+
+# 规模档位：每种测试文件在各档位的页数/尺寸
+TIERS = {
+    'small': {'pages': 1, 'image_size': (800, 600), 'rows': 20},
+    'medium': {'pages': 20, 'image_size': (2400, 1800), 'rows': 200},
+    'large': {'pages': 200, 'image_size': (6000, 4000), 'rows': 2000},
+}
+
+# 转换器 -> 所需的测试文件类型
+FIXTURE_KINDS = {
+    'WordToPDFConverter': 'docx',
+    'PPTToPDFConverter': 'pptx',
+    'ExcelToPDFConverter': 'xlsx',
+    'ImageToPDFConverter': 'jpg',
+    'HTMLToPDFConverter': 'html',
+    'PDFToWordConverter': 'pdf',
+    'PDFToPPTConverter': 'pdf',
+    'PDFToImageConverter': 'pdf',
+    'PDFToExcelConverter': 'table_pdf',
+}
+
+LOREM = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor '
+         'incididunt ut labore et dolore magna aliqua').split()
+
+
+def _sentence(rng: random.Random, words: int = 14) -> str:
+    return ' '.join(rng.choice(LOREM) for _ in range(words)).capitalize() + '.'
+
+
+# ---------------------------------------------------------------- 测试文件生成
+
+def make_pdf(path: str, tier: dict, rng: random.Random):
+    """多页文本PDF"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(path, pagesize=A4)
+    width, height = A4
+    for page in range(tier['pages']):
+        c.setFont('Helvetica-Bold', 16)
+        c.drawString(60, height - 60, f'Benchmark page {page + 1}')
+        c.setFont('Helvetica', 10)
+        y = height - 90
+        while y > 60:
+            c.drawString(60, y, _sentence(rng))
+            y -= 14
+        c.rect(60, 80, width - 120, 40)
+        c.showPage()
+    c.save()
+
+
+def make_table_pdf(path: str, tier: dict, rng: random.Random):
+    """包含表格的PDF"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+
+    rows = [['ID', 'Name', 'Quantity', 'Price', 'Total']]
+    for i in range(tier['rows']):
+        quantity = rng.randint(1, 100)
+        price = round(rng.uniform(1, 500), 2)
+        rows.append([str(i + 1), rng.choice(LOREM).title(), str(quantity), f'{price:.2f}', f'{quantity * price:.2f}'])
+
+    table = Table(rows, repeatRows=1)
+    table.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ]))
+    SimpleDocTemplate(path, pagesize=A4).build([table])
+
+
+def make_jpg(path: str, tier: dict, rng: random.Random):
+    """带渐变和噪点的照片类图片"""
+    from PIL import Image, ImageDraw
+
+    width, height = tier['image_size']
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    for _ in range(200):
+        x, y = rng.randrange(width), rng.randrange(height)
+        r = rng.randint(5, max(6, width // 20))
+        draw.ellipse((x - r, y - r, x + r, y + r),
+                     fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    image.save(path, 'JPEG', quality=90)
+
+
+def make_html(path: str, tier: dict, rng: random.Random):
+    """带样式和表格的HTML页面"""
+    parts = ['<!DOCTYPE html><html><head><meta charset="utf-8"><style>',
+             'body{font-family:sans-serif} table{border-collapse:collapse} td{border:1px solid #999;padding:2px}',
+             '</style></head><body>']
+    for page in range(tier['pages']):
+        parts.append(f'<h1>Section {page + 1}</h1>')
+        parts.extend(f'<p>{_sentence(rng, 40)}</p>' for _ in range(12))
+        parts.append('<table>')
+        parts.extend(f'<tr><td>{i}</td><td>{_sentence(rng, 4)}</td></tr>' for i in range(10))
+        parts.append('</table><div style="page-break-after:always"></div>')
+    parts.append('</body></html>')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(''.join(parts))
+
+
+def make_docx(path: str, tier: dict, rng: random.Random):
+    """最小化的Word文档（直接写OOXML，不依赖python-docx）"""
+    paragraphs = []
+    for page in range(tier['pages']):
+        paragraphs.append(f'<w:p><w:r><w:rPr><w:b/></w:rPr><w:t>Benchmark page {page + 1}</w:t></w:r></w:p>')
+        paragraphs.extend(f'<w:p><w:r><w:t>{_sentence(rng, 40)}</w:t></w:r></w:p>' for _ in range(10))
+        paragraphs.append('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr('[Content_Types].xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'))
+        docx.writestr('_rels/.rels', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="word/document.xml"/></Relationships>'))
+        docx.writestr('word/document.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+            + ''.join(paragraphs) + '</w:body></w:document>'))
+
+
+def make_pptx(path: str, tier: dict, rng: random.Random):
+    """每页一张标题+正文的幻灯片"""
+    from pptx import Presentation
+
+    prs = Presentation()
+    for page in range(tier['pages']):
+        slide = prs.slides.add_slide(prs.slide_layouts[1])
+        slide.shapes.title.text = f'Benchmark slide {page + 1}'
+        slide.placeholders[1].text = '\n'.join(_sentence(rng) for _ in range(5))
+    prs.save(path)
+
+
+def make_xlsx(path: str, tier: dict, rng: random.Random):
+    """数值表格"""
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['ID', 'Name', 'Quantity', 'Price'])
+    for i in range(tier['rows']):
+        ws.append([i + 1, rng.choice(LOREM), rng.randint(1, 100), round(rng.uniform(1, 500), 2)])
+    wb.save(path)
+
+
+FIXTURE_MAKERS = {
+    'pdf': ('.pdf', make_pdf),
+    'table_pdf': ('.pdf', make_table_pdf),
+    'jpg': ('.jpg', make_jpg),
+    'html': ('.html', make_html),
+    'docx': ('.docx', make_docx),
+    'pptx': ('.pptx', make_pptx),
+    'xlsx': ('.xlsx', make_xlsx),
+}
+
+
+def ensure_fixture(fixture_dir: str, kind: str, tier_name: str, seed: int) -> str:
+    """生成（或复用已生成的）测试文件，相同seed得到相同内容"""
+    ext, maker = FIXTURE_MAKERS[kind]
+    path = os.path.join(fixture_dir, f'{kind}_{tier_name}_seed{seed}{ext}')
+    if not os.path.exists(path):
+        temp_path = path + '.tmp' + ext
+        maker(temp_path, TIERS[tier_name], random.Random(f'{seed}-{kind}-{tier_name}'))
+        os.replace(temp_path, path)
+    return path
+
+
+# ---------------------------------------------------------------- 测量
+
+def _peak_rss_bytes():
+    """当前进程及已结束子进程的峰值常驻内存（Windows上不可用）"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    scale = 1 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) * scale
+
+
+def _count_pages(path: str):
+    """统计PDF页数（需要PyPDF2）"""
+    try:
+        from PyPDF2 import PdfReader
+        return len(PdfReader(path).pages)
+    except Exception:
+        return None
+
+
+def _measure(class_name: str, input_file: str, output_file: str) -> dict:
+    """在独立的子进程中执行一次转换（模块级函数，便于pickle）"""
+    converter_class = next(cls for cls in _converter_classes() if cls.__name__ == class_name)
+    converter = converter_class()
+
+    start = time.perf_counter()
+    result = converter.convert(input_file, output_file)
+    wall = time.perf_counter() - start
+
+    outputs = [path.strip() for path in result.split(',')]
+    return {
+        'wall_seconds': wall,
+        'peak_rss_bytes': _peak_rss_bytes(),
+        'output_bytes': sum(os.path.getsize(path) for path in outputs if os.path.exists(path)),
+        'output_pages': _count_pages(outputs[0]) if outputs[0].lower().endswith('.pdf') else None,
+    }
+
+
+def _converter_classes() -> list:
+    """注册表中的全部转换器类"""
+    return REGISTRY.classes()
+
+
+def run_benchmarks(args) -> dict:
+    """运行基准测试并返回结果字典"""
+    fixture_dir = os.path.abspath(args.fixtures)
+    work_dir = os.path.join(fixture_dir, 'outputs')
+    os.makedirs(work_dir, exist_ok=True)
+    spawn = get_context('spawn')
+
+    # 子进程以spawn方式启动，继承此处设置的环境变量
+    cache_dir = os.path.join(work_dir, 'page_cache')
+    if args.cache == 'off':
+        os.environ['PAGE_CACHE_MAX_MB'] = '0'
+    else:
+        os.environ['PAGE_CACHE_DIR'] = cache_dir
+        if int(os.environ.get('PAGE_CACHE_MAX_MB', 0)) <= 0:
+            os.environ['PAGE_CACHE_MAX_MB'] = '2048'
+
+    def run_once(name, input_file, output_file):
+        # 每次在新进程中运行，峰值内存互不影响
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+            return pool.submit(_measure, name, input_file, output_file).result()
+
+    results = []
+    for cls in _converter_classes():
+        name = cls.__name__
+        if args.only and name not in args.only:
+            continue
+        kind = FIXTURE_KINDS.get(name)
+        if kind is None:
+            print(f"跳过 {name}: 未配置测试文件类型，请在 FIXTURE_KINDS 中添加")
+            continue
+
+        for tier_name in args.tiers:
+            record = {'converter': name, 'fixture': kind, 'tier': tier_name}
+            try:
+                input_file = ensure_fixture(fixture_dir, kind, tier_name, args.seed)
+            except Exception as e:
+                record['error'] = f'生成测试文件失败: {e}'
+                results.append(record)
+                print(f"✗ {name:<22} {tier_name:<7} {record['error']}")
+                continue
+
+            record['input_bytes'] = os.path.getsize(input_file)
+            record['pages'] = _count_pages(input_file) if input_file.endswith('.pdf') else None
+            output_file = os.path.join(work_dir, f'{name}_{tier_name}{cls.output_extension}')
+
+            runs = []
+            warm_runs = []
+            try:
+                for _ in range(args.repeat):
+                    if args.cache == 'cold-warm':
+                        shutil.rmtree(cache_dir, ignore_errors=True)
+                        runs.append(run_once(name, input_file, output_file))
+                        warm_runs.append(run_once(name, input_file, output_file))
+                    else:
+                        runs.append(run_once(name, input_file, output_file))
+            except Exception as e:
+                record['error'] = str(e).splitlines()[0]
+                results.append(record)
+                print(f"✗ {name:<22} {tier_name:<7} {record['error']}")
+                continue
+
+            wall = statistics.median(run['wall_seconds'] for run in runs)
+            pages = record['pages'] or runs[0]['output_pages']
+            rss_values = [run['peak_rss_bytes'] for run in runs if run['peak_rss_bytes'] is not None]
+            record.update({
+                'pages': pages,
+                'runs': [round(run['wall_seconds'], 4) for run in runs],
+                'wall_seconds': round(wall, 4),
+                'pages_per_sec': round(pages / wall, 3) if pages and wall > 0 else None,
+                'peak_rss_bytes': max(rss_values) if rss_values else None,
+                'output_bytes': runs[-1]['output_bytes'],
+            })
+            # wall_seconds 始终是冷缓存（或无缓存）的耗时，热缓存的耗时单独记录
+            warm_text = ''
+            if warm_runs:
+                warm = statistics.median(run['wall_seconds'] for run in warm_runs)
+                record.update({
+                    'warm_runs': [round(run['wall_seconds'], 4) for run in warm_runs],
+                    'warm_wall_seconds': round(warm, 4),
+                })
+                warm_text = f"  热缓存 {warm:.3f}s"
+            results.append(record)
+
+            rss = f"{record['peak_rss_bytes'] / 1024 / 1024:.0f}MB" if record['peak_rss_bytes'] else '-'
+            print(f"✓ {name:<22} {tier_name:<7} {wall:8.3f}s  "
+                  f"{record['pages_per_sec'] or '-':>8} 页/秒  峰值内存 {rss:>7}  输出 {record['output_bytes']} 字节"
+                  f"{warm_text}")
+
+    return {'meta': _environment(args), 'results': results}
+
+
+def _environment(args) -> dict:
+    """记录运行环境，便于判断两份结果是否可比"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'cache': args.cache,
+    }
+
+
+# ---------------------------------------------------------------- 对比
+
+def compare_results(baseline_file: str, current_file: str, threshold: float) -> int:
+    """
+    对比两份结果，耗时或峰值内存增加超过阈值的记为回退
+
+    Returns:
+        int: 回退项数量
+    """
+    with open(baseline_file, encoding='utf-8') as f:
+        baseline = {(r['converter'], r['tier']): r for r in json.load(f)['results']}
+    with open(current_file, encoding='utf-8') as f:
+        current = json.load(f)['results']
+
+    regressions = 0
+    print(f"{'转换器':<22} {'档位':<7} {'耗时(基线→当前)':>24} {'变化':>8} {'峰值内存变化':>12}")
+    for record in current:
+        base = baseline.get((record['converter'], record['tier']))
+        if base is None or 'wall_seconds' not in base or 'wall_seconds' not in record:
+            continue
+
+        wall_change = (record['wall_seconds'] - base['wall_seconds']) / base['wall_seconds']
+        rss_change = None
+        if base.get('peak_rss_bytes') and record.get('peak_rss_bytes'):
+            rss_change = (record['peak_rss_bytes'] - base['peak_rss_bytes']) / base['peak_rss_bytes']
+
+        regressed = wall_change > threshold or (rss_change is not None and rss_change > threshold)
+        regressions += regressed
+        rss_text = f"{rss_change:+.1%}" if rss_change is not None else '-'
+        wall_text = f"{base['wall_seconds']:.3f}s → {record['wall_seconds']:.3f}s"
+        print(f"{'✗' if regressed else ' '} {record['converter']:<20} {record['tier']:<7} "
+              f"{wall_text:>24} {wall_change:>+8.1%} {rss_text:>12}")
+
+    print(f"\n{regressions} 项性能回退（阈值 {threshold:.0%}）")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='转换器性能基准测试',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog=__doc__.split('示例:')[1])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='运行基准测试')
+    run.add_argument('-o', '--output', default='bench_results.json', help='结果文件（JSON）')
+    run.add_argument('--fixtures', default='bench_fixtures', help='测试文件目录（生成后复用）')
+    run.add_argument('--tiers', nargs='+', choices=list(TIERS), default=list(TIERS), help='规模档位')
+    run.add_argument('--only', nargs='+', help='只测试指定的转换器类名')
+    run.add_argument('--repeat', type=int, default=3, help='每项重复次数，取中位数（默认: 3）')
+    run.add_argument('--seed', type=int, default=42, help='测试文件随机种子（默认: 42）')
+    run.add_argument('--cache', choices=['off', 'cold-warm'], default='off',
+                     help='页面渲染缓存：off 关闭（默认）；cold-warm 每轮分别测量冷缓存和热缓存')
+
+    compare = sub.add_parser('compare', help='对比两份结果，标出回退')
+    compare.add_argument('baseline', help='基线结果文件')
+    compare.add_argument('current', help='当前结果文件')
+    compare.add_argument('--threshold', type=float, default=0.10, help='回退阈值（默认: 0.10，即10%%）')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        results = run_benchmarks(args)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到: {args.output}")
+    else:
+        sys.exit(1 if compare_results(args.baseline, args.current, args.threshold) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,36 +1,141 @@
 """命令行界面"""
 import argparse
 import os
+import shutil
+import statistics
 import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # 添加父目录到路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from backend.converters import (
-    WordToPDFConverter, PPTToPDFConverter, ExcelToPDFConverter,
-    ImageToPDFConverter, HTMLToPDFConverter,
-    PDFToWordConverter, PDFToPPTConverter, PDFToImageConverter,
-    PDFToExcelConverter
-)
+from backend.converters import REGISTRY
+from backend.manifest import ConversionManifest, options_key
+from backend.pipeline import Pipeline, PipelineError
+from backend.result_cache import ResultCache, clone_or_copy, file_digest
+from backend.storage import LocalStorage, default_memory_dir
+from backend.watcher import create_watcher
+
+# 默认的结果缓存目录
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'pdf-convert')
+MANIFEST_NAME = '.pdf-convert-manifest.db'
+
+
+def _batch_worker(cli, conversion_type: str, input_file: str, output_file: str = None, digest: bool = False):
+    """
+    批量转换的工作进程入口（模块级函数，便于pickle到子进程）
+
+    Args:
+        digest: 是否在转换前计算输入的哈希（记入增量转换清单，在各工作进程中并行计算）
+
+    Returns:
+        tuple: (输入路径, 是否成功, 耗时, 错误信息, 输入哈希或None)
+    """
+    start = time.perf_counter()
+    input_digest = None
+    try:
+        if digest or cli.cache is not None:
+            input_digest = file_digest(input_file)
+        cli.run_conversion(conversion_type, input_file, output_file, digest=input_digest)
+        return input_file, True, time.perf_counter() - start, None, input_digest
+    except Exception as e:
+        return input_file, False, time.perf_counter() - start, str(e), input_digest
+
+
+def _format_seconds(seconds: float) -> str:
+    """格式化为 时:分:秒"""
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class BatchProgress:
+    """批量转换的实时进度（吞吐量、预计剩余时间）和耗时统计"""
+    
+    def __init__(self, total: int):
+        self.total = total
+        self.converted = 0
+        self.failed = 0
+        self.durations = []
+        self.started_at = time.perf_counter()
+    
+    def update(self, input_file: str, success: bool, elapsed: float = None, error: str = None):
+        """记录一个文件的结果并刷新进度行（批量渲染时单个文件没有独立耗时，elapsed 为None）"""
+        if elapsed is not None:
+            self.durations.append((elapsed, input_file))
+        if success:
+            self.converted += 1
+        else:
+            self.failed += 1
+            print(f"\r✗ 转换失败: {input_file}: {error}")
+        
+        done = self.converted + self.failed
+        wall = time.perf_counter() - self.started_at
+        rate = done / wall if wall > 0 else 0
+        eta = (self.total - done) / rate if rate > 0 else 0
+        print(f"\r[{done}/{self.total}] 成功 {self.converted} 失败 {self.failed} | "
+              f"{rate:.2f} 文件/秒 | 预计剩余 {_format_seconds(eta)}", end='', flush=True)
+    
+    def summary(self, slowest: int = 5):
+        """打印汇总和最慢的文件"""
+        wall = time.perf_counter() - self.started_at
+        print(f"\n\n批量转换完成! 总耗时 {_format_seconds(wall)}")
+        print(f"成功: {self.converted} 个文件")
+        print(f"失败: {self.failed} 个文件")
+        
+        if not self.durations:
+            return
+        
+        times = sorted(elapsed for elapsed, _ in self.durations)
+        p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+        print(f"单文件耗时: 平均 {statistics.mean(times):.2f}s | 中位数 {statistics.median(times):.2f}s | "
+              f"P95 {p95:.2f}s | 最长 {times[-1]:.2f}s")
+        print(f"最慢的 {min(slowest, len(times))} 个文件:")
+        for elapsed, input_file in sorted(self.durations, reverse=True)[:slowest]:
+            print(f"  {elapsed:8.2f}s  {input_file}")
 
 
 class PDFConverterCLI:
     """PDF转换器命令行界面"""
     
     def __init__(self):
-        self.converters = {
-            # 转为PDF
-            'word2pdf': WordToPDFConverter(),
-            'ppt2pdf': PPTToPDFConverter(),
-            'excel2pdf': ExcelToPDFConverter(),
-            'img2pdf': ImageToPDFConverter(),
-            'html2pdf': HTMLToPDFConverter(),
-            # PDF转其他
-            'pdf2word': PDFToWordConverter(),
-            'pdf2ppt': PDFToPPTConverter(),
-            'pdf2img': PDFToImageConverter(),
-            'pdf2excel': PDFToExcelConverter(),
-        }
+        self.cache = None
+        # 转换类型、输入格式和输出格式由各转换器类声明（见 backend/converters/registry.py）
+        self.converters = {conversion_type: REGISTRY.create(conversion_type) for conversion_type in REGISTRY.types()}
+    
+    def run_conversion(self, conversion_type: str, input_file: str, output_file: str = None, digest: str = None):
+        """
+        执行转换（失败时抛出异常）
+        
+        Args:
+            digest: 已计算的输入内容哈希（可选，启用缓存时避免重复读取文件）
+        
+        Returns:
+            tuple: (输出路径, 是否命中缓存)
+        """
+        converter = self.converters[conversion_type]
+        
+        if self.cache is not None:
+            output_ext = converter.output_extension
+            output_file = converter.get_output_path(input_file, output_ext, output_file)
+            cache_key = ResultCache.make_key(digest or file_digest(input_file), conversion_type,
+                                             converter.get_options())
+            cached_path = self.cache.get(cache_key, output_ext)
+            if cached_path:
+                if os.path.abspath(cached_path) != os.path.abspath(output_file):
+                    if os.path.exists(output_file):
+                        os.remove(output_file)
+                    clone_or_copy(cached_path, output_file)
+                return output_file, True
+        
+        result = converter.convert(input_file, output_file)
+        
+        # 只缓存单文件输出
+        if self.cache is not None and result == output_file:
+            self.cache.put(cache_key, output_ext, output_file)
+        
+        return result, False
     
     def convert_file(self, conversion_type: str, input_file: str, output_file: str = None):
         """转换单个文件"""
@@ -40,56 +145,261 @@ class PDFConverterCLI:
             return False
         
         try:
-            converter = self.converters[conversion_type]
-            result = converter.convert(input_file, output_file)
-            print(f"✓ 转换成功: {result}")
+            result, cached = self.run_conversion(conversion_type, input_file, output_file)
+            if cached:
+                print(f"✓ 命中缓存: {result}")
+            else:
+                print(f"✓ 转换成功: {result}")
             return True
         except Exception as e:
             print(f"✗ 转换失败: {str(e)}")
             return False
     
-    def batch_convert(self, conversion_type: str, input_dir: str):
-        """批量转换文件"""
+    def convert_pipeline(self, pipeline: Pipeline, input_files: list, output_file: str = None):
+        """
+        按流水线转换文件，中间结果只写入临时目录（小文件在内存文件系统中）
+        
+        单个分支的输出为 <输入文件名><扩展名>（或 -o 指定的路径），
+        多个分支的输出为 <输入文件名>_<转换类型><扩展名>。
+        """
+        if output_file and (len(input_files) > 1 or len(pipeline.branches) > 1):
+            print("错误: -o 只能用于单个输入文件且只有一个最终分支的流水线")
+            return False
+        
+        disk_dir = tempfile.mkdtemp(prefix='pdf-convert-')
+        memory_root = default_memory_dir()
+        memory_dir = tempfile.mkdtemp(prefix='pdf-convert-', dir=os.path.dirname(memory_root)) if memory_root else None
+        spool = LocalStorage(disk_dir, memory_dir=memory_dir)
+        
+        success = True
+        try:
+            for input_file in input_files:
+                if os.path.splitext(input_file)[1].lower() not in pipeline.input_extensions:
+                    print(f"✗ {input_file}: 不支持的文件格式，流水线的输入格式: {', '.join(pipeline.input_extensions)}")
+                    success = False
+                    continue
+                
+                base_name = os.path.splitext(input_file)[0]
+                if len(pipeline.branches) == 1:
+                    conversion_type = pipeline.branches[0]
+                    output_paths = {conversion_type: output_file or base_name + pipeline.output_extension(conversion_type)}
+                else:
+                    output_paths = {conversion_type: f"{base_name}_{conversion_type}{pipeline.output_extension(conversion_type)}"
+                                    for conversion_type in pipeline.branches}
+                
+                try:
+                    results = pipeline.run(input_file, output_paths, spool, self.converters)
+                    for conversion_type, result in results.items():
+                        print(f"✓ 转换成功 ({pipeline}): {result}")
+                except Exception as e:
+                    print(f"✗ 转换失败 {input_file}: {str(e)}")
+                    success = False
+        finally:
+            for folder in (disk_dir, memory_dir):
+                if folder:
+                    shutil.rmtree(folder, ignore_errors=True)
+        return success
+    
+    def merge_files(self, conversion_type: str, input_files: list, output_file: str = None):
+        """把多个文件合并转换为一个输出"""
+        converter = self.converters[conversion_type]
+        if not converter.supports_merge:
+            print(f"错误: '{conversion_type}' 不支持多文件合并")
+            return False
+        
+        if not output_file:
+            base_name = os.path.splitext(input_files[0])[0]
+            output_file = f"{base_name}_merged{converter.output_extension}"
+        
+        try:
+            result = converter.convert_many(input_files, output_file)
+            print(f"✓ 已合并 {len(input_files)} 个文件: {result}")
+            return True
+        except Exception as e:
+            print(f"✗ 转换失败: {str(e)}")
+            return False
+    
+    def merge_directory(self, conversion_type: str, input_dir: str, output_file: str = None,
+                        recursive: bool = False):
+        """把文件夹中的文件（按文件名排序）合并转换为一个输出"""
+        if not os.path.isdir(input_dir):
+            print(f"错误: '{input_dir}' 不是有效的目录")
+            return False
+        
+        files = self.discover_files(input_dir, REGISTRY.input_extensions(conversion_type), recursive)
+        if not files:
+            print(f"错误: '{input_dir}' 中没有可转换的文件")
+            return False
+        
+        output_file = output_file or os.path.join(
+            input_dir, os.path.basename(os.path.normpath(input_dir)) + self.converters[conversion_type].output_extension)
+        return self.merge_files(conversion_type, files, output_file)
+    
+    @staticmethod
+    def discover_files(input_dir: str, extensions: list, recursive: bool = False) -> list:
+        """查找目录中指定扩展名的文件（按路径排序）"""
+        if recursive:
+            candidates = (os.path.join(root, name)
+                          for root, _, names in os.walk(input_dir) for name in names)
+        else:
+            candidates = (os.path.join(input_dir, name) for name in os.listdir(input_dir))
+        
+        return sorted(path for path in candidates
+                      if os.path.splitext(path)[1].lower() in extensions and os.path.isfile(path))
+    
+    def _output_for(self, conversion_type: str, file_path: str, input_dir: str, output_dir: str = None):
+        """批量转换的输出路径：指定输出根目录时按输入目录结构镜像，否则为None（输出到输入文件旁边）"""
+        if not output_dir:
+            return None
+        output_ext = self.converters[conversion_type].output_extension
+        relative = os.path.relpath(file_path, input_dir)
+        output_file = os.path.join(output_dir, os.path.splitext(relative)[0] + output_ext)
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        return output_file
+    
+    def _manifest_entry(self, conversion_type: str, file_path: str, output_file: str = None) -> tuple:
+        """清单中记录的 (参数, 预期输出路径)"""
+        converter = self.converters[conversion_type]
+        return (options_key(converter.get_options()),
+                converter.get_output_path(file_path, converter.output_extension, output_file))
+    
+    def batch_convert(self, conversion_type: str, input_dir: str, output_dir: str = None,
+                      recursive: bool = False, jobs: int = 1, manifest: ConversionManifest = None):
+        """
+        批量转换文件
+        
+        Args:
+            conversion_type: 转换类型
+            input_dir: 输入文件夹
+            output_dir: 输出根目录（可选，按输入目录结构镜像；默认输出到输入文件旁边）
+            recursive: 是否递归子目录
+            jobs: 并行进程数
+            manifest: 增量转换清单（可选），跳过上次已转换且未修改的文件
+        """
         if not os.path.isdir(input_dir):
             print(f"错误: '{input_dir}' 不是有效的目录")
             return
         
-        # 根据转换类型确定要处理的文件扩展名
-        extension_map = {
-            'word2pdf': ['.docx', '.doc'],
-            'ppt2pdf': ['.pptx', '.ppt'],
-            'excel2pdf': ['.xlsx', '.xls'],
-            'img2pdf': ['.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff'],
-            'html2pdf': ['.html', '.htm'],
-            'pdf2word': ['.pdf'],
-            'pdf2ppt': ['.pdf'],
-            'pdf2img': ['.pdf'],
-            'pdf2excel': ['.pdf'],
-        }
-        
-        extensions = extension_map.get(conversion_type, [])
-        files_converted = 0
-        files_failed = 0
-        
-        print(f"开始批量转换 '{input_dir}' 中的文件...")
-        
-        for filename in os.listdir(input_dir):
-            file_path = os.path.join(input_dir, filename)
-            
-            if not os.path.isfile(file_path):
-                continue
-            
-            ext = os.path.splitext(filename)[1].lower()
-            if ext in extensions:
-                print(f"\n处理: {filename}")
-                if self.convert_file(conversion_type, file_path):
-                    files_converted += 1
-                else:
-                    files_failed += 1
+        extensions = REGISTRY.input_extensions(conversion_type)
+        files = self.discover_files(input_dir, extensions, recursive)
+        tasks = [(file_path, self._output_for(conversion_type, file_path, input_dir, output_dir))
+                 for file_path in files]
+        
+        if manifest is not None:
+            interrupted = manifest.interrupted(conversion_type)
+            if interrupted:
+                print(f"上次运行中断，{len(interrupted)} 个文件将重新转换")
+            pending = [task for task in tasks
+                       if manifest.needs_conversion(task[0], conversion_type, *self._manifest_entry(conversion_type, *task))]
+            print(f"清单中已转换且未修改的 {len(tasks) - len(pending)} 个文件已跳过")
+            tasks = pending
         
-        print(f"\n批量转换完成!")
-        print(f"成功: {files_converted} 个文件")
-        print(f"失败: {files_failed} 个文件")
+        def begin(file_path, output_file):
+            if manifest is not None:
+                manifest.start(file_path, conversion_type, *self._manifest_entry(conversion_type, file_path, output_file))
+        
+        def record(input_file, success, elapsed=None, error=None, digest=None):
+            progress.update(input_file, success, elapsed, error)
+            if manifest is not None:
+                manifest.finish(input_file, conversion_type, elapsed, None if success else (error or '转换失败'),
+                                digest=digest)
+        
+        converter = self.converters[conversion_type]
+        # 支持批量转换的转换器（如html2pdf）一次调用处理多个文件；启用缓存时仍逐个转换以便查询缓存
+        if converter.supports_batch and self.cache is None:
+            if jobs > 1:
+                converter.jobs = jobs
+            print(f"开始批量转换 '{input_dir}' 中的 {len(tasks)} 个文件（批量模式）...")
+            progress = BatchProgress(len(tasks))
+            for file_path, output_file in tasks:
+                begin(file_path, output_file)
+            for input_file, result, error in converter.convert_batch(tasks):
+                # 批量模式没有单独的转换任务：在结果陆续返回时计算哈希，与尚未完成的转换重叠
+                digest = file_digest(input_file) if manifest is not None and os.path.exists(input_file) else None
+                record(input_file, error is None, error=error, digest=digest)
+            progress.summary()
+            return
+        
+        print(f"开始批量转换 '{input_dir}' 中的 {len(tasks)} 个文件（{jobs} 个进程）...")
+        
+        progress = BatchProgress(len(tasks))
+        if jobs > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                futures = []
+                for file_path, output_file in tasks:
+                    begin(file_path, output_file)
+                    futures.append(pool.submit(_batch_worker, self, conversion_type, file_path, output_file,
+                                               manifest is not None))
+                for future in as_completed(futures):
+                    record(*future.result())
+        else:
+            for file_path, output_file in tasks:
+                begin(file_path, output_file)
+                record(*_batch_worker(self, conversion_type, file_path, output_file, manifest is not None))
+        
+        progress.summary()
+    
+    def watch_directory(self, conversion_type: str, input_dir: str, manifest: ConversionManifest,
+                        output_dir: str = None, recursive: bool = False, jobs: int = 1, poll_interval: float = 5):
+        """
+        监视文件夹：先增量转换已有文件，之后转换新写入或修改的文件（Ctrl+C 退出）
+        
+        Args:
+            manifest: 增量转换清单
+            poll_interval: 不支持inotify时的扫描间隔（秒）
+        """
+        self.batch_convert(conversion_type, input_dir, output_dir, recursive, jobs, manifest)
+        if not os.path.isdir(input_dir):
+            return
+        
+        extensions = REGISTRY.input_extensions(conversion_type)
+        watcher = create_watcher(input_dir, recursive, poll_interval)
+        pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+        running = {}
+        
+        def finish(input_file, success, elapsed, error=None, digest=None):
+            manifest.finish(input_file, conversion_type, elapsed, None if success else (error or '转换失败'),
+                            digest=digest)
+            if success:
+                print(f"✓ 转换成功: {input_file} ({elapsed:.2f}s)")
+            else:
+                print(f"✗ 转换失败: {input_file}: {error}")
+        
+        print(f"\n正在监视 '{input_dir}'，新文件写入后自动转换（Ctrl+C 退出）...")
+        try:
+            while True:
+                changed = watcher.read(timeout=1.0)
+                if changed is None:
+                    # 定时扫描或事件队列溢出：扫描整个目录（未修改的文件只检查大小和修改时间）
+                    changed = self.discover_files(input_dir, extensions, recursive)
+                
+                for file_path in changed:
+                    if (os.path.splitext(file_path)[1].lower() not in extensions or not os.path.isfile(file_path)
+                            or file_path in running.values()):
+                        continue
+                    output_file = self._output_for(conversion_type, file_path, input_dir, output_dir)
+                    options, expected_output = self._manifest_entry(conversion_type, file_path, output_file)
+                    if not manifest.needs_conversion(file_path, conversion_type, options, expected_output):
+                        continue
+                    manifest.start(file_path, conversion_type, options, expected_output)
+                    if pool is not None:
+                        running[pool.submit(_batch_worker, self, conversion_type, file_path, output_file,
+                                            True)] = file_path
+                    else:
+                        finish(*_batch_worker(self, conversion_type, file_path, output_file, True))
+                
+                for future in [future for future in running if future.done()]:
+                    del running[future]
+                    finish(*future.result())
+        except KeyboardInterrupt:
+            print("\n停止监视")
+        finally:
+            watcher.close()
+            if pool is not None:
+                pool.shutdown(wait=True)
+                for future in running:
+                    if future.done() and not future.cancelled():
+                        finish(*future.result())
     
     def run(self):
         """运行命令行界面"""
@@ -116,31 +426,153 @@ class PDFConverterCLI:
   python cli.py word2pdf document.docx
   python cli.py pdf2img report.pdf -o output.jpg
   
+  # 只转换部分页面（第1-5页、第9页、第12页到最后一页）
+  python cli.py pdf2word report.pdf --pages 1-5,9,12-
+  
+  # 渲染配置：缩略图（按目标尺寸直接渲染）、屏幕浏览、打印；-o 的扩展名决定图片格式
+  python cli.py pdf2img report.pdf --profile thumbnail
+  python cli.py pdf2img report.pdf --profile screen -o page.webp
+  
+  # 多张图片合并为一个PDF
+  python cli.py img2pdf page1.jpg page2.png scan.tiff -o merged.pdf
+  python cli.py img2pdf -d ./photos --merge -o album.pdf
+  
   # 批量转换
   python cli.py word2pdf -d ./documents
   python cli.py pdf2word -d ./pdfs
+  
+  # 递归并行批量转换，输出按目录结构镜像到 ./out
+  python cli.py pdf2word -d ./pdfs -r -j 8 -O ./out
+  
+  # HTML批量转换：每个wkhtmltopdf进程依次渲染一批文档，远程CSS/字体/图片只下载一次
+  python cli.py html2pdf -d ./invoices -j 4 -O ./invoices_pdf
+  
+  # 增量批量转换：清单中已转换且未修改的文件跳过，中断后再次运行从断点继续
+  python cli.py pdf2word -d ./pdfs -r -O ./out --incremental
+  
+  # 监视文件夹：新写入的文件自动转换（Linux使用inotify，其他平台定时扫描）
+  python cli.py word2pdf -d ./inbox --watch -O ./outbox -j 4
+  
+  # 启用结果缓存，重复转换相同内容的文件时直接复用结果
+  python cli.py pdf2word -d ./pdfs --cache
+  
+  # 流水线：用 | 串联多个转换，中间结果不落到输出目录
+  python cli.py "word2pdf|pdf2img" report.docx
+  python cli.py "ppt2pdf|pdf2word" slides.pptx -o slides.docx
+  
+  # 最后一个阶段用 , 分隔多个分支，并行执行
+  python cli.py "word2pdf|pdf2img,pdf2word" report.docx
             """
         )
         
         parser.add_argument('type', 
-                          choices=list(self.converters.keys()),
-                          help='转换类型')
+                          help='转换类型，或用 | 串联的流水线（如 "word2pdf|pdf2img"）')
         parser.add_argument('input', 
-                          nargs='?',
-                          help='输入文件路径')
+                          nargs='*',
+                          help='输入文件路径（img2pdf可指定多个，合并为一个PDF）')
         parser.add_argument('-o', '--output', 
                           help='输出文件路径（可选）')
+        parser.add_argument('--pages',
+                          help='页码范围，如 1-5,9,12-（仅PDF转其他格式，默认全部页面）')
+        parser.add_argument('--profile',
+                          help='渲染配置（pdf2img: thumbnail、screen、print）')
         parser.add_argument('-d', '--directory',
                           help='批量转换：输入文件夹路径')
+        parser.add_argument('--merge', action='store_true',
+                          help='批量转换：把文件夹中的文件合并为一个输出（仅img2pdf）')
+        parser.add_argument('-r', '--recursive', action='store_true',
+                          help='批量转换：递归处理子目录')
+        parser.add_argument('-O', '--output-dir',
+                          help='批量转换：输出根目录，按输入目录结构镜像（默认输出到输入文件旁边）')
+        parser.add_argument('-j', '--jobs', type=int, default=1,
+                          help='批量转换：并行进程数（默认: 1）')
+        parser.add_argument('--cache', action='store_true',
+                          help='启用结果缓存：内容未变的文件直接复用上次的输出')
+        parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                          help=f'结果缓存目录（默认: {DEFAULT_CACHE_DIR}）')
+        parser.add_argument('--cache-max-mb', type=int, default=2048,
+                          help='结果缓存的磁盘预算，单位MB（默认: 2048）')
+        parser.add_argument('--incremental', action='store_true',
+                          help='批量转换：用清单记录转换情况，跳过已转换且未修改的文件')
+        parser.add_argument('--watch', action='store_true',
+                          help='监视文件夹：先增量转换已有文件，之后自动转换新写入的文件（Ctrl+C 退出）')
+        parser.add_argument('--manifest',
+                          help=f'增量转换清单路径（默认: 输出根目录或输入文件夹下的 {MANIFEST_NAME}）')
+        parser.add_argument('--retry-failed', action='store_true',
+                          help='增量转换：重新转换上次失败且未修改的文件')
+        parser.add_argument('--poll-interval', type=float, default=5,
+                          help='监视文件夹：不支持inotify时的扫描间隔，单位秒（默认: 5）')
         
         args = parser.parse_args()
         
+        if args.cache:
+            self.cache = ResultCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024)
+        
+        # 命令行转换的是用户自己的文件：HTML页面可以读取输入所在目录中的CSS、图片等，
+        # 未设置 HTML_ASSET_HOSTS 时预取任意主机的远程资源
+        if args.directory or args.input:
+            input_root = args.directory or os.path.commonpath(
+                [os.path.dirname(os.path.abspath(path)) for path in args.input])
+            html_converter = self.converters['html2pdf']
+            html_converter.local_root = os.path.abspath(input_root)
+            html_converter.asset_hosts = html_converter.asset_hosts or ('*',)
+        
+        # 流水线模式
+        if Pipeline.is_pipeline(args.type):
+            try:
+                pipeline = Pipeline.parse(args.type)
+            except PipelineError as e:
+                print(f"错误: {e}")
+                return
+            if args.directory or not args.input:
+                print("错误: 流水线需要指定输入文件（暂不支持 -d 批量模式）")
+                return
+            if args.pages or args.profile:
+                print("错误: 流水线暂不支持 --pages 和 --profile")
+                return
+            self.convert_pipeline(pipeline, args.input, args.output)
+            return
+        
+        if args.type not in self.converters:
+            print(f"错误: 不支持的转换类型 '{args.type}'")
+            print(f"支持的转换类型: {', '.join(self.converters.keys())}")
+            return
+        
+        try:
+            if args.profile:
+                self.converters[args.type] = self.converters[args.type].select_profile(args.profile)
+            if args.pages:
+                self.converters[args.type] = self.converters[args.type].select_pages(args.pages)
+        except ValueError as e:
+            print(f"错误: {e}")
+            return
+        
+        # 文件夹合并模式
+        if args.directory and args.merge:
+            self.merge_directory(args.type, args.directory, args.output, recursive=args.recursive)
         # 批量转换模式
-        if args.directory:
-            self.batch_convert(args.type, args.directory)
+        elif args.directory:
+            manifest = None
+            if args.incremental or args.watch:
+                manifest_path = args.manifest or os.path.join(args.output_dir or args.directory, MANIFEST_NAME)
+                manifest = ConversionManifest(manifest_path, retry_failed=args.retry_failed)
+            try:
+                if args.watch:
+                    self.watch_directory(args.type, args.directory, manifest, output_dir=args.output_dir,
+                                         recursive=args.recursive, jobs=max(1, args.jobs),
+                                         poll_interval=args.poll_interval)
+                else:
+                    self.batch_convert(args.type, args.directory, output_dir=args.output_dir,
+                                       recursive=args.recursive, jobs=max(1, args.jobs), manifest=manifest)
+            finally:
+                if manifest is not None:
+                    manifest.close()
+        # 多文件合并模式
+        elif len(args.input) > 1:
+            self.merge_files(args.type, args.input, args.output)
         # 单文件转换模式
         elif args.input:
-            self.convert_file(args.type, args.input, args.output)
+            self.convert_file(args.type, args.input[0], args.output)
         else:
             parser.print_help()
             print("\n错误: 请指定输入文件或使用 -d 指定输入文件夹")
@@ -0,0 +1,165 @@
+"""生产环境Web服务入口
+
+使用gunicorn预先fork多个Web进程，每个进程内多线程处理请求，
+可以利用多核并发处理转换请求。backend/app.py 中的 app.run() 仅用于本地开发。
+
+- 每个进程处理 max_requests 个请求（加随机抖动）后自动重启，
+  回收pdf2docx、poppler、JVM等原生库长期运行中泄漏的内存
+- 向主进程发送 SIGHUP 平滑重启：新进程启动后旧进程处理完当前请求再退出
+- 每个进程在开始接收请求前按 WARMUP_CONVERTERS 预热转换引擎，并启动后台清理线程
+- 进程退出（含 max_requests 回收）前先排空本进程提交的异步任务，等待期间保持心跳，
+  不会因 timeout 被主进程杀死；超过 WEB_DRAIN_TIMEOUT 后取消剩余任务并标记为失败
+- 各进程的指标写入 METRICS_MULTIPROC_DIR（默认为临时目录，启动时清空），
+  任一进程的 /metrics 都输出所有进程的汇总
+
+用法:
+  python serve.py                       # 默认监听 0.0.0.0:5000
+  python serve.py -w 4 --threads 8 --max-requests 500
+  kill -HUP <主进程PID>                 # 平滑重启（部署新代码后）
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+def post_worker_init(worker):
+    """gunicorn钩子：Web进程初始化完成、开始接收请求之前预热转换引擎并启动后台清理"""
+    from backend.app import init_worker
+    init_worker()
+
+
+def worker_exit(server, worker):
+    """gunicorn钩子：Web进程退出时排空本进程提交的异步任务，期间保持心跳"""
+    from backend.app import job_queue
+    drain_timeout = _env_int('WEB_DRAIN_TIMEOUT', 1800)
+    job_queue.drain(timeout=drain_timeout or None, heartbeat=worker.tmp.notify)
+
+
+def child_exit(server, worker):
+    """gunicorn钩子（主进程）：Web进程退出后删除其指标文件中的仪表值"""
+    directory = os.environ.get('METRICS_MULTIPROC_DIR')
+    if directory:
+        from backend.metrics import REGISTRY
+        REGISTRY.mark_process_dead(worker.pid, directory)
+
+
+def prepare_metrics_dir() -> str:
+    """准备多进程指标目录：未指定时使用新的临时目录，指定时清空上次运行留下的文件"""
+    directory = os.environ.get('METRICS_MULTIPROC_DIR')
+    if not directory:
+        directory = tempfile.mkdtemp(prefix='pdfconvert-metrics-')
+        os.environ['METRICS_MULTIPROC_DIR'] = directory
+        return directory
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory)
+    return directory
+
+
+def build_application(options: dict):
+    """创建加载 backend.app 的gunicorn应用"""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise ImportError("需要安装gunicorn库: pip install gunicorn（仅支持Linux/macOS）")
+
+    class ConvertServer(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # 每个Web进程各自导入应用，平滑重启时加载新代码
+            from backend.app import app
+            return app
+
+    return ConvertServer()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='PDF转换器 - 生产环境Web服务（gunicorn多进程）',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+环境变量（命令行参数优先）:
+  BIND                     监听地址
+  WEB_WORKERS              Web进程数
+  WEB_THREADS              每个进程的线程数
+  WEB_MAX_REQUESTS         每个进程处理多少个请求后重启
+  WEB_MAX_REQUESTS_JITTER  重启阈值的随机抖动，避免所有进程同时重启
+  WEB_TIMEOUT              单个请求的超时时间（秒）
+  WEB_GRACEFUL_TIMEOUT     停止服务时等待进行中请求和异步任务的时间（秒）
+  WEB_DRAIN_TIMEOUT        进程回收和平滑重启时等待本进程异步任务的最长时间（秒，0 表示不限制）
+  METRICS_MULTIPROC_DIR    各进程指标文件的共享目录（启动时清空，默认为临时目录）
+        '''
+    )
+    parser.add_argument('-b', '--bind', default=os.environ.get('BIND', '0.0.0.0:5000'),
+                        help='监听地址（默认: 0.0.0.0:5000）')
+    parser.add_argument('-w', '--workers', type=int, default=_env_int('WEB_WORKERS', os.cpu_count() or 1),
+                        help='Web进程数（默认等于CPU核心数）')
+    parser.add_argument('--threads', type=int, default=_env_int('WEB_THREADS', 4),
+                        help='每个进程的线程数（默认: 4）')
+    parser.add_argument('--max-requests', type=int, default=_env_int('WEB_MAX_REQUESTS', 1000),
+                        help='每个进程处理多少个请求后重启，0 表示不重启（默认: 1000）')
+    parser.add_argument('--max-requests-jitter', type=int, default=_env_int('WEB_MAX_REQUESTS_JITTER', 100),
+                        help='重启阈值的随机抖动（默认: 100）')
+    parser.add_argument('--timeout', type=int, default=_env_int('WEB_TIMEOUT', 300),
+                        help='单个请求的超时时间，同步转换大文件时需要调大（默认: 300秒）')
+    parser.add_argument('--graceful-timeout', type=int, default=_env_int('WEB_GRACEFUL_TIMEOUT', 120),
+                        help='停止服务时等待进行中请求和异步任务的时间，超时后强制结束（默认: 120秒）')
+    parser.add_argument('--drain-timeout', type=int, default=_env_int('WEB_DRAIN_TIMEOUT', 1800),
+                        help='进程回收和平滑重启时等待本进程异步任务的最长时间，0 表示不限制（默认: 1800秒）')
+    parser.add_argument('--access-log', default=os.environ.get('WEB_ACCESS_LOG'),
+                        help='访问日志文件，- 表示标准输出（默认不记录）')
+    args = parser.parse_args()
+
+    options = {
+        'bind': args.bind,
+        'workers': max(1, args.workers),
+        'threads': max(1, args.threads),
+        'worker_class': 'gthread' if args.threads > 1 else 'sync',
+        'max_requests': max(0, args.max_requests),
+        'max_requests_jitter': max(0, args.max_requests_jitter),
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'accesslog': args.access_log,
+        'post_worker_init': post_worker_init,
+        'worker_exit': worker_exit,
+        'child_exit': child_exit,
+    }
+
+    # 由 worker_exit 钩子在Web进程中读取
+    os.environ['WEB_DRAIN_TIMEOUT'] = str(max(0, args.drain_timeout))
+    metrics_dir = prepare_metrics_dir()
+
+    # 每个Web进程各有一个异步任务进程池，未指定时按Web进程数平分CPU核心，避免超额订阅
+    os.environ.setdefault('CONVERT_WORKERS', str(max(1, (os.cpu_count() or 1) // options['workers'])))
+
+    try:
+        application = build_application(options)
+    except ImportError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+    print("=" * 50)
+    print("PDF转换器 Web服务启动中...")
+    print(f"监听地址: {args.bind}")
+    print(f"Web进程数: {options['workers']}，每个进程 {options['threads']} 个线程")
+    if options['max_requests']:
+        print(f"每个进程处理约 {options['max_requests']} 个请求后重启")
+    print(f"指标目录: {metrics_dir}")
+    print("=" * 50)
+    application.run()
+
+
+if __name__ == '__main__':
+    main()
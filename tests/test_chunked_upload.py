@@ -0,0 +1,124 @@
+"""分块上传：偏移量校验、断点续传、重启后恢复、多进程共享和增量哈希"""
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from backend.chunked_upload import ChunkedUploadManager, UploadError
+
+
+class _BrokenStream:
+    """读出一部分数据后连接中断的请求流"""
+
+    def __init__(self, data: bytes):
+        self._data = data
+        self._sent = False
+
+    def read(self, size: int) -> bytes:
+        if self._sent:
+            raise ConnectionError('连接中断')
+        self._sent = True
+        return self._data
+
+
+class ChunkedUploadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.upload_dir = os.path.join(self.root, 'uploads')
+        self.manager = ChunkedUploadManager(self.upload_dir, max_size=1024, read_size=4)
+        self.data = bytes(range(256)) * 2
+
+    def test_upload_in_chunks(self):
+        upload = self.manager.create('doc.pdf', len(self.data), {'type': 'pdf2word'})
+        for offset in range(0, len(self.data), 100):
+            self.assertEqual(self.manager.write_chunk(upload, offset, io.BytesIO(self.data[offset:offset + 100])),
+                             min(offset + 100, len(self.data)))
+        self.assertTrue(upload.complete)
+
+        final_path = os.path.join(self.root, 'doc.pdf')
+        digest = self.manager.finish(upload, final_path)
+        self.assertEqual(digest, hashlib.sha256(self.data).hexdigest())
+        with open(final_path, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(os.listdir(self.upload_dir), [])
+
+    def test_invalid_requests(self):
+        with self.assertRaises(UploadError):
+            self.manager.create('doc.pdf', 0)
+        with self.assertRaises(UploadError) as context:
+            self.manager.create('doc.pdf', 2048)
+        self.assertEqual(context.exception.status, 413)
+
+        upload = self.manager.create('doc.pdf', 10)
+        with self.assertRaises(UploadError) as context:
+            self.manager.write_chunk(upload, 5, io.BytesIO(b'abc'))
+        self.assertEqual(context.exception.status, 409)
+        with self.assertRaises(UploadError) as context:
+            self.manager.write_chunk(upload, 0, io.BytesIO(b'x' * 11))
+        self.assertEqual(context.exception.status, 413)
+        with self.assertRaises(UploadError) as context:
+            self.manager.finish(upload, os.path.join(self.root, 'doc.pdf'))
+        self.assertEqual(context.exception.status, 409)
+
+    def test_resume_after_interrupted_chunk(self):
+        upload = self.manager.create('doc.pdf', len(self.data))
+        with self.assertRaises(ConnectionError):
+            self.manager.write_chunk(upload, 0, _BrokenStream(self.data[:100]))
+        # 中断前读到的数据已提交，客户端从新的偏移量继续
+        self.assertEqual(upload.offset, 100)
+        self.manager.write_chunk(upload, 100, io.BytesIO(self.data[100:]))
+        digest = self.manager.finish(upload, os.path.join(self.root, 'doc.pdf'))
+        self.assertEqual(digest, hashlib.sha256(self.data).hexdigest())
+
+    def test_restore_after_restart(self):
+        upload = self.manager.create('doc.pdf', len(self.data), {'type': 'pdf2word'})
+        self.manager.write_chunk(upload, 0, io.BytesIO(self.data[:300]))
+
+        # 新进程（服务重启）从磁盘上的元数据和分块文件恢复上传
+        manager = ChunkedUploadManager(self.upload_dir, max_size=1024)
+        restored = manager.get(upload.id)
+        self.assertEqual((restored.filename, restored.offset, restored.options),
+                         ('doc.pdf', 300, {'type': 'pdf2word'}))
+        manager.write_chunk(restored, 300, io.BytesIO(self.data[300:]))
+        digest = manager.finish(restored, os.path.join(self.root, 'doc.pdf'))
+        self.assertEqual(digest, hashlib.sha256(self.data).hexdigest())
+
+    def test_chunks_alternate_between_processes(self):
+        # 两个Web进程共享上传目录，分块轮流由不同进程处理
+        other = ChunkedUploadManager(self.upload_dir, max_size=1024, read_size=4)
+        upload = self.manager.create('doc.pdf', len(self.data))
+        managers = [self.manager, other, self.manager, other, self.manager]
+        for index, offset in enumerate(range(0, len(self.data), 120)):
+            manager = managers[index]
+            session = manager.get(upload.id)
+            self.assertEqual(session.offset, offset)
+            manager.write_chunk(session, offset, io.BytesIO(self.data[offset:offset + 120]))
+
+        session = other.get(upload.id)
+        self.assertTrue(session.complete)
+        # 查询进度不读取文件内容；完成时只补算另一个进程最后写入的分块
+        self.assertEqual(session.hashed, 480)
+        digest = other.finish(session, os.path.join(self.root, 'doc.pdf'))
+        self.assertEqual(digest, hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(session.hashed, len(self.data))
+
+        # 已由另一个进程完成：不能再写入或重复完成
+        stale = self.manager._uploads[upload.id]
+        with self.assertRaises(UploadError) as context:
+            self.manager.write_chunk(stale, len(self.data), io.BytesIO(b'x'))
+        self.assertEqual(context.exception.status, 404)
+        with self.assertRaises(UploadError):
+            self.manager.finish(stale, os.path.join(self.root, 'again.pdf'))
+        self.assertIsNone(self.manager.get(upload.id))
+
+    def test_unknown_upload(self):
+        self.assertIsNone(self.manager.get('0' * 32))
+        self.assertIsNone(self.manager.get('../etc'))
+
+
+if __name__ == '__main__':
+    unittest.main()
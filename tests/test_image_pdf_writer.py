@@ -0,0 +1,72 @@
+"""逐页写出的图片PDF：对象偏移量、页面尺寸、失败时删除写了一半的文件"""
+import os
+import re
+import shutil
+import tempfile
+import unittest
+import zlib
+
+from backend.converters.image_pdf_writer import ImagePDFWriter
+
+
+class _Image:
+    """只提供 ImagePDFWriter 用到的属性的解码后图片"""
+
+    def __init__(self, mode: str, size: tuple):
+        self.mode = mode
+        self.size = size
+
+    def tobytes(self) -> bytes:
+        channels = 1 if self.mode == 'L' else 3
+        return b'\x80' * (self.size[0] * self.size[1] * channels)
+
+
+class ImagePDFWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.output = os.path.join(self.root, 'out.pdf')
+
+    def _read(self) -> bytes:
+        with open(self.output, 'rb') as f:
+            return f.read()
+
+    def test_writes_valid_structure(self):
+        jpeg = b'\xff\xd8fake jpeg data\xff\xd9'
+        with ImagePDFWriter(self.output, resolution=72) as writer:
+            writer.add_jpeg(jpeg, 200, 100, 'RGB')
+            writer.add_image(_Image('L', (30, 20)))
+            writer.add_jpeg(jpeg, 10, 10, 'CMYK', adobe_cmyk=True)
+            self.assertEqual(writer.page_count, 3)
+        data = self._read()
+        self.assertTrue(data.startswith(b'%PDF-1.4\n'))
+        self.assertTrue(data.endswith(b'%%EOF\n'))
+
+        # startxref 指向交叉引用表，表中每个偏移量都指向对应的对象
+        xref_offset = int(re.search(rb'startxref\n(\d+)\n', data).group(1))
+        self.assertTrue(data[xref_offset:].startswith(b'xref\n0 '))
+        size = int(re.search(rb'/Size (\d+)', data).group(1))
+        offsets = re.findall(rb'(\d{10}) 00000 n ', data[xref_offset:])
+        self.assertEqual(len(offsets), size - 1)
+        for obj_id, offset in enumerate(offsets, start=1):
+            self.assertTrue(data[int(offset):].startswith(f'{obj_id} 0 obj\n'.encode('ascii')))
+
+        self.assertIn(b'/Count 3', data)
+        # JPEG原样嵌入；72DPI时页面尺寸等于像素尺寸
+        self.assertIn(jpeg, data)
+        self.assertIn(b'/MediaBox [0 0 200.0000 100.0000]', data)
+        self.assertIn(b'/Decode [1 0 1 0 1 0 1 0]', data)
+        self.assertIn(zlib.compress(b'\x80' * 600, 6), data)
+
+    def test_removes_partial_file_on_error(self):
+        with self.assertRaises(KeyError):
+            with ImagePDFWriter(self.output) as writer:
+                writer.add_jpeg(b'\xff\xd8\xff\xd9', 10, 10, 'RGB')
+                # 不支持的图像模式
+                writer.add_jpeg(b'\xff\xd8\xff\xd9', 10, 10, 'P')
+        self.assertFalse(os.path.exists(self.output))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""后台文件清理：按过期时间删除、超出配额提前删除、修改过的文件重新登记"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from backend.janitor import Janitor
+
+
+class JanitorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.uploads = os.path.join(self.root, 'uploads')
+        self.outputs = os.path.join(self.root, 'outputs')
+        os.makedirs(self.uploads)
+        os.makedirs(self.outputs)
+
+    def _write(self, folder: str, name: str, size: int = 10, age: float = 0) -> str:
+        path = os.path.join(folder, name)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_removes_expired_files(self):
+        janitor = Janitor()
+        janitor.add_folder(self.outputs, 3600)
+        old = self._write(self.outputs, 'old.pdf', age=7200)
+        fresh = self._write(self.outputs, 'fresh.pdf', age=60)
+        janitor.track(old)
+        janitor.track(fresh)
+
+        next_deadline = janitor.run_once()
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(fresh))
+        self.assertAlmostEqual(next_deadline, os.path.getmtime(fresh) + 3600, delta=1)
+
+    def test_ignores_unmanaged_paths(self):
+        janitor = Janitor()
+        janitor.add_folder(self.outputs, 3600)
+        other = self._write(self.root, 'other.pdf', age=7200)
+        janitor.track(other)
+        self.assertIsNone(janitor.run_once())
+        self.assertTrue(os.path.exists(other))
+
+    def test_quota_removes_oldest_outputs(self):
+        janitor = Janitor(max_bytes=250)
+        janitor.add_folder(self.uploads, 3600, count_quota=False)
+        janitor.add_folder(self.outputs, 3600)
+        upload = self._write(self.uploads, 'upload.pdf', size=1000, age=300)
+        outputs = [self._write(self.outputs, f"out{index}.pdf", size=100, age=300 - index * 10)
+                   for index in range(4)]
+        for path in [upload] + outputs:
+            janitor.track(path)
+
+        janitor.run_once()
+        # 上传目录不计入配额；输出目录删除最旧的文件直到不超过配额
+        self.assertTrue(os.path.exists(upload))
+        self.assertEqual([os.path.exists(path) for path in outputs], [False, False, True, True])
+
+    def test_modified_file_is_tracked_again(self):
+        janitor = Janitor()
+        janitor.add_folder(self.uploads, 3600)
+        part = self._write(self.uploads, 'upload.part', age=7200)
+        janitor.track(part)
+        # 登记后仍在写入（如分块上传）：按新的修改时间重新登记，不删除
+        os.utime(part)
+        next_deadline = janitor.run_once()
+        self.assertTrue(os.path.exists(part))
+        self.assertAlmostEqual(next_deadline, os.path.getmtime(part) + 3600, delta=1)
+
+    def test_scan_tracks_existing_files(self):
+        janitor = Janitor()
+        janitor.add_folder(self.outputs, 3600)
+        old = self._write(self.outputs, 'old.pdf', age=7200)
+        janitor.scan()
+        janitor.run_once()
+        self.assertFalse(os.path.exists(old))
+
+
+if __name__ == '__main__':
+    unittest.main()
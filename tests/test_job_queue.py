@@ -0,0 +1,54 @@
+"""异步任务队列：提交失败时回滚、按间隔清理过期任务"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from backend import metrics
+from backend.job_queue import JobQueue
+
+
+class JobQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.state_dir = os.path.join(self.root, 'jobs')
+        self.input_path = os.path.join(self.root, 'report.docx')
+        with open(self.input_path, 'wb') as f:
+            f.write(b'x' * 1000)
+
+    def test_failed_submit_is_rolled_back(self):
+        queue = JobQueue(max_workers=1, state_dir=self.state_dir)
+        executor = mock.Mock()
+        executor.lane_for.return_value = 'short'
+        executor.limits_for.return_value = (60, 60)
+        executor.submit.side_effect = RuntimeError('进程池已关闭')
+        pending = metrics.JOBS_PENDING.snapshot().get(('word2pdf',), 0)
+        with mock.patch.object(queue, '_get_executor', return_value=executor):
+            with self.assertRaises(RuntimeError):
+                queue.submit('word2pdf', mock.Mock(page_cost=1.0, pages=None), self.input_path,
+                             os.path.join(self.root, 'report.pdf'))
+        # 排队计数和 queued 记录都已撤销
+        self.assertEqual(metrics.JOBS_PENDING.snapshot().get(('word2pdf',), 0), pending)
+        self.assertEqual(os.listdir(self.state_dir), [])
+        self.assertEqual(queue._jobs, {})
+
+    def test_prunes_at_interval_without_scanning(self):
+        queue = JobQueue(max_workers=1, retention_seconds=0, state_dir=self.state_dir)
+        with mock.patch('backend.job_queue.os.scandir', wraps=os.scandir) as scandir:
+            first = queue.record_completed('pdf2word', os.path.join(self.root, 'a.docx'))
+            second = queue.record_completed('pdf2word', os.path.join(self.root, 'b.docx'))
+            # 未到清理间隔，已过期的任务仍在内存中
+            self.assertEqual(set(queue._jobs), {first.id, second.id})
+            queue._next_prune = 0.0
+            third = queue.record_completed('pdf2word', os.path.join(self.root, 'c.docx'))
+        self.assertEqual(set(queue._jobs), {third.id})
+        # 磁盘上的记录由后台清理线程删除，提交时不遍历目录
+        self.assertEqual(scandir.call_count, 0)
+        self.assertEqual(len(os.listdir(self.state_dir)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
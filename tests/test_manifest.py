@@ -0,0 +1,99 @@
+"""增量转换清单：跳过未变化的文件、沿用哈希、中断后重新转换"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from backend.manifest import ConversionManifest, options_key
+from backend.result_cache import file_digest
+
+
+class ConversionManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.manifest = ConversionManifest(os.path.join(self.root, 'state', 'manifest.db'))
+        self.addCleanup(self.manifest.close)
+        self.input = self._write('report.pdf', b'pdf')
+        self.output = os.path.join(self.root, 'report.docx')
+        self.options = options_key({'b': 2, 'a': 1})
+
+    def _write(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.root, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def _convert(self, digest=None, error=None):
+        self.manifest.start(self.input, 'pdf2word', self.options, self.output)
+        if error is None:
+            self._write('report.docx', b'docx')
+        self.manifest.finish(self.input, 'pdf2word', seconds=0.1, error=error, digest=digest)
+
+    def _digest(self):
+        row = self.manifest._row(os.path.abspath(self.input), 'pdf2word')
+        return row['digest']
+
+    def test_options_key_is_stable(self):
+        self.assertEqual(self.options, options_key({'a': 1, 'b': 2}))
+
+    def test_skips_unchanged_input(self):
+        self.assertTrue(self.manifest.needs_conversion(self.input, 'pdf2word', self.options, self.output))
+        self._convert(digest=file_digest(self.input))
+        self.assertFalse(self.manifest.needs_conversion(self.input, 'pdf2word', self.options, self.output))
+        # 参数、输出路径变化或输出被删除时重新转换
+        self.assertTrue(self.manifest.needs_conversion(self.input, 'pdf2word', options_key({}), self.output))
+        self.assertTrue(self.manifest.needs_conversion(self.input, 'pdf2word', self.options,
+                                                       os.path.join(self.root, 'other.docx')))
+        os.remove(self.output)
+        self.assertTrue(self.manifest.needs_conversion(self.input, 'pdf2word', self.options, self.output))
+        self.assertFalse(self.manifest.needs_conversion(os.path.join(self.root, 'missing.pdf'), 'pdf2word',
+                                                        self.options, self.output))
+
+    def test_touched_input_with_same_content(self):
+        self._convert(digest=file_digest(self.input))
+        mtime = time.time() + 10
+        os.utime(self.input, (mtime, mtime))
+        self.assertFalse(self.manifest.needs_conversion(self.input, 'pdf2word', self.options, self.output))
+        # 只更新了修改时间，之后不再计算哈希
+        row = self.manifest._row(os.path.abspath(self.input), 'pdf2word')
+        self.assertEqual(row['mtime_ns'], os.stat(self.input).st_mtime_ns)
+
+        self._write('report.pdf', b'new')
+        self.assertTrue(self.manifest.needs_conversion(self.input, 'pdf2word', self.options, self.output))
+
+    def test_start_carries_digest_over(self):
+        digest = file_digest(self.input)
+        self._convert(digest=digest)
+        # 输入未变化：开始时沿用已有的哈希，结束时未提供哈希也不清空
+        self.manifest.start(self.input, 'pdf2word', self.options, self.output)
+        self.assertEqual(self._digest(), digest)
+        self.manifest.finish(self.input, 'pdf2word', seconds=0.1)
+        self.assertEqual(self._digest(), digest)
+
+        # 输入变化：开始时哈希留空，由转换任务计算后在结束时记录
+        self._write('report.pdf', b'changed')
+        self.manifest.start(self.input, 'pdf2word', self.options, self.output)
+        self.assertIsNone(self._digest())
+        self.manifest.finish(self.input, 'pdf2word', seconds=0.1, digest=file_digest(self.input))
+        self.assertEqual(self._digest(), file_digest(self.input))
+
+    def test_failed_and_interrupted(self):
+        self._convert(error='转换失败')
+        self.assertFalse(self.manifest.needs_conversion(self.input, 'pdf2word', self.options, self.output))
+        retrying = ConversionManifest(self.manifest.db_path, retry_failed=True)
+        self.addCleanup(retrying.close)
+        self.assertTrue(retrying.needs_conversion(self.input, 'pdf2word', self.options, self.output))
+
+        # 进程中途退出：running 状态的文件重新转换
+        self.manifest.start(self.input, 'pdf2word', self.options, self.output)
+        self.assertEqual(self.manifest.interrupted('pdf2word'), [os.path.abspath(self.input)])
+        self.assertEqual(self.manifest.interrupted('pdf2img'), [])
+        self.assertTrue(self.manifest.needs_conversion(self.input, 'pdf2word', self.options, self.output))
+        self.assertEqual(self.manifest.summary(), {'running': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
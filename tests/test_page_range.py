@@ -0,0 +1,79 @@
+"""页码范围解析和PDF转Excel的tabula页码参数"""
+import unittest
+
+from backend.converters.from_pdf_converter import PDFToExcelConverter
+from backend.converters.page_range import (
+    count_pages,
+    format_page_ranges,
+    is_open_ended,
+    normalize_page_ranges,
+    parse_page_ranges,
+    resolve_page_ranges,
+    split_ranges,
+)
+
+
+class PageRangeTest(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(parse_page_ranges('1-5, 9,12-'), [(1, 5), (9, 9), (12, None)])
+        self.assertEqual(parse_page_ranges('-3'), [(1, 3)])
+
+    def test_parse_invalid(self):
+        for spec in ('', ',', 'a', '0', '5-2', '1--2'):
+            with self.assertRaises(ValueError, msg=spec):
+                parse_page_ranges(spec)
+
+    def test_normalize_sorts_and_merges(self):
+        self.assertIsNone(normalize_page_ranges(None))
+        self.assertIsNone(normalize_page_ranges(' all '))
+        self.assertEqual(normalize_page_ranges('9,1-3,2-5'), '1-5,9')
+        self.assertEqual(normalize_page_ranges('4-6,7'), '4-7')
+        self.assertEqual(normalize_page_ranges('20-,3,25-30'), '3,20-')
+
+    def test_resolve_open_ended(self):
+        # '20-' 表示第20页到最后一页，而不是只有第20页
+        self.assertEqual(resolve_page_ranges('20-', 30), [(20, 30)])
+        self.assertEqual(resolve_page_ranges('1-2,20-', 25), [(1, 2), (20, 25)])
+        self.assertEqual(resolve_page_ranges(None, 7), [(1, 7)])
+        self.assertEqual(resolve_page_ranges('5-100', 8), [(5, 8)])
+
+    def test_resolve_out_of_range(self):
+        self.assertEqual(resolve_page_ranges('2,40-', 10), [(2, 2)])
+        with self.assertRaises(ValueError):
+            resolve_page_ranges('20-', 10)
+
+    def test_helpers(self):
+        self.assertTrue(is_open_ended('1,20-'))
+        self.assertFalse(is_open_ended('1-20'))
+        self.assertFalse(is_open_ended(None))
+        self.assertEqual(format_page_ranges([(1, 5), (9, 9)]), '1-5,9')
+        self.assertEqual(count_pages([(1, 5), (9, 9)]), 6)
+        self.assertEqual(split_ranges([(1, 5), (9, 9)], 2), [(1, 2), (3, 4), (5, 5), (9, 9)])
+
+
+class ExcelPageRangesTest(unittest.TestCase):
+    """传给tabula的 pages 参数总是闭区间（tabula-java 把 '20-' 解析为只有第20页）"""
+
+    def test_open_ended_single_call(self):
+        converter = PDFToExcelConverter(pages='20-', thread_count=1)
+        self.assertEqual(converter._page_ranges(30), ['20-30'])
+
+    def test_open_ended_split(self):
+        converter = PDFToExcelConverter(pages='20-', thread_count=4, pages_per_chunk=5)
+        self.assertEqual(converter._page_ranges(30), ['20-24', '25-29', '30-30'])
+
+    def test_all_pages(self):
+        self.assertEqual(PDFToExcelConverter(thread_count=1)._page_ranges(30), ['all'])
+        self.assertEqual(PDFToExcelConverter(thread_count=2, pages_per_chunk=10)._page_ranges(25),
+                         ['1-10', '11-20', '21-25'])
+
+    def test_unknown_page_count(self):
+        self.assertEqual(PDFToExcelConverter(pages='2-4')._page_ranges(None), ['2-4'])
+        self.assertEqual(PDFToExcelConverter()._page_ranges(None), ['all'])
+        with self.assertRaises(ValueError):
+            PDFToExcelConverter(pages='20-')._page_ranges(None)
+
+
+if __name__ == '__main__':
+    unittest.main()
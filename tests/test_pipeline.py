@@ -0,0 +1,80 @@
+"""转换流水线：写法解析、阶段衔接校验、中间结果的清理"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from backend.pipeline import Pipeline, PipelineError
+from backend.storage import LocalStorage
+
+
+class PipelineTest(unittest.TestCase):
+
+    def test_parse(self):
+        pipeline = Pipeline.parse(' word2pdf | pdf2img , pdf2word ')
+        self.assertEqual((pipeline.chain, pipeline.branches), (['word2pdf'], ['pdf2img', 'pdf2word']))
+        self.assertEqual(str(pipeline), 'word2pdf|pdf2img,pdf2word')
+        self.assertEqual(pipeline.input_extensions, ('.docx', '.doc'))
+        self.assertEqual(pipeline.output_extension('pdf2img'), '.zip')
+        self.assertEqual(Pipeline.parse('pdf2word').chain, [])
+        self.assertTrue(Pipeline.is_pipeline('word2pdf|pdf2img'))
+        self.assertFalse(Pipeline.is_pipeline('word2pdf'))
+
+    def test_invalid_specs(self):
+        for spec in ('', 'word2pdf|', '|pdf2img', 'word2pdf,,pdf2img',
+                     'word2pdf,ppt2pdf|pdf2img', 'word2pdf|pdf2img,pdf2img'):
+            with self.subTest(spec=spec):
+                with self.assertRaises(PipelineError):
+                    Pipeline.parse(spec)
+        with self.assertRaises(PipelineError) as context:
+            Pipeline.parse('word2pdf|unknown')
+        self.assertIn('unknown', str(context.exception))
+        # 上一阶段的输出格式不是下一阶段的输入格式
+        with self.assertRaises(PipelineError) as context:
+            Pipeline.parse('pdf2word|pdf2img')
+        self.assertIn('.docx', str(context.exception))
+        self.assertTrue(issubclass(PipelineError, ValueError))
+
+    def test_run_removes_intermediates(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        spool = LocalStorage(os.path.join(root, 'spool'))
+        input_file = os.path.join(root, 'report.docx')
+        with open(input_file, 'wb') as f:
+            f.write(b'docx')
+        calls = []
+
+        def runner(converter, input_path, output_path):
+            calls.append((converter.conversion_type, os.path.basename(input_path)))
+            with open(output_path, 'wb') as f:
+                f.write(b'out')
+            return output_path
+
+        outputs = {'pdf2img': os.path.join(root, 'report.zip'), 'pdf2word': os.path.join(root, 'report_2.docx')}
+        results = Pipeline.parse('word2pdf|pdf2img,pdf2word').run(input_file, outputs, spool, runner=runner)
+        self.assertEqual(results, outputs)
+        self.assertEqual(calls[0], ('word2pdf', 'report.docx'))
+        # 两个分支读取同一个中间文件
+        self.assertEqual(sorted(calls[1:]), [('pdf2img', 'report_stage1.pdf'), ('pdf2word', 'report_stage1.pdf')])
+        self.assertEqual(os.listdir(spool.root), [])
+
+    def test_failed_stage_removes_intermediates(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        spool = LocalStorage(os.path.join(root, 'spool'))
+
+        def runner(converter, input_path, output_path):
+            if converter.conversion_type == 'pdf2word':
+                raise RuntimeError('转换失败')
+            with open(output_path, 'wb') as f:
+                f.write(b'out')
+            return output_path
+
+        with self.assertRaises(RuntimeError):
+            Pipeline.parse('word2pdf|pdf2word').run(__file__, {'pdf2word': os.path.join(root, 'out.docx')},
+                                                   spool, runner=runner)
+        self.assertEqual(os.listdir(spool.root), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
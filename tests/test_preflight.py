@@ -0,0 +1,89 @@
+"""任务预检：页数和耗时估算"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from backend import preflight
+from backend.converters.from_pdf_converter import PDFToImageConverter
+from backend.converters.to_pdf_converter import ImageToPDFConverter
+from backend.sandbox import SandboxPool
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+class PreflightTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+    def _write(self, name: str, size: int) -> str:
+        path = os.path.join(self.root, name)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        return path
+
+    def test_multi_frame_image_counts_every_frame(self):
+        path = self._write('scan.tiff', 1000)
+        with mock.patch('backend.preflight.image_frames', return_value=(500, 2 * preflight.PIXELS_PER_PAGE)):
+            job = preflight.estimate(ImageToPDFConverter(), path)
+        self.assertEqual(job.pages, 500)
+        self.assertEqual(job.approx_pages, 1000)
+        # 500页的任务按页数获得执行时间上限，而不是单页的限制
+        timeout, _ = SandboxPool(1).limits_for(job.pages)
+        self.assertEqual(timeout, 60 + 10 * 500)
+
+    def test_small_image_is_one_page(self):
+        path = self._write('photo.jpg', 1000)
+        with mock.patch('backend.preflight.image_frames', return_value=(1, 640 * 480)):
+            job = preflight.estimate(ImageToPDFConverter(), path)
+        self.assertEqual((job.pages, job.approx_pages), (1, 1.0))
+
+    def test_merge_sums_inputs(self):
+        paths = [self._write('a.png', 10), self._write('b.gif', 10)]
+        with mock.patch('backend.preflight.image_frames', side_effect=[(1, 100), (3, 100)]):
+            job = preflight.estimate(ImageToPDFConverter(), paths)
+        self.assertEqual(job.pages, 4)
+
+    def test_unreadable_falls_back_to_size(self):
+        path = self._write('report.docx', 10 * preflight.BYTES_PER_PAGE)
+        converter = mock.Mock(page_cost=2.0, pages=None)
+        job = preflight.estimate(converter, path)
+        self.assertIsNone(job.pages)
+        self.assertEqual((job.approx_pages, job.cost), (10, 20))
+
+    def test_selected_pages(self):
+        path = self._write('doc.pdf', 1000)
+        with mock.patch('backend.preflight.count_pdf_pages', return_value=40):
+            job = preflight.estimate(PDFToImageConverter(pages='1-5,30-'), path)
+        self.assertEqual(job.pages, 16)
+
+    def test_large_pdf_is_not_parsed(self):
+        path = self._write('large.pdf', preflight.MAX_PARSE_BYTES + 1)
+        # 大文件不在Web进程中用PyPDF2解析，按文件大小估算；执行时间上限使用默认超时
+        pypdf2 = mock.Mock()
+        with mock.patch.dict('sys.modules', {'PyPDF2': pypdf2}):
+            self.assertIsNone(preflight.count_pdf_pages(path))
+            pypdf2.PdfReader.assert_not_called()
+            small = self._write('small.pdf', 1000)
+            pypdf2.PdfReader.return_value.pages = [None] * 3
+            self.assertEqual(preflight.count_pdf_pages(small), 3)
+        job = preflight.estimate(PDFToImageConverter(), path)
+        self.assertIsNone(job.pages)
+        self.assertGreater(job.approx_pages, 40)
+
+    @unittest.skipIf(Image is None, '需要Pillow')
+    def test_image_frames(self):
+        path = os.path.join(self.root, 'frames.tiff')
+        frames = [Image.new('L', (20, 10), color) for color in (0, 128, 255)]
+        frames[0].save(path, save_all=True, append_images=frames[1:])
+        self.assertEqual(preflight.image_frames(path), (3, 200))
+
+
+if __name__ == '__main__':
+    unittest.main()
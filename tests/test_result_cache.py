@@ -0,0 +1,102 @@
+"""转换结果缓存：缓存键、命中、与输出文件相互独立、LRU淘汰"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from backend.result_cache import ResultCache, file_digest
+
+
+class ResultCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.cache = ResultCache(os.path.join(self.root, 'cache'), max_bytes=1000)
+
+    def _write(self, name: str, size: int = 100, age: float = 0) -> str:
+        path = os.path.join(self.root, name)
+        with open(path, 'wb') as f:
+            f.write(name.encode('utf-8').ljust(size, b'x'))
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_make_key(self):
+        digest = file_digest(self._write('input.pdf'))
+        key = ResultCache.make_key(digest, 'pdf2word', {'a': 1, 'b': 2})
+        self.assertEqual(key, ResultCache.make_key(digest, 'pdf2word', {'b': 2, 'a': 1}))
+        self.assertNotEqual(key, ResultCache.make_key(digest, 'pdf2word', {'a': 1, 'b': 3}))
+        self.assertNotEqual(key, ResultCache.make_key(digest, 'pdf2image', {'a': 1, 'b': 2}))
+
+    def test_put_and_get(self):
+        self.assertIsNone(self.cache.get('key', '.docx'))
+        output = self._write('output.docx')
+        cached = self.cache.put('key', '.docx', output)
+        self.assertEqual(self.cache.get('key', '.docx'), cached)
+        with open(cached, 'rb') as f, open(output, 'rb') as g:
+            self.assertEqual(f.read(), g.read())
+
+    def test_put_moves_temp_file(self):
+        # 流式下载边发送边写入临时文件，完成后直接改名加入缓存
+        temp_path = self.cache.temp_path('key', '.zip')
+        with open(temp_path, 'wb') as f:
+            f.write(b'x' * 100)
+        cached = self.cache.put('key', '.zip', temp_path, move=True)
+        self.assertFalse(os.path.exists(temp_path))
+        self.assertEqual(self.cache.get('key', '.zip'), cached)
+        self.assertEqual(self.cache._total, 100)
+
+    def test_evict_removes_stale_temp_files(self):
+        stale = self.cache.temp_path('old', '.zip')
+        writing = self.cache.temp_path('new', '.zip')
+        for path in (stale, writing):
+            with open(path, 'wb') as f:
+                f.write(b'x')
+        os.utime(stale, (time.time() - 7200, time.time() - 7200))
+        self.cache.evict()
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(writing))
+
+    def test_hit_does_not_touch_outputs(self):
+        output = self._write('output.docx', age=3600)
+        output_mtime = os.stat(output).st_mtime_ns
+        cached = self.cache.put('key', '.docx', output)
+        # 缓存文件不是输出的硬链接：刷新缓存的最近使用时间不改变输出的修改时间（过期时间、ETag）
+        self.assertNotEqual(os.stat(cached).st_ino, os.stat(output).st_ino)
+        self.cache.get('key', '.docx')
+        self.assertEqual(os.stat(output).st_mtime_ns, output_mtime)
+
+    def test_evicts_least_recently_used(self):
+        paths = {}
+        for index in range(8):
+            paths[index] = self.cache.put(f"key{index}", '.pdf', self._write(f"out{index}.pdf", size=120))
+            # 文件的修改时间即最近使用时间
+            mtime = time.time() - 1000 + index
+            os.utime(paths[index], (mtime, mtime))
+        # 最早写入的文件刚被使用过，不会被淘汰
+        self.cache.get('key0', '.pdf')
+        self.cache.put('key8', '.pdf', self._write('out8.pdf', size=120))
+
+        remaining = sorted(name for name in os.listdir(self.cache.cache_dir))
+        # 超出预算后删除到预算的90%（900字节，7个文件）
+        self.assertEqual(remaining, ['key0.pdf', 'key3.pdf', 'key4.pdf', 'key5.pdf', 'key6.pdf',
+                                     'key7.pdf', 'key8.pdf'])
+        self.assertEqual(self.cache._total, 7 * 120)
+
+    def test_put_does_not_scan_below_budget(self):
+        cache = ResultCache(os.path.join(self.root, 'large'), max_bytes=100000)
+        output = self._write('output.pdf', size=100)
+        cache.put('key0', '.pdf', output)
+        with mock.patch('backend.result_cache.os.scandir', wraps=os.scandir) as scandir:
+            for index in range(1, 50):
+                cache.put(f"key{index}", '.pdf', output)
+        # 累计写入未超过预算的十分之一，不再遍历目录
+        self.assertEqual(scandir.call_count, 0)
+        self.assertEqual(cache._total, 50 * 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
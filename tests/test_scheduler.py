@@ -0,0 +1,82 @@
+"""短任务优先调度：通道划分、通道内按估算耗时排序、长任务老化"""
+import threading
+import unittest
+from unittest import mock
+
+from backend.scheduler import LONG, SHORT, LaneScheduler
+
+
+class _Clock:
+    """可手动推进的 time.monotonic"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class LaneSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = _Clock()
+        patcher = mock.patch('backend.scheduler.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scheduler = LaneScheduler(long_threshold=30, aging_rate=1.0)
+
+    def test_lanes(self):
+        self.assertEqual(self.scheduler.put('a', 5), SHORT)
+        self.assertEqual(self.scheduler.put('b', 30), SHORT)
+        self.assertEqual(self.scheduler.put('c', 31), LONG)
+        self.assertEqual(self.scheduler.pending(), {SHORT: 2, LONG: 1})
+
+    def test_shortest_job_first(self):
+        for item, cost in (('slow', 20), ('fast', 1), ('medium', 8), ('fast2', 1)):
+            self.scheduler.put(item, cost)
+        # 估算耗时相同的任务按提交顺序
+        self.assertEqual([self.scheduler.get() for _ in range(4)], ['fast', 'fast2', 'medium', 'slow'])
+
+    def test_short_lane_only(self):
+        self.scheduler.put('long', 500)
+        self.scheduler.put('short', 10)
+        self.assertEqual(self.scheduler.get(lanes=(SHORT,)), 'short')
+        self.scheduler.close()
+        # 只处理短任务的工作进程不会取到长任务
+        self.assertIsNone(self.scheduler.get(lanes=(SHORT,)))
+        self.assertEqual(self.scheduler.get(), 'long')
+
+    def test_aging(self):
+        self.scheduler.put('long', 100)
+        # 长任务只等待了50秒：新提交的短任务仍然优先
+        self.clock.now += 50
+        self.scheduler.put('short-early', 5)
+        # 等待超过 (100 - 5) / aging_rate 秒后长任务排到新的短任务之前
+        self.clock.now += 60
+        self.scheduler.put('short-late', 5)
+        self.assertEqual([self.scheduler.get() for _ in range(3)], ['short-early', 'long', 'short-late'])
+
+    def test_aging_rate_zero_is_pure_sjf(self):
+        scheduler = LaneScheduler(long_threshold=30, aging_rate=0)
+        scheduler.put('long', 100)
+        self.clock.now += 10000
+        scheduler.put('short', 5)
+        self.assertEqual([scheduler.get(), scheduler.get()], ['short', 'long'])
+
+    def test_close_discard(self):
+        self.scheduler.put('a', 1)
+        self.scheduler.put('b', 100)
+        self.assertEqual(sorted(self.scheduler.close(discard=True)), ['a', 'b'])
+        self.assertIsNone(self.scheduler.get())
+
+    def test_get_waits_for_put(self):
+        results = []
+        thread = threading.Thread(target=lambda: results.append(self.scheduler.get()))
+        thread.start()
+        self.scheduler.put('item', 1)
+        thread.join(timeout=5)
+        self.assertEqual(results, ['item'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""存储后端：内存暂存、ETag、按字节范围读取、共享目录提交"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from backend.result_cache import ResultCache
+from backend.storage import DirectoryStorage, LocalStorage, create_storage
+
+
+class StorageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.disk = os.path.join(self.root, 'outputs')
+        self.memory = os.path.join(self.root, 'shm')
+        self.storage = LocalStorage(self.disk, memory_dir=self.memory, memory_max_bytes=100,
+                                    memory_min_free_ratio=0)
+
+    def _write(self, storage, name: str, data: bytes, size_hint: int = None) -> str:
+        path = storage.writable_path(name, len(data) if size_hint is None else size_hint)
+        with open(path, 'wb') as f:
+            f.write(data)
+        storage.commit(name)
+        return path
+
+    def test_small_files_stay_in_memory(self):
+        small = self._write(self.storage, 'small.pdf', b'x' * 50)
+        self.assertEqual(os.path.dirname(small), self.memory)
+        self.assertEqual(self.storage.local_path('small.pdf'), small)
+
+        # 预计大小不超过阈值、实际输出超过阈值的文件提交时移回磁盘
+        self._write(self.storage, 'grown.pdf', b'x' * 500, size_hint=10)
+        self.assertEqual(self.storage.local_path('grown.pdf'), os.path.join(self.disk, 'grown.pdf'))
+        self.assertEqual(os.path.dirname(self.storage.writable_path('large.pdf', 500)), self.disk)
+
+    def test_etag_and_range(self):
+        data = bytes(range(256)) * 4
+        self._write(self.storage, 'out.pdf', data)
+        stored = self.storage.stat('out.pdf')
+        self.assertEqual(stored.size, len(data))
+        self.assertEqual(stored.etag, self.storage.stat('out.pdf').etag)
+        self.assertEqual(b''.join(self.storage.iter_range('out.pdf', 100, 600)), data[100:600])
+        # 超出文件末尾的范围只返回已有的数据
+        self.assertEqual(b''.join(self.storage.iter_range('out.pdf', 1000, 2000)), data[1000:])
+
+        # 内容或修改时间变化后ETag随之变化
+        path = self.storage.local_path('out.pdf')
+        os.utime(path, (time.time() + 10, time.time() + 10))
+        self.assertNotEqual(self.storage.stat('out.pdf').etag, stored.etag)
+        self.assertIsNone(self.storage.stat('missing.pdf'))
+        with self.assertRaises(FileNotFoundError):
+            self.storage.iter_range('missing.pdf', 0, 1)
+
+    def test_cache_hit_keeps_output_etag(self):
+        cache = ResultCache(os.path.join(self.root, 'cache'), max_bytes=10000)
+        source = os.path.join(self.root, 'converted.pdf')
+        with open(source, 'wb') as f:
+            f.write(b'x' * 500)
+        cached = cache.put('key', '.pdf', source)
+        self.storage.put_file('first.pdf', cached)
+        etag = self.storage.stat('first.pdf').etag
+
+        # 再次命中缓存（刷新缓存文件的修改时间）并存入新的输出，已有输出的ETag不变
+        time.sleep(0.01)
+        self.storage.put_file('second.pdf', cache.get('key', '.pdf'))
+        self.assertEqual(self.storage.stat('first.pdf').etag, etag)
+        self.assertNotEqual(os.stat(self.storage.local_path('first.pdf')).st_ino, os.stat(cached).st_ino)
+
+    def test_directory_storage(self):
+        shared = os.path.join(self.root, 'shared')
+        storage = create_storage(f"file://{shared}", self.storage)
+        self.assertIsInstance(storage, DirectoryStorage)
+        self._write(storage, 'out.pdf', b'x' * 50)
+        # 提交后从暂存区移动到共享目录，不留下临时文件
+        self.assertIsNone(self.storage.local_path('out.pdf'))
+        self.assertEqual(os.listdir(shared), ['out.pdf'])
+        self.assertEqual(storage.stat('out.pdf').size, 50)
+        storage.delete('out.pdf')
+        self.assertIsNone(storage.local_path('out.pdf'))
+        self.assertIs(create_storage('', self.storage), self.storage)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""流式ZIP：写入不可seek的输出时生成的压缩包必须完整有效"""
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+
+from backend.converters.zip_stream import stream_zip, write_zip
+
+
+def _entries(count: int, size: int = 1000):
+    for index in range(count):
+        yield f"page_{index + 1:03d}.jpg", bytes([index % 256]) * (size + index)
+
+
+class _UnseekableWriter(io.RawIOBase):
+    """只能顺序写入的输出（如HTTP响应、管道）"""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.data.extend(data)
+        return len(data)
+
+
+class StreamZipTest(unittest.TestCase):
+
+    def _check_archive(self, data: bytes, count: int):
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            self.assertIsNone(archive.testzip())
+            expected = dict(_entries(count))
+            self.assertEqual(archive.namelist(), list(expected))
+            for name, content in expected.items():
+                self.assertEqual(archive.read(name), content)
+            # 不可seek的输出使用数据描述符记录大小和CRC
+            self.assertTrue(all(info.flag_bits & 0x08 for info in archive.infolist()))
+
+    def test_valid_archive(self):
+        for compression in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            with self.subTest(compression=compression):
+                sink = _UnseekableWriter()
+                self.assertFalse(sink.seekable())
+                for chunk in stream_zip(_entries(5), compression):
+                    sink.write(chunk)
+                self._check_archive(bytes(sink.data), 5)
+
+    def test_yields_before_entries_exhausted(self):
+        consumed = []
+
+        def entries():
+            for name, data in _entries(3):
+                consumed.append(name)
+                yield name, data
+
+        chunks = stream_zip(entries())
+        first = next(chunks)
+        # 第一个文件写完即产出数据，不等待后面的条目生成
+        self.assertEqual(consumed, ['page_001.jpg'])
+        data = first + b''.join(chunks)
+        self.assertEqual(len(consumed), 3)
+        self._check_archive(data, 3)
+
+    def test_empty(self):
+        data = b''.join(stream_zip(iter(())))
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            self.assertEqual(archive.namelist(), [])
+
+    def test_write_zip(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_file = os.path.join(temp_dir, 'pages.zip')
+            write_zip(_entries(4), output_file)
+            with open(output_file, 'rb') as f:
+                self._check_archive(f.read(), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()